@@ -0,0 +1,208 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from environment import MachineEnv
+from scenario import ScenarioModel
+
+# Benchmark für den Simulationsdurchsatz von MachineEnv.
+# Misst je (Datensatz, Policy, Modus) Steps/s, Episoden/s, Zeitanteile von reset()
+# und step() sowie den Spitzenspeicher und schreibt alles als JSON.
+#
+# Beispiel:
+#   python benchmark.py --output bench.json
+#   python benchmark.py --compare bench.json   # Exit-Code 1 bei Regression
+
+ORDERS_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "GitOrders", "kmu_sample_orders*.csv")
+SYNTHETIC_SIZES = [500, 5000, 50000]
+POLICIES = ["random", "fifo", "seeded"]
+
+
+def make_policy(name, action_space, seed=0):
+    """
+    Liefert eine Funktion obs -> action:
+      - random: gleichverteilte Aktionen, bei jedem Lauf anders
+      - fifo:   immer den ersten Auftrag jeder Queue
+      - seeded: gleichverteilte Aktionen mit festem Seed (reproduzierbar)
+    """
+    if name == "fifo":
+        action = np.ones(len(action_space.nvec), dtype=np.int64)
+        return lambda obs: action
+    rng = np.random.default_rng(None if name == "random" else seed)
+    return lambda obs: rng.integers(0, action_space.nvec)
+
+
+def run_case(df_orders, policy_name, event_driven, max_steps, max_episodes, max_queue_size=5, seed=0):
+    """
+    Führt Episoden aus, bis max_steps oder max_episodes erreicht sind, und
+    liefert die Messwerte als Dict.
+    """
+    t0 = time.perf_counter()
+    env = MachineEnv(df_orders, max_queue_size=max_queue_size, time_step=1, event_driven=event_driven)
+    build_time = time.perf_counter() - t0
+    policy = make_policy(policy_name, env.action_space, seed=seed)
+
+    reset_time = 0.0
+    step_time = 0.0
+    steps = 0
+    episodes = 0
+    simulated_minutes = 0
+    while steps < max_steps and episodes < max_episodes:
+        t0 = time.perf_counter()
+        obs = env.reset()
+        reset_time += time.perf_counter() - t0
+
+        done = False
+        while not done and steps < max_steps:
+            action = policy(obs)
+            t0 = time.perf_counter()
+            obs, reward, done, info = env.step(action)
+            step_time += time.perf_counter() - t0
+            steps += 1
+        simulated_minutes += env.current_time
+        if done:
+            episodes += 1
+
+    total_time = reset_time + step_time
+    return {
+        "orders": len(df_orders),
+        "policy": policy_name,
+        "event_driven": event_driven,
+        "steps": steps,
+        "episodes": episodes,
+        "simulated_minutes": int(simulated_minutes),
+        "build_time_s": build_time,
+        "reset_time_s": reset_time,
+        "step_time_s": step_time,
+        "steps_per_s": steps / step_time if step_time > 0 else 0.0,
+        "episodes_per_s": episodes / total_time if total_time > 0 else 0.0,
+        "reset_share": reset_time / total_time if total_time > 0 else 0.0,
+    }
+
+
+def measure_peak_memory(df_orders, policy_name, event_driven, max_steps, max_queue_size=5, seed=0):
+    """
+    Spitzenspeicher (Python- und NumPy-Allokationen) für Aufbau und eine Episode.
+    Getrennt von der Zeitmessung, da tracemalloc die Laufzeit stark verfälscht.
+    """
+    tracemalloc.start()
+    env = MachineEnv(df_orders, max_queue_size=max_queue_size, time_step=1, event_driven=event_driven)
+    policy = make_policy(policy_name, env.action_space, seed=seed)
+    obs = env.reset()
+    done = False
+    steps = 0
+    while not done and steps < max_steps:
+        obs, reward, done, info = env.step(policy(obs))
+        steps += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """
+    Vergleicht steps_per_s je Fall mit einer früheren Ergebnisdatei.
+    Gibt die Liste der Fälle zurück, die um mehr als 'tolerance' langsamer sind.
+    """
+    def key(case):
+        return case["dataset"], case["policy"], case["event_driven"]
+
+    previous = {key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(key(case))
+        if old is None or old["steps_per_s"] <= 0:
+            continue
+        ratio = case["steps_per_s"] / old["steps_per_s"]
+        if ratio < 1 - tolerance:
+            regressions.append({"dataset": case["dataset"], "policy": case["policy"],
+                                "event_driven": case["event_driven"], "ratio": ratio})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durchsatz-Benchmark für MachineEnv")
+    parser.add_argument("--orders-glob", default=ORDERS_GLOB)
+    parser.add_argument("--n-files", type=int, default=5, help="Anzahl Beispieldateien (0 = alle)")
+    parser.add_argument("--sizes", type=int, nargs="*", default=SYNTHETIC_SIZES)
+    parser.add_argument("--policies", nargs="*", default=POLICIES, choices=POLICIES)
+    parser.add_argument("--mode", choices=["minute", "event", "both"], default="both")
+    parser.add_argument("--max-steps", type=int, default=200000, help="Step-Budget je Fall")
+    parser.add_argument("--max-episodes", type=int, default=20, help="Episoden-Budget je Fall")
+    parser.add_argument("--no-memory", action="store_true", help="Spitzenspeicher nicht messen")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="frühere Ergebnisdatei für den Regressionsvergleich")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(args.orders_glob))
+    source_dfs = [pd.read_csv(f) for f in files]
+    sample_files = files if args.n_files == 0 else files[:args.n_files]
+
+    datasets = [(os.path.basename(f), df) for f, df in zip(sample_files, source_dfs)]
+    # Synthetische Datensätze aus den an den Beispieldaten geschätzten Verteilungen
+    scenario = ScenarioModel.fit(source_dfs)
+    datasets += [(f"synthetic_{n}", scenario.sample_order_set(n, seed=args.seed)) for n in args.sizes]
+    modes = {"minute": [False], "event": [True], "both": [False, True]}[args.mode]
+
+    cases = []
+    for name, df_orders in datasets:
+        for event_driven in modes:
+            for policy_name in args.policies:
+                case = run_case(df_orders, policy_name, event_driven, args.max_steps, args.max_episodes,
+                                seed=args.seed)
+                case["dataset"] = name
+                if not args.no_memory:
+                    case["peak_memory_bytes"] = measure_peak_memory(df_orders, policy_name, event_driven,
+                                                                    args.max_steps, seed=args.seed)
+                cases.append(case)
+                print(f"{name:28s} {'event' if event_driven else 'minute':6s} {policy_name:7s} "
+                      f"{case['steps_per_s']:>12,.0f} steps/s {case['episodes_per_s']:>9.2f} ep/s "
+                      f"reset {case['reset_share']:6.1%}"
+                      + (f" peak {case['peak_memory_bytes'] / 2**20:8.1f} MiB" if not args.no_memory else ""))
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "max_steps": args.max_steps,
+        "max_episodes": args.max_episodes,
+        "seed": args.seed,
+        "cases": cases,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Ergebnisse gespeichert unter: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for reg in regressions:
+            print(f"⚠️ Regression: {reg['dataset']} {reg['policy']} "
+                  f"{'event' if reg['event_driven'] else 'minute'}: {reg['ratio']:.2f}x")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
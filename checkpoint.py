@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+# Asynchrone Checkpoints für das Training in learner.py.
+# Das Modell wird im Trainingsthread nur in einen Speicherpuffer serialisiert
+# (Parameter, Optimizer-Zustand, num_timesteps); das Schreiben auf die Platte übernimmt
+# ein Hintergrundthread, atomar über eine temporäre Datei. Neben jedem Checkpoint liegt
+# eine JSON-Datei mit dem Trainingsfortschritt (z.B. bester Reward, nächster Datensatz),
+# aus der ein abgebrochener Lauf fortgesetzt werden kann.
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AsyncCheckpointer:
+    """
+    Schreibt Modell-Snapshots im Hintergrund nach '<directory>/<name>.zip' und den
+    Fortschritt nach '<directory>/<name>.json'. Schreibaufträge werden der Reihe nach
+    von einem einzigen Thread erledigt; close() wartet auf alle ausstehenden.
+    Nur das Schreiben ist asynchron: das Serialisieren (model.save in einen Puffer, siehe
+    snapshot) läuft synchron im aufrufenden Trainingsthread, da das Training die Parameter
+    sonst während des Speicherns verändern könnte. save() und save_model() blockieren also
+    für die Dauer von model.save ohne Plattenzugriff.
+    """
+
+    def __init__(self, directory, name="ppo_latest"):
+        os.makedirs(directory, exist_ok=True)
+        self.model_path = os.path.join(directory, f"{name}.zip")
+        self.state_path = os.path.join(directory, f"{name}.json")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def snapshot(model):
+        """
+        Serialisiert das Modell synchron im aufrufenden Thread in einen Speicherpuffer
+        (konsistenter Stand, bevor das Training weiterläuft).
+        """
+        buffer = io.BytesIO()
+        model.save(buffer)
+        return buffer.getvalue()
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            self._pending = [future for future in self._pending if not future.done()]
+            self._pending.append(self._executor.submit(fn, *args))
+
+    def save(self, model, **state):
+        """
+        Checkpoint mit Fortschrittsdaten 'state' (JSON-serialisierbar); num_timesteps
+        wird automatisch ergänzt.
+        """
+        data = self.snapshot(model)
+        state = dict(state, num_timesteps=int(model.num_timesteps))
+        self._submit(self._write_checkpoint, data, state)
+
+    def _write_checkpoint(self, data, state):
+        # Modell zuerst: der Fortschritt verweist nie auf einen unvollständigen Snapshot
+        _write_atomic(self.model_path, data)
+        _write_atomic(self.state_path, json.dumps(state, indent=2).encode())
+
+    def save_model(self, model, path):
+        """
+        Speichert einen Snapshot (z.B. das bisher beste Modell) im Hintergrund nach 'path'.
+        """
+        self._submit(_write_atomic, path, self.snapshot(model))
+
+    def load_state(self):
+        """
+        Fortschritt des letzten vollständigen Checkpoints oder None.
+        """
+        if not (os.path.exists(self.model_path) and os.path.exists(self.state_path)):
+            return None
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def wait(self):
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.result()
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """
+    SB3-Callback: alle save_freq Aufrufe von _on_step (je VecEnv-Step) einen
+    asynchronen Checkpoint über 'checkpointer' schreiben; 'state' wird mitgespeichert.
+    """
+
+    def __init__(self, checkpointer, save_freq, verbose=0, **state):
+        super(AsyncCheckpointCallback, self).__init__(verbose)
+        self.checkpointer = checkpointer
+        self.save_freq = save_freq
+        self.state = state
+
+    def _on_step(self):
+        if self.n_calls % self.save_freq == 0:
+            self.checkpointer.save(self.model, **self.state)
+            if self.verbose:
+                print(f"💾 Checkpoint nach {self.model.num_timesteps} Steps")
+        return True
@@ -1,162 +1,677 @@
+import heapq
 import gym
 from gym import spaces
 import numpy as np
 import pandas as pd
+import math
+import os
 from collections import deque
+from itertools import islice
 
-class ThreeMachineEnv(gym.Env):
+from ordercache import MINUTES_PER_DAY, OrderCache, OrderSet, discover_machines
+from schedulelog import ScheduleLog
+
+class MachineEnv(gym.Env):
     """
-    Einfaches Scheduling-Env mit 3 Maschinen (M1, M2, M3).
+    Scheduling-Env mit beliebig vielen Maschinen (Arbeitsplätzen).
+    Die Maschinen werden aus den Spalten '<Name>_Ruest'/'<Name>_Proc' des
+    Auftrags-DataFrames ermittelt oder über 'machines' vorgegeben; die Reihenfolge
+    jedes Auftrags steht in OperationSequence (z.B. 'M1->M2->M3').
+    Statt eines DataFrames kann ein bereits kompiliertes OrderSet (z.B. aus einem
+    OrderCache) übergeben werden; dann entfällt jedes Parsen.
     Wir erfassen zusätzlich Start- und Endzeiten jedes Auftrags auf jeder Maschine,
     um später ein Gantt-Diagramm plotten zu können.
+
+    Der Zustand je Maschine liegt in Listen (Index = Position in machine_names);
+    Kosten je Step sowie Beobachtungs- und Aktionsraum wachsen linear mit der
+    Maschinenanzahl. Listen statt NumPy-Arrays, da Einzelzugriffe auf kleine Arrays
+    im Step-Loop deutlich langsamer sind.
+
+    Mit event_driven=True springt step() nach den Aktionen direkt bis kurz vor den
+    nächsten Zeitpunkt, an dem eine Maschine fertig wird oder eine Entscheidung nötig
+    ist. Die Belohnungen der übersprungenen Leerlauf-Ticks werden aufsummiert, das
+    schedule_log ist identisch zum minütlichen Modus.
+
+    Mit sample_size=n startet jede Episode mit n zufällig gewählten Aufträgen
+    (ohne Zurücklegen, Reihenfolge wie im Datensatz); Seed über seed().
+
+    Freigabezeiten (Online-Modus): release_times (Minuten je Auftragsindex) bzw. eine
+    Spalte 'Release_days' im DataFrame legen fest, ab wann ein Auftrag an seiner ersten
+    Maschine ansteht. Bis dahin wartet er in einem Heap außerhalb der Queues, zählt nicht
+    als offener Auftrag und ist in der Beobachtung nicht sichtbar; der event_driven-Modus
+    springt auch bis zur nächsten Freigabe. add_orders() nimmt während der Simulation
+    weitere Aufträge auf. Mit streaming=True endet eine Episode nie von selbst, da jederzeit
+    neue Aufträge kommen können (Betrieb als Dispositionsdienst, siehe scheduler.py).
+
+    Das schedule_log ist ein spaltenweises ScheduleLog (siehe schedulelog.py), Export
+    per schedule_log.to_frame(). Mit log_schedule=False wird es nicht geführt (Training).
+
+    observation="basic" liefert den (2 * Maschinen + 1)-Vektor aus Restzeiten,
+    Queue-Längen und current_time. observation="queue" liefert zusätzlich je Maschine
+    die ersten max_queue_size Queue-Plätze (die Plätze, die eine Aktion auswählt) mit
+    QUEUE_FEATURES je Auftrag, alle Werte normiert (siehe _get_obs).
     """
 
-    def __init__(self, orders_df, max_queue_size=10, time_step=1):
-        super(ThreeMachineEnv, self).__init__()
+    # Merkmale je Queue-Platz im Beobachtungsmodus "queue"
+    QUEUE_FEATURES = ("present", "op_time", "setup_time", "remaining_work", "remaining_ops", "slack")
+    # Normierte Werte werden auf [-OBS_CLIP, OBS_CLIP] begrenzt
+    OBS_CLIP = 10.0
+    # Methoden, die enable_profiling() mit Zeitmessung versieht, und ihre Phasen
+    PROFILED_METHODS = (
+        ("step", "env/step"),
+        ("_finish_operation", "env/finish"),
+        ("_handle_action_for_machine", "env/dispatch"),
+        ("_admit_released", "env/admit"),
+        ("_skip_to_next_event", "env/skip"),
+        ("_get_obs", "env/observation"),
+        ("action_masks", "env/action_masks"),
+        ("reset", "env/reset"),
+    )
+
+    def __init__(self, orders, max_queue_size=10, time_step=1, event_driven=False, machines=None,
+                 sample_size=None, log_schedule=True, observation="basic", release_times=None,
+                 streaming=False):
+        super(MachineEnv, self).__init__()
 
-        self.orders_df = orders_df.copy()
-        self.orders_df.Deadline_days=self.orders_df.Deadline_days*480
         self.time_step = time_step
+        self.event_driven = event_driven
+        self.sample_size = sample_size
+        self._sample_rng = np.random.default_rng()
 
-        # Für das Gantt-Diagramm: (order_id, machine, start_time, finish_time)
-        self.schedule_log = []
+        # Für das Gantt-Diagramm: (Auftragsindex, Maschinenindex, start_time, finish_time)
+        self.log_schedule = log_schedule
+        self.schedule_log = ScheduleLog()
 
         # max_queue_size: maximale Anzahl an Aufträgen pro Warteschlange (für das Action-Space-Design)
         self.max_queue_size = max_queue_size
 
-        self.machines = {
-            'M1': {'is_busy': False, 'current_order': None, 'time_to_finish': 0, 'start_time': None},
-            'M2': {'is_busy': False, 'current_order': None, 'time_to_finish': 0, 'start_time': None},
-            'M3': {'is_busy': False, 'current_order': None, 'time_to_finish': 0, 'start_time': None},
-        }
+        if observation not in ("basic", "queue"):
+            raise ValueError(f"Unbekannter Beobachtungsmodus '{observation}', erlaubt: 'basic', 'queue'")
+        self.observation = observation
 
-        self.queue = {
-            'M1': deque(),
-            'M2': deque(),
-            'M3': deque(),
-        }
+        if machines is not None:
+            self.machine_names = list(machines)
+        elif isinstance(orders, OrderSet):
+            self.machine_names = list(orders.machine_names)
+        else:
+            self.machine_names = discover_machines(orders.columns)
+        if not self.machine_names:
+            raise ValueError("Keine Maschinen gefunden: erwartet Spalten '<Name>_Ruest' und '<Name>_Proc'")
+        self._machine_index = {m: i for i, m in enumerate(self.machine_names)}
+        n_machines = len(self.machine_names)
+
+        # Zustand je Maschine: Restzeit, laufender Auftrag (-1 = frei), Startzeit
+        self.time_to_finish = [0] * n_machines
+        self.running = [-1] * n_machines
+        self.start_times = [0] * n_machines
+        self.queues = [deque() for _ in range(n_machines)]
 
         self.current_time = 0
         self.completed_orders = []
         self.done = False
 
-        # Observation: 7-dim [time_to_finish_M1, time_to_finish_M2, time_to_finish_M3,
-        #                     queue_len_M1, queue_len_M2, queue_len_M3, current_time]
-        self.observation_space = spaces.Box(
-            low=0,
-            high=1e6,
-            shape=(7,),
-            dtype=np.float32
-        )
-
-        # Action: MultiDiscrete([max_queue_size+1, max_queue_size+1, max_queue_size+1])
+        # Laufende Zähler, damit step() nichts neu zählen muss
+        self.n_open_orders = 0
+        self.n_busy_machines = 0
+        # Noch nicht freigegebene Aufträge als Heap aus (release_time, Auftragsindex)
+        self._pending = []
+        self.streaming = streaming
+        # Geänderte Queues seit der letzten Beobachtung (Beobachtungsmodus "queue")
+        self._queue_dirty = [True] * n_machines
+
+        # Auftragsdaten einmalig in NumPy-Arrays übersetzen (Zeile = dichter Auftragsindex),
+        # damit der Step-Loop nur noch O(1)-Arrayzugriffe statt DataFrame-Suchen macht.
+        # Queues und laufende Aufträge führen intern diesen Index, nicht die OrderID.
+        self.set_orders(orders, release_times=release_times)
+
+        # Observation: (2 * Maschinen + 1)-dim [time_to_finish je Maschine,
+        #                                      queue_len je Maschine, current_time]
+        if observation == "basic":
+            self.observation_space = spaces.Box(
+                low=0,
+                high=1e6,
+                shape=(2 * n_machines + 1,),
+                dtype=np.float32
+            )
+        else:
+            # + je Maschine und Queue-Platz die QUEUE_FEATURES, normiert
+            self.observation_space = spaces.Box(
+                low=-self.OBS_CLIP,
+                high=self.OBS_CLIP,
+                shape=(2 * n_machines + 1 + n_machines * max_queue_size * len(self.QUEUE_FEATURES),),
+                dtype=np.float32
+            )
+
+        # Vorallokierter Beobachtungspuffer; _get_obs() überschreibt ihn bei jedem Aufruf
+        self._obs = np.zeros(self.observation_space.shape, dtype=np.float32)
+        if observation == "queue":
+            # View auf die Queue-Plätze im Puffer; Blöcke werden nur bei Queue-Änderung neu befüllt
+            self._queue_slots = self._obs[2 * n_machines + 1:].reshape(
+                n_machines, max_queue_size, len(self.QUEUE_FEATURES))
+            self._slack_base = np.zeros((n_machines, max_queue_size), dtype=np.float32)
+            self._slack = np.zeros((n_machines, max_queue_size), dtype=np.float32)
+
+        # Action: MultiDiscrete([max_queue_size+1] * Maschinen)
         # -> pro Maschine ein Wert in [0..max_queue_size], 0 = "Nichts tun"
-        self.action_space = spaces.MultiDiscrete([self.max_queue_size + 1] * 3)
+        self.action_space = spaces.MultiDiscrete([self.max_queue_size + 1] * n_machines)
 
         self.reset()
 
+    def set_orders(self, orders, release_times=None):
+        """
+        Tauscht den Auftragsdatensatz aus (DataFrame oder OrderSet mit denselben
+        Maschinen). Die Spaces bleiben unverändert; wirksam wird der neue Datensatz
+        mit dem nächsten reset().
+        release_times: Freigabezeit je Auftragsindex in Minuten; ohne Angabe aus der
+        Spalte 'Release_days' des DataFrames, sonst sind alle Aufträge ab 0 verfügbar.
+        """
+        if isinstance(orders, OrderSet):
+            if orders.machine_names != self.machine_names:
+                raise ValueError(f"OrderSet-Maschinen {orders.machine_names} passen nicht zu {self.machine_names}")
+            self.orders_df = None
+        else:
+            self.orders_df = orders.copy()
+            self.orders_df.Deadline_days=self.orders_df.Deadline_days*480
+            if release_times is None and "Release_days" in orders.columns:
+                release_times = orders["Release_days"].to_numpy() * MINUTES_PER_DAY
+            orders = OrderSet.from_frame(orders, machines=self.machine_names)
+        self._bind_orders(orders)
+        self.schedule_log.set_orders(orders)
+
+        if release_times is not None:
+            release_times = np.asarray(release_times, dtype=np.int64)
+            if release_times.shape != (len(orders),):
+                raise ValueError(f"release_times braucht {len(orders)} Einträge, nicht {release_times.shape}")
+        self.release_times = release_times
+
+        self._build_initial_queues()
+
+    def _build_initial_queues(self):
+        # Startzustand einmalig je Datensatz: Aufträge je erster Maschine in Datensatz-
+        # Reihenfolge. reset() kopiert nur noch diese Listen in die Queues.
+        first_machine = self.routes[:, 0]
+        self._initial_queues = [np.flatnonzero(first_machine == m).tolist()
+                                for m in range(len(self.machine_names))]
+
+    def _bind_orders(self, orders, active=None, time_scale=None):
+        self.orders = orders
+
+        # Arrays der Auftragstabelle (siehe OrderSet) direkt referenzieren
+        self.order_ids = orders.order_ids
+        self.setup_times = orders.setup_times
+        self.proc_times = orders.proc_times
+        self.op_times = orders.op_times
+        self.deadlines = orders.deadlines
+        self.routes = orders.routes
+        self.route_len = orders.route_len
+        self.next_machine = orders.next_machine
+        if self.observation == "queue":
+            self._prepare_queue_features(active, time_scale)
+
+    def add_orders(self, orders, release_times=None):
+        """
+        Nimmt während der Simulation weitere Aufträge auf (DataFrame oder OrderSet mit
+        denselben Maschinen). Sie erhalten die nächsten freien Auftragsindizes und stehen
+        ab release_times (Minuten; Standard: 'Release_days' des DataFrames, sonst sofort)
+        an ihrer ersten Maschine an. Die Aufträge bleiben auch über reset() hinaus Teil
+        des Datensatzes. Gibt die Auftragsindizes der neuen Aufträge zurück.
+        """
+        if not isinstance(orders, OrderSet):
+            if release_times is None and "Release_days" in orders.columns:
+                release_times = orders["Release_days"].to_numpy() * MINUTES_PER_DAY
+            orders = OrderSet.from_frame(orders, machines=self.machine_names)
+        if release_times is None:
+            release_times = self.current_time
+        release_times = np.broadcast_to(np.asarray(release_times, dtype=np.int64), (len(orders),))
+
+        offset = len(self.order_ids)
+        if self.release_times is None:
+            self.release_times = np.zeros(offset, dtype=np.int64)
+        self.release_times = np.concatenate([self.release_times, release_times])
+        merged = OrderSet.concat([self.orders, orders], name=self.orders.name)
+        self.orders_df = None
+        # time_scale (Beobachtungsmodus "queue") nur aus den noch nicht abgeschlossenen Aufträgen
+        active = np.zeros(len(merged), dtype=bool)
+        for queue in self.queues:
+            active[list(queue)] = True
+        active[[order for order in self.running if order >= 0]] = True
+        active[[order_idx for _, order_idx in self._pending]] = True
+        active[offset:] = True
+        self._bind_orders(merged, active)
+        self.schedule_log.extend_orders(merged)
+        first_machine = merged.routes[offset:, 0]
+        for m, initial in enumerate(self._initial_queues):
+            initial.extend((offset + np.flatnonzero(first_machine == m)).tolist())
+
+        for release_time, order_idx in zip(release_times.tolist(), range(offset, len(self.order_ids))):
+            heapq.heappush(self._pending, (release_time, order_idx))
+        self._admit_released()
+        return np.arange(offset, len(self.order_ids))
+
+    def compact_orders(self):
+        """
+        Entfernt abgeschlossene Aufträge aus dem Datensatz, damit er im Dauerbetrieb mit
+        add_orders() nicht mit der Historie wächst. Die übrigen Aufträge (wartend, laufend,
+        noch nicht freigegeben) erhalten neue, dichte Indizes in bisheriger Reihenfolge;
+        Queues, laufende Operationen, Freigabe-Heap und schedule_log werden umgeschrieben,
+        Log-Einträge entfernter Aufträge und completed_orders entfallen.
+        Gibt die bisherigen Indizes der verbliebenen Aufträge zurück.
+        """
+        keep = np.zeros(len(self.order_ids), dtype=bool)
+        for queue in self.queues:
+            keep[list(queue)] = True
+        keep[[order for order in self.running if order >= 0]] = True
+        keep[[order_idx for _, order_idx in self._pending]] = True
+        kept = np.flatnonzero(keep)
+        new_index = np.full(len(keep), -1, dtype=np.int64)
+        new_index[kept] = np.arange(len(kept))
+
+        # Die Abbildung erhält die Reihenfolge, der Freigabe-Heap bleibt also gültig
+        remap = new_index.tolist()
+        for queue in self.queues:
+            remapped = [remap[order] for order in queue]
+            queue.clear()
+            queue.extend(remapped)
+        self.running[:] = [remap[order] if order >= 0 else -1 for order in self.running]
+        self._pending = [(release_time, remap[order_idx]) for release_time, order_idx in self._pending]
+        if self.release_times is not None:
+            self.release_times = self.release_times[kept]
+        self.completed_orders.clear()
+
+        orders = self.orders.subset(kept)
+        self.orders_df = None
+        # Normierung der Beobachtung bleibt bis zum nächsten add_orders() gleich
+        self._bind_orders(orders, time_scale=self.time_scale if self.observation == "queue" else None)
+        self.schedule_log.remap_orders(orders, new_index)
+        self._build_initial_queues()
+        return kept
+
+    def _admit_released(self):
+        """
+        Reiht alle Aufträge mit Freigabezeit <= current_time an ihrer ersten Maschine ein
+        (bei gleicher Freigabezeit in Indexreihenfolge).
+        """
+        pending = self._pending
+        while pending and pending[0][0] <= self.current_time:
+            _, order_idx = heapq.heappop(pending)
+            m = int(self.routes[order_idx, 0])
+            self.queues[m].append(order_idx)
+            self._queue_dirty[m] = True
+            self.n_open_orders += 1
+
+    def _prepare_queue_features(self, active=None, time_scale=None):
+        """
+        Statische Merkmale je (Auftrag, Maschine) für den Beobachtungsmodus "queue",
+        einmalig je Datensatz. Zeiten werden auf time_scale normiert, die mittlere
+        Arbeit je Maschine (Untergrenze des Makespans), sodass die Werte unabhängig
+        von der Datensatzgröße in derselben Größenordnung liegen. 'active' beschränkt
+        time_scale auf die noch nicht abgeschlossenen Aufträge (add_orders), damit es
+        im Dauerbetrieb nicht mit der Historie wächst; ein vorgegebenes time_scale bleibt
+        unverändert (compact_orders).
+        """
+        n_orders, n_machines = self.op_times.shape
+        valid = self.routes >= 0
+        route_times = np.where(valid, np.take_along_axis(self.op_times, np.maximum(self.routes, 0), axis=1), 0)
+        if time_scale is None:
+            work = route_times.sum() if active is None else route_times[active].sum()
+            time_scale = max(float(work) / n_machines, 1.0)
+        self.time_scale = time_scale
+
+        # Verbleibende Arbeit und Operationen ab jeder Routenposition (inklusive)
+        remaining = np.cumsum(route_times[:, ::-1], axis=1)[:, ::-1]
+        remaining_work = np.zeros((n_orders, n_machines))
+        remaining_ops = np.zeros((n_orders, n_machines))
+        for pos in range(n_machines):
+            rows = np.flatnonzero(valid[:, pos])
+            remaining_work[rows, self.routes[rows, pos]] = remaining[rows, pos]
+            remaining_ops[rows, self.routes[rows, pos]] = self.route_len[rows] - pos
+
+        static = np.empty((n_orders, n_machines, len(self.QUEUE_FEATURES)), dtype=np.float32)
+        static[..., 0] = 1.0
+        static[..., 1] = self.op_times / self.time_scale
+        static[..., 2] = self.setup_times / self.time_scale
+        static[..., 3] = remaining_work / self.time_scale
+        static[..., 4] = remaining_ops / n_machines
+        # Schlupf ohne current_time und ungekappt; _get_obs zieht die aktuelle Zeit ab und
+        # kappt erst das Ergebnis (sonst wäre der Schlupf ferner Deadlines zeitabhängig falsch)
+        static[..., 5] = (self.deadlines[:, None] - remaining_work) / self.time_scale
+        np.clip(static[..., :5], -self.OBS_CLIP, self.OBS_CLIP, out=static[..., :5])
+        self._queue_static = static
+        self._queue_dirty[:] = [True] * n_machines
+
+    def enable_profiling(self, profiler):
+        """
+        Misst die Phasen von step()/reset() mit 'profiler' (siehe profiling.py): die
+        PROFILED_METHODS und das Schreiben ins schedule_log ("env/log") werden als
+        Instanzattribute mit Zeitmessung überdeckt; ohne Aufruf bleibt der Step-Loop
+        unverändert. Jede Episode (bis done) wird mit Datensatz, Reward, Steps und
+        Simulationszeit als profiler.end_episode() abgeschlossen, übersprungene Ticks
+        zählen als "env/skipped_ticks".
+        Alle Überdeckungen sind Objekte statt Closures, die Umgebung bleibt picklebar.
+        """
+        self.profiler = profiler
+        for name, phase in self.PROFILED_METHODS:
+            setattr(self, name, profiler.timed(self, name, phase))
+        self.schedule_log.append = profiler.timed(self.schedule_log, "append", "env/log")
+
+        episode = _ProfiledEpisode(self, profiler)
+        self.step, self.reset = episode.step, episode.reset
+
+    def seed(self, seed=None):
+        """
+        Setzt den Zufallsgenerator für das Ziehen der Aufträge (sample_size).
+        """
+        self._sample_rng = np.random.default_rng(seed)
+        return [seed]
+
     def reset(self):
         """
         Setzt das Env auf einen Startzustand zurück:
         - Maschinen sind frei
-        - Warteschlangen werden geleert und 15 zufällige Aufträge zugewiesen
+        - Warteschlangen erhalten alle Aufträge (bzw. sample_size zufällige) an ihrer ersten Maschine
         - schedule_log wird geleert
         """
         self.current_time = 0
         self.done = False
         self.completed_orders.clear()
         self.schedule_log.clear()
-
-        for m in self.machines:
-            self.machines[m]['is_busy'] = False
-            self.machines[m]['current_order'] = None
-            self.machines[m]['time_to_finish'] = 0
-            self.machines[m]['start_time'] = None
-
-        for m in self.queue:
-            self.queue[m].clear()
-
-        # Beispiel: 15 zufällige Aufträge aus dem DataFrame
-        #subset = self.orders_df.sample(n=6, replace=False)
-        subset = self.orders_df #.sample(n=6, replace=False)
-
-        for _, row in subset.iterrows():
-            seq = row['OperationSequence'].split('->')
-            first_machine = seq[0]
-            self.queue[first_machine].append(row['OrderID'])
+        self.n_busy_machines = 0
+
+        n_machines = len(self.machine_names)
+        self.time_to_finish[:] = [0] * n_machines
+        self.running[:] = [-1] * n_machines
+        self.start_times[:] = [0] * n_machines
+        self._queue_dirty[:] = [True] * n_machines
+
+        n_orders = len(self.order_ids)
+        self._pending = []
+        if self.release_times is not None:
+            # Alle (bzw. sample_size zufällige) Aufträge in den Freigabe-Heap; was zu
+            # Zeit 0 freigegeben ist, steht sofort an
+            if self.sample_size is None or self.sample_size >= n_orders:
+                subset = np.arange(n_orders)
+            else:
+                subset = np.sort(self._sample_rng.choice(n_orders, size=self.sample_size, replace=False))
+            for queue in self.queues:
+                queue.clear()
+            self._pending = list(zip(self.release_times[subset].tolist(), subset.tolist()))
+            heapq.heapify(self._pending)
+            self.n_open_orders = 0
+            self._admit_released()
+        elif self.sample_size is None or self.sample_size >= n_orders:
+            # Startzustand aus dem vorberechneten Snapshot wiederherstellen
+            for queue, initial in zip(self.queues, self._initial_queues):
+                queue.clear()
+                queue.extend(initial)
+            self.n_open_orders = n_orders
+        else:
+            # Teilmenge per Indexauswahl statt DataFrame.sample
+            subset = np.sort(self._sample_rng.choice(n_orders, size=self.sample_size, replace=False))
+            first_machine = self.routes[subset, 0]
+            for m, queue in enumerate(self.queues):
+                queue.clear()
+                queue.extend(subset[first_machine == m].tolist())
+            self.n_open_orders = self.sample_size
 
         return self._get_obs()
 
     def step(self, action):
         """
         Führt einen Zeitschritt aus:
-          1) Update der laufenden Aufträge (Zeitfortschritt)
+          1) Update der laufenden Aufträge (Zeitfortschritt), freigegebene Aufträge einreihen
           2) Aktionen (wenn Maschinen idle)
           3) Belohnung & done-Bedingung
-          4) Rückgabe (obs, reward, done, info)
+          4) Optional (event_driven): Leerlauf-Ticks bis zum nächsten Ereignis überspringen
+          5) Rückgabe (obs, reward, done, info)
+
+        Reward je Tick (Zustand nach den Aktionen):
+          -1 je noch nicht abgeschlossenem Auftrag
+          +10 je in diesem Tick beendeter Operation
+          +100 je belegter Maschine, -100 je freier Maschine
+          + invalid_action_penalty
+        Im event_driven-Modus kommen die übersprungenen Ticks mit ihrem Grund-Reward
+        (ohne Fertig-Bonus und Strafen) hinzu.
+
+        Die zurückgegebene Beobachtung ist ein wiederverwendeter Puffer, der beim
+        nächsten step()/reset() überschrieben wird; zum Aufbewahren kopieren.
         """
         # Setze Strafe zurück
         self.invalid_action_penalty = 0
 
         # 1) Update laufende Aufträge
-        orders_finished_this_step = []
-        for m in self.machines:
-            if self.machines[m]['is_busy']:
-                self.machines[m]['time_to_finish'] -= self.time_step
-                if self.machines[m]['time_to_finish'] <= 0:
-                    finished_order = self.machines[m]['current_order']
-                    start_time = self.machines[m]['start_time']
-
-                    # Maschine wieder frei
-                    self.machines[m]['is_busy'] = False
-                    self.machines[m]['current_order'] = None
-                    self.machines[m]['start_time'] = None
-                    self.machines[m]['time_to_finish'] = 0
-
-                    # Gantt-Log
-                    self.schedule_log.append({
-                        "order_id": finished_order,
-                        "machine": m,
-                        "start_time": start_time,
-                        "finish_time": self.current_time
-                    })
-
-                    # Auftrag weiterleiten oder fertig
-                    self.move_to_next_machine(finished_order, m)
-                    orders_finished_this_step.append(finished_order)
+        n_finished = 0
+        running = self.running
+        time_to_finish = self.time_to_finish
+        for m in range(len(running)):
+            if running[m] < 0:
+                continue
+            time_to_finish[m] -= self.time_step
+            if time_to_finish[m] <= 0:
+                self._finish_operation(m)
+                n_finished += 1
+
+        # Aufträge, deren Freigabezeit erreicht ist, an ihrer ersten Maschine einreihen
+        if self._pending and self._pending[0][0] <= self.current_time:
+            self._admit_released()
 
         # 2) Aktionen (wenn Maschinen idle)
-        aM1, aM2, aM3 = action
-        self._handle_action_for_machine('M1', aM1)
-        self._handle_action_for_machine('M2', aM2)
-        self._handle_action_for_machine('M3', aM3)
+        if self.n_busy_machines < len(running):
+            for m in range(len(running)):
+                if running[m] < 0 and self.queues[m]:
+                    self._handle_action_for_machine(m, int(action[m]))
 
         # 3) Zeit +1
         self.current_time += self.time_step
 
-        # Reward: -Anzahl offener Aufträge, +10 pro fertiggestellten Auftrag
-        not_finished = len(self.orders_df) - len(self.completed_orders)
-        reward = -not_finished
-        reward += 10 * len(orders_finished_this_step)
-        # Füge Strafen für ungültige Aktionen hinzu
-        reward += self.invalid_action_penalty
-        for mach in self.machines:
-            if self.machines[m]['is_busy']:
-                reward+=100
-            else:
-                reward-=100
+        # Reward: -Anzahl offener Aufträge, +-100 je belegter/freier Maschine
+        n_idle = len(self.machine_names) - self.n_busy_machines
+        tick_reward = -self.n_open_orders + 100 * (self.n_busy_machines - n_idle)
+        # +10 pro beendeter Operation, Strafen für ungültige Aktionen
+        reward = tick_reward + 10 * n_finished + self.invalid_action_penalty
 
-        # done? Wenn alle Aufträge (aus df) abgearbeitet sind
-        if len(self.completed_orders) == len(self.orders_df):
+        # done? Wenn alle Aufträge (aus df) abgearbeitet und freigegeben sind
+        if self.n_open_orders == 0 and not self._pending and not self.streaming:
             self.done = True
 
-        return self._get_obs(), reward, self.done, {}
+        # 4) Ereignisgesteuert: Ticks ohne Zustandsänderung überspringen
+        skipped = 0
+        if self.event_driven and not self.done:
+            skipped = self._skip_to_next_event()
+            reward += skipped * tick_reward
+
+        return self._get_obs(), reward, self.done, {"skipped_steps": skipped}
+
+    def _finish_operation(self, m):
+        finished_order = self.running[m]
+        start_time = self.start_times[m]
+
+        # Maschine wieder frei
+        self.running[m] = -1
+        self.start_times[m] = 0
+        self.time_to_finish[m] = 0
+        self.n_busy_machines -= 1
+
+        # Gantt-Log
+        if self.log_schedule:
+            self.schedule_log.append(finished_order, m, start_time, self.current_time)
+
+        # Auftrag weiterleiten oder fertig
+        self.move_to_next_machine(finished_order, m)
+
+    # ---------------------------------------------------------------- Zustand sichern
+    # Schnappschuss des veränderlichen Simulationszustands, z.B. für Vorausschau-Rollouts
+    # (lookahead.py). Der Datensatz (OrderSet, release_times) gehört nicht dazu.
+
+    def get_state(self):
+        """
+        Kopie des Simulationszustands als Dict aus Zahlen, Listen und Tupeln (picklebar,
+        Aufwand linear in der Anzahl offener und fertiger Aufträge, keine NumPy-Kopien).
+        set_state() stellt ihn in dieser oder einer anderen Umgebung mit demselben
+        Datensatz wieder her.
+        """
+        return {
+            "current_time": self.current_time,
+            "done": self.done,
+            "time_to_finish": list(self.time_to_finish),
+            "running": list(self.running),
+            "start_times": list(self.start_times),
+            "queues": [tuple(queue) for queue in self.queues],
+            "pending": list(self._pending),
+            "completed_orders": tuple(self.completed_orders),
+            "n_open_orders": self.n_open_orders,
+            "n_busy_machines": self.n_busy_machines,
+            "log_size": len(self.schedule_log),
+        }
+
+    def set_state(self, state):
+        """
+        Stellt einen Zustand aus get_state() wieder her. Das schedule_log wird nur auf den
+        damaligen Stand gekürzt (Rücksprung in derselben Umgebung); Einträge einer anderen
+        Umgebung werden nicht übertragen.
+        """
+        self.current_time = state["current_time"]
+        self.done = state["done"]
+        self.time_to_finish[:] = state["time_to_finish"]
+        self.running[:] = state["running"]
+        self.start_times[:] = state["start_times"]
+        for queue, saved in zip(self.queues, state["queues"]):
+            queue.clear()
+            queue.extend(saved)
+        # Liste in Heap-Reihenfolge, bleibt ein gültiger Heap
+        self._pending = list(state["pending"])
+        self.completed_orders[:] = state["completed_orders"]
+        self.n_open_orders = state["n_open_orders"]
+        self.n_busy_machines = state["n_busy_machines"]
+        self._queue_dirty[:] = [True] * len(self.machine_names)
+        if self.log_schedule:
+            self.schedule_log.truncate(state["log_size"])
+
+    # ---------------------------------------------------------------- Online-Betrieb
+    # Statt step() mit simulierten Bearbeitungszeiten treiben externe Ereignisse den
+    # Zustand (siehe DispatchService in scheduler.py): die Uhr folgt der Werkstatt,
+    # Fertigmeldungen kommen von den Maschinen.
+
+    def advance_clock(self, time):
+        """
+        Stellt die Uhr auf 'time' vor und reiht bis dahin freigegebene Aufträge ein.
+        Restzeiten laufender Operationen sinken entsprechend, bleiben aber mindestens
+        time_step, bis complete_operation() die Operation meldet.
+        """
+        elapsed = time - self.current_time
+        if elapsed < 0:
+            raise ValueError(f"Zeit {time} liegt vor current_time {self.current_time}")
+        for m in range(len(self.running)):
+            if self.running[m] >= 0:
+                self.time_to_finish[m] = max(self.time_to_finish[m] - elapsed, self.time_step)
+        self.current_time = time
+        if self._pending and self._pending[0][0] <= time:
+            self._admit_released()
+
+    def complete_operation(self, machine):
+        """
+        Meldet die laufende Operation der Maschine (Index) zu current_time als fertig;
+        der Auftrag geht an seine Folgemaschine. Gibt den Auftragsindex zurück.
+        """
+        order_idx = self.running[machine]
+        if order_idx < 0:
+            raise ValueError(f"Maschine {self.machine_names[machine]} hat keine laufende Operation")
+        self._finish_operation(machine)
+        return order_idx
 
-    def _handle_action_for_machine(self, machine_name, action_val):
-        if self.machines[machine_name]['is_busy']:
+    def observe(self):
+        """
+        Beobachtung des aktuellen Zustands (wie von step() zurückgegeben), ohne ihn zu ändern.
+        """
+        return self._get_obs()
+
+    def dispatch(self, action):
+        """
+        Wendet die Aktionen auf alle freien Maschinen mit wartenden Aufträgen an, ohne
+        die Uhr zu bewegen (wie Schritt 2 von step()). Gibt die gestarteten Operationen
+        als Liste von (Maschinenindex, Auftragsindex) zurück.
+        """
+        started = []
+        for m in range(len(self.running)):
+            if self.running[m] < 0 and self.queues[m]:
+                self._handle_action_for_machine(m, int(action[m]))
+                started.append((m, self.running[m]))
+        return started
+
+    def action_masks(self, lookahead=True):
+        """
+        Gültige Aktionen für den nächsten step() als flache Bool-Maske der Länge
+        Maschinen * (max_queue_size + 1) (Format von MultiDiscrete-Masken in sb3_contrib).
+        Ausgewertet wird der Zustand, in dem step() die Aktionen anwendet, also nach
+        den Fertigmeldungen und Freigaben des nächsten Ticks (lookahead=False: der
+        aktuelle Zustand, für dispatch() im Online-Betrieb):
+          - Maschine belegt oder Queue leer: nur 0 (Aktion ohne Wirkung)
+          - Maschine frei mit L wartenden Aufträgen: 1..min(L, max_queue_size);
+            0 entfällt, da es ohnehin den ersten Auftrag wählt
+        """
+        n_actions = self.max_queue_size + 1
+        mask = np.zeros(len(self.machine_names) * n_actions, dtype=bool)
+        queue_len = [len(queue) for queue in self.queues]
+        free = [order < 0 for order in self.running]
+        for m, order in enumerate(self.running):
+            if lookahead and order >= 0 and self.time_to_finish[m] - self.time_step <= 0:
+                free[m] = True
+                following = int(self.next_machine[order, m])
+                if following >= 0:
+                    queue_len[following] += 1
+        # Im nächsten Tick freigegebene Aufträge: Teilbaum des Heaps ab der Wurzel
+        pending = self._pending
+        nodes = [0] if lookahead and pending else []
+        while nodes:
+            i = nodes.pop()
+            if i < len(pending) and pending[i][0] <= self.current_time:
+                queue_len[int(self.routes[pending[i][1], 0])] += 1
+                nodes += [2 * i + 1, 2 * i + 2]
+
+        for m in range(len(self.machine_names)):
+            offset = m * n_actions
+            if free[m] and queue_len[m] > 0:
+                mask[offset + 1:offset + 1 + min(queue_len[m], self.max_queue_size)] = True
+            else:
+                mask[offset] = True
+        return mask
+
+    def _skip_to_next_event(self):
+        """
+        Springt über alle Ticks, in denen sich nichts ändert: keine freie Maschine mit
+        wartenden Aufträgen, keine Maschine, die fertig wird, und keine Freigabe. Danach
+        steht die Uhr einen Tick vor dem nächsten Fertigstellungszeitpunkt bzw. auf der
+        nächsten Freigabezeit, sodass der nächste step() diese wie im minütlichen Modus
+        verarbeitet.
+        Gibt die Anzahl übersprungener Ticks zurück.
+        """
+        if self.n_busy_machines == 0 and not self._pending:
+            return 0
+
+        remaining = math.inf
+        for m in range(len(self.running)):
+            if self.running[m] >= 0:
+                remaining = min(remaining, self.time_to_finish[m])
+            elif self.queues[m]:
+                # Entscheidung nötig -> nicht springen
+                return 0
+
+        ticks = math.ceil(remaining / self.time_step) - 1 if remaining < math.inf else math.inf
+        if self._pending:
+            ticks = min(ticks, math.ceil((self._pending[0][0] - self.current_time) / self.time_step))
+        if ticks <= 0:
+            return 0
+
+        for m in range(len(self.running)):
+            if self.running[m] >= 0:
+                self.time_to_finish[m] -= ticks * self.time_step
+        self.current_time += ticks * self.time_step
+        return ticks
+
+    def _handle_action_for_machine(self, machine, action_val):
+        if self.running[machine] >= 0:
             return
 
-        queue_size = len(self.queue[machine_name])
+        queue_size = len(self.queues[machine])
 
         # Falls Queue nicht leer, Aktion=0 => forced pick = 1 (den ersten Auftrag)
         if action_val == 0 and queue_size > 0:
@@ -177,68 +692,277 @@ class ThreeMachineEnv(gym.Env):
             # falls action_val == 0, aber wir haben das oben schon behandelt
             idx = 0
 
-        chosen_order_id = list(self.queue[machine_name])[idx]
-        self.queue[machine_name].remove(chosen_order_id)
-        self.start_order(machine_name, chosen_order_id)
+        # Ohne Kopie der Queue: Zugriff und Entfernen direkt über den Index
+        queue = self.queues[machine]
+        chosen_order = queue[idx]
+        del queue[idx]
+        self._queue_dirty[machine] = True
+        self.start_order(machine, chosen_order)
 
-    def start_order(self, machine_name, order_id):
+    def start_order(self, machine, order_idx):
         """
-        Maschine 'machine_name' beginnt den Auftrag 'order_id' (Rüstzeit + Prozesszeit).
+        Maschine mit Index 'machine' beginnt den Auftrag mit Index 'order_idx' (Rüstzeit + Prozesszeit).
         """
-        row = self.orders_df[self.orders_df['OrderID'] == order_id].iloc[0]
-        ruest = row[f"{machine_name}_Ruest"]
-        proc = row[f"{machine_name}_Proc"]
-        total_time = int(ruest + proc)
-
-        self.machines[machine_name]['is_busy'] = True
-        self.machines[machine_name]['current_order'] = order_id
-        self.machines[machine_name]['time_to_finish'] = total_time
-        self.machines[machine_name]['start_time'] = self.current_time
+        self.running[machine] = order_idx
+        self.time_to_finish[machine] = int(self.op_times[order_idx, machine])
+        self.start_times[machine] = self.current_time
+        self.n_busy_machines += 1
 
-    def move_to_next_machine(self, order_id, current_machine):
+    def move_to_next_machine(self, order_idx, current_machine):
         """
         Schiebt Auftrag in die Queue der nächsten Maschine laut OperationSequence.
         Wenn keine weitere Operation, gilt der Auftrag als vollständig.
         """
-        row = self.orders_df[self.orders_df['OrderID'] == order_id].iloc[0]
-        seq = row['OperationSequence'].split('->')
-        idx_machine = seq.index(current_machine)
+        next_machine = int(self.next_machine[order_idx, current_machine])
 
-        if idx_machine < len(seq) - 1:
-            next_machine = seq[idx_machine + 1]
-            self.queue[next_machine].append(order_id)
+        if next_machine >= 0:
+            self.queues[next_machine].append(order_idx)
+            self._queue_dirty[next_machine] = True
         else:
-            self.completed_orders.append(order_id)
+            self.completed_orders.append(self.order_ids[order_idx])
+            self.n_open_orders -= 1
 
     def _get_obs(self):
         """
-        Beobachtung (State) in Form eines 7D-Vektors:
+        Beobachtung (State) in Form eines (2 * Maschinen + 1)-Vektors:
           - time_to_finish je Maschine,
           - Queue-Längen je Maschine,
           - current_time
+        Im Modus "queue" sind diese Werte normiert (Zeiten / time_scale, Queue-Längen /
+        max_queue_size) und es folgen je Maschine max_queue_size Plätze mit den
+        QUEUE_FEATURES der dort wartenden Aufträge in Queue-Reihenfolge (leere Plätze = 0):
+          present, op_time, setup_time, remaining_work (inkl. dieser Operation),
+          remaining_ops / Maschinen, slack = (Deadline - jetzt - remaining_work)
+        Geschrieben wird in den vorallokierten Puffer self._obs.
         """
-        obs = np.array([
-            float(self.machines['M1']['time_to_finish']),
-            float(self.machines['M2']['time_to_finish']),
-            float(self.machines['M3']['time_to_finish']),
-            float(len(self.queue['M1'])),
-            float(len(self.queue['M2'])),
-            float(len(self.queue['M3'])),
-            float(self.current_time)
-        ], dtype=np.float32)
+        obs = self._obs
+        if self.observation == "queue":
+            self._fill_queue_obs(obs)
+            return obs
+        n_machines = len(self.machine_names)
+        obs[:n_machines] = self.time_to_finish
+        obs[n_machines:2 * n_machines] = [len(queue) for queue in self.queues]
+        obs[-1] = self.current_time
         return obs
 
+    def _fill_queue_obs(self, obs):
+        n_machines = len(self.machine_names)
+        k = self.max_queue_size
+        scale = self.time_scale
+        clip = self.OBS_CLIP
+        obs[:n_machines] = [min(t / scale, clip) for t in self.time_to_finish]
+        obs[n_machines:2 * n_machines] = [min(len(queue) / k, clip) for queue in self.queues]
+        obs[2 * n_machines] = min(self.current_time / scale, clip)
+
+        # Statische Merkmale nur für Maschinen, deren Queue sich geändert hat
+        slots = self._queue_slots
+        for m, queue in enumerate(self.queues):
+            if not self._queue_dirty[m]:
+                continue
+            self._queue_dirty[m] = False
+            top = list(islice(queue, k))
+            slots[m] = 0.0
+            self._slack_base[m] = 0.0
+            if top:
+                slots[m, :len(top)] = self._queue_static[top, m]
+                self._slack_base[m, :len(top)] = self._queue_static[top, m, 5]
+
+        # Schlupf hängt von der aktuellen Zeit ab (nur belegte Plätze, present = 1).
+        # Einzelne ufuncs mit out= statt np.clip: deutlich weniger Overhead je Aufruf
+        slack = self._slack
+        np.multiply(slots[..., 0], -self.current_time / scale, out=slack)
+        np.add(slack, self._slack_base, out=slack)
+        np.maximum(slack, -clip, out=slack)
+        np.minimum(slack, clip, out=slots[..., 5])
+
     def render(self, mode='human'):
         """
         Konsolenausgabe zur Übersicht.
         """
         print(f"Time={self.current_time}")
-        for m in ['M1', 'M2', 'M3']:
-            print(f"  {m}: busy={self.machines[m]['is_busy']}, "
-                  f"order={self.machines[m]['current_order']}, "
-                  f"time_remaining={self.machines[m]['time_to_finish']} min, "
-                  f"queue={list(self.queue[m])}")
+        for m, name in enumerate(self.machine_names):
+            current_order = self.running[m]
+            print(f"  {name}: busy={current_order >= 0}, "
+                  f"order={self.order_ids[current_order] if current_order >= 0 else None}, "
+                  f"time_remaining={self.time_to_finish[m]} min, "
+                  f"queue={self.order_ids[list(self.queues[m])].tolist()}")
         print(f"  Completed orders: {len(self.completed_orders)}")
         #print("corders)"+str(len(self.completed_orders)))
         #print("dforders"+str(len(self.orders_df)))
         #print(self.orders_df)
+
+
+
+class ThreeMachineEnv(MachineEnv):
+    """
+    Einfaches Scheduling-Env mit 3 Maschinen (M1, M2, M3).
+    """
+
+    def __init__(self, orders_df, max_queue_size=10, time_step=1, event_driven=False, sample_size=None,
+                 log_schedule=True, observation="basic"):
+        super(ThreeMachineEnv, self).__init__(orders_df, max_queue_size=max_queue_size, time_step=time_step,
+                                              event_driven=event_driven, machines=['M1', 'M2', 'M3'],
+                                              sample_size=sample_size, log_schedule=log_schedule,
+                                              observation=observation)
+
+
+class _ProfiledEpisode:
+    """
+    step()/reset() einer Umgebung nach enable_profiling(): zählt übersprungene Ticks
+    und schließt jede Episode im Profiler ab.
+    """
+
+    def __init__(self, env, profiler):
+        self.env = env
+        self.profiler = profiler
+        self.timed_step, self.timed_reset = env.step, env.reset
+        self.reward = 0.0
+        self.steps = 0
+
+    def step(self, action):
+        obs, reward, done, info = self.timed_step(action)
+        self.profiler.count("env/skipped_ticks", info["skipped_steps"])
+        self.reward += reward
+        self.steps += 1
+        if done:
+            self.profiler.end_episode(dataset=self.env.orders.name, reward=self.reward, steps=self.steps,
+                                      sim_time=self.env.current_time)
+        return obs, reward, done, info
+
+    def reset(self, *args, **kwargs):
+        self.reward, self.steps = 0.0, 0
+        return self.timed_reset(*args, **kwargs)
+
+
+class MultiOrderEnv(MachineEnv):
+    """
+    MachineEnv, das bei jedem reset() den nächsten Auftragsdatensatz aus einer
+    Liste von CSV-Dateien lädt: der Reihe nach oder (shuffle=True) zufällig gezogen.
+    Eingelesene Dateien werden kompiliert im Speicher gehalten; mit cache_dir
+    (siehe ordercache.load_order_cache) kommen sie ohne Parsen aus dem OrderCache.
+    Gedacht für das parallele Training mit SubprocVecEnv, bei dem jeder Worker seine
+    eigenen Dateien bearbeitet. Alle Dateien müssen dieselben Maschinen enthalten (feste Spaces).
+    """
+
+    def __init__(self, order_files, shuffle=False, seed=None, cache_dir=None, **env_kwargs):
+        self.order_files = list(order_files)
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+        self._file_pos = 0
+        self._orders_cache = {}
+        self._order_cache = OrderCache.open(cache_dir) if cache_dir is not None else None
+        self._machines = env_kwargs.get('machines')
+        super(MultiOrderEnv, self).__init__(self._load_orders(self.order_files[0]), **env_kwargs)
+
+    def _load_orders(self, path):
+        if path not in self._orders_cache:
+            if self._order_cache is not None:
+                self._orders_cache[path] = self._order_cache[os.path.basename(path)]
+            else:
+                self._orders_cache[path] = OrderSet.from_frame(pd.read_csv(path), machines=self._machines,
+                                                               name=os.path.basename(path))
+        return self._orders_cache[path]
+
+    def reset(self):
+        if self.shuffle:
+            path = self.order_files[self._rng.integers(len(self.order_files))]
+        else:
+            path = self.order_files[self._file_pos % len(self.order_files)]
+            self._file_pos += 1
+        self.current_file = path
+        self.set_orders(self._load_orders(path))
+        return super(MultiOrderEnv, self).reset()
+
+
+class ScenarioEnv(MachineEnv):
+    """
+    MachineEnv, das bei jedem reset() einen frischen synthetischen Datensatz mit
+    n_orders Aufträgen aus einem ScenarioModel (siehe scenario.py) zieht.
+    Mit seed ist die Folge der Datensätze reproduzierbar.
+    """
+
+    def __init__(self, scenario, n_orders=50, seed=None, **env_kwargs):
+        self.scenario = scenario
+        self.n_orders = n_orders
+        self._scenario_rng = np.random.default_rng(seed)
+        super(ScenarioEnv, self).__init__(scenario.sample_order_set(n_orders, seed=self._scenario_rng),
+                                          machines=scenario.machine_names, **env_kwargs)
+
+    def reset(self):
+        self.set_orders(self.scenario.sample_order_set(self.n_orders, seed=self._scenario_rng))
+        return super(ScenarioEnv, self).reset()
+
+
+# =============================================================================
+# Test-Abschnitt
+# =============================================================================
+
+def test_queue_slack():
+    """
+    Testet, ob der Schlupf im Beobachtungsmodus "queue" für einen wartenden Auftrag mit
+    ferner Deadline (ungekappter Grundwert > OBS_CLIP) zu jedem Zeitpunkt
+    (Deadline - jetzt - Restarbeit) / time_scale entspricht, gekappt auf OBS_CLIP.
+    """
+    orders = pd.DataFrame({
+        "OrderID": [1, 2], "OperationSequence": ["M1", "M1"],
+        "M1_Ruest": [0, 0], "M1_Proc": [600, 10],
+        "M2_Ruest": [0, 0], "M2_Proc": [0, 0],
+        "M3_Ruest": [0, 0], "M3_Proc": [0, 0],
+        "Deadline_days": [1, 40],
+    })
+    env = MachineEnv(orders, max_queue_size=2, machines=["M1", "M2", "M3"], observation="queue")
+    env.reset()
+    # Auftrag 1 belegt M1, Auftrag 2 wartet auf Platz 0 der Queue von M1
+    obs = env.step([1, 0, 0])[0]
+    base = (40 * MINUTES_PER_DAY - 10) / env.time_scale
+    checks = []
+    while env.running[0] == 0:
+        expected = np.clip(base - env.current_time / env.time_scale, -env.OBS_CLIP, env.OBS_CLIP)
+        checks.append(abs(env._queue_slots[0, 0, 5] - expected) < 1e-4)
+        obs = env.step([0, 0, 0])[0]
+    return [("Queue-Schlupf: Grundwert > OBS_CLIP", base > env.OBS_CLIP),
+            ("Queue-Schlupf: ferne Deadline korrekt", len(checks) > 0 and all(checks))]
+
+
+def test_profiling_subprocess():
+    """
+    Testet, ob eine Umgebung mit enable_profiling() picklebar bleibt: MaskablePPO prüft
+    die Aktionsmasken über SubprocVecEnv.get_attr("action_masks"), das die (überdeckte)
+    Methode aus dem Worker-Prozess überträgt.
+    """
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+
+    orders = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                      "GitOrders", "kmu_sample_orders4.csv"))
+
+    def make_env():
+        # Import im Worker, damit die Klassen auch beim Start als Skript aus dem Modul kommen
+        from environment import MachineEnv
+        from profiling import Profiler
+        env = MachineEnv(orders, max_queue_size=5, event_driven=True, log_schedule=False)
+        env.enable_profiling(Profiler())
+        return env
+
+    vec_env = SubprocVecEnv([make_env, make_env])
+    try:
+        masks = vec_env.get_attr("action_masks")
+        vec_env.reset()
+        vec_env.step(np.zeros((2, len(vec_env.action_space.nvec)), dtype=np.int64))
+        profilers = vec_env.get_attr("profiler")
+    finally:
+        vec_env.close()
+    return [("Profiling: get_attr('action_masks') über SubprocVecEnv", len(masks) == 2 and all(map(callable, masks))),
+            ("Profiling: Messungen im Worker", all(p.counts["env/step"] == 1 for p in profilers))]
+
+
+def run_all_tests():
+    """Führt alle Tests durch und gibt deren Ergebnisse als Liste von (Testname, Ergebnis) zurück."""
+    results = []
+    results.extend(test_queue_slack())
+    results.extend(test_profiling_subprocess())
+    return results
+
+
+if __name__ == "__main__":
+    for test_name, passed in run_all_tests():
+        print(f"{test_name}: {'OK' if passed else 'FEHLER'}")
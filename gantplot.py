@@ -1,85 +1,174 @@
+import re
+import zlib
+
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
 import matplotlib.colors as mcolors
 import matplotlib.patches as mpatches
+from matplotlib.figure import Figure
+
+# Gantt-Diagramm für schedule_logs beliebiger Größe.
+# Je Maschine werden alle Balken in einem einzigen broken_barh-Aufruf gezeichnet
+# (eine Collection statt eines Patches je Operation). Für sehr große Logs lassen sich
+# ein Zeitfenster ausschneiden und schmale Balken zusammenfassen (downsample_schedule);
+# mit output_file wird ohne GUI direkt in eine Datei gerendert.
+
+# Farbe für zusammengefasste Balken (mehrere Aufträge in einem Block)
+MERGED_COLOR = "#9e9e9e"
+# Obergrenze, bis zu der Beschriftungen gezeichnet werden
+MAX_LABELS = 300
+
+
+def natural_sorted(machines):
+    # Maschinen natürlich sortiert (M2 vor M10, A10 vor M2): Ziffernfolgen als Zahlen vergleichen.
+    # re.split mit Gruppe liefert abwechselnd Text und Zahl, die Typen je Position passen also
+    return sorted(machines, key=lambda m: [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", str(m))])
+
+
+def order_colors(order_ids):
+    """
+    Farbe je Order-ID über den goldenen Schnitt im Farbkreis: benachbarte IDs
+    unterscheiden sich deutlich, und es gibt keine Wiederholung nach 20 Farben wie bei tab20.
+    Nicht numerische IDs werden über einen stabilen Hash (crc32) abgebildet, sodass
+    dieselbe ID in jedem Aufruf dieselbe Farbe erhält.
+    """
+    order_ids = np.asarray(order_ids)
+    try:
+        keys = order_ids.astype(np.float64)
+    except (TypeError, ValueError):
+        unique_ids, inverse = np.unique(order_ids.astype(str), return_inverse=True)
+        keys = np.array([zlib.crc32(oid.encode()) for oid in unique_ids], dtype=np.float64)[inverse]
+    hues = (keys * 0.618033988749895) % 1.0
+    hsv = np.stack([hues, np.full_like(hues, 0.65), np.full_like(hues, 0.85)], axis=-1)
+    return mcolors.hsv_to_rgb(hsv)
+
+
+def _schedule_frame(schedule_log):
+    if isinstance(schedule_log, pd.DataFrame):
+        return schedule_log
+    return pd.DataFrame(list(schedule_log), columns=["order_id", "machine", "start_time", "finish_time"])
 
 
-def plot_gantt(schedule_log):
+def downsample_schedule(machine_idx, start, finish, order_ids, resolution):
+    """
+    Fasst je Maschine aufeinanderfolgende Balken, die schmaler als 'resolution' sind
+    und höchstens 'resolution' auseinanderliegen, zu einem Block zusammen (bei der
+    Auflösung der Grafik ohnehin nicht unterscheidbar). Gibt die Arrays der Blöcke und
+    je Block die Anzahl zusammengefasster Balken zurück.
+    """
+    order = np.lexsort((start, machine_idx))
+    machine_idx, start, finish, order_ids = machine_idx[order], start[order], finish[order], order_ids[order]
+
+    small = (finish - start) < resolution
+    joins = np.zeros(len(start), dtype=bool)
+    joins[1:] = (small[1:] & small[:-1] & (machine_idx[1:] == machine_idx[:-1])
+                 & (start[1:] - finish[:-1] <= resolution))
+    first = np.flatnonzero(~joins)
+    counts = np.diff(np.append(first, len(start)))
+    return (machine_idx[first], start[first], np.maximum.reduceat(finish, first),
+            order_ids[first], counts)
+
+
+def plot_gantt(schedule_log, output_file=None, time_window=None, max_bars=20000, resolution=None,
+               label_min_width=50, max_legend_entries=None, title="Gantt Chart of Orders",
+               figsize=(12, 7), dpi=100):
     """
     Plot eines Gantt-Diagramms für die Einträge in schedule_log.
-    Jeder Eintrag ist ein Dict:
+    schedule_log ist ein DataFrame (z.B. env.schedule_log.to_frame()) oder eine
+    Liste von Dicts mit den Spalten bzw. Schlüsseln:
       { "order_id": int, "machine": str, "start_time": float, "finish_time": float }
+
+    output_file:     Datei (z.B. .png, .svg, .pdf), in die ohne GUI gerendert wird;
+                     ohne Angabe wird das Diagramm mit plt.show() angezeigt
+    time_window:     (von, bis) - nur Operationen in diesem Zeitraum, an den Rändern gekappt
+    max_bars:        ab dieser Anzahl Balken werden schmale Balken zusammengefasst
+    resolution:      Breite, unter der Balken zusammengefasst werden (Standard: Zeitraum / 2000)
+    label_min_width: Mindestbreite eines Balkens für die Beschriftung mit der Order-ID
+    max_legend_entries: höchstens so viele Aufträge in der Legende, danach ein Eintrag "…"
+                     (Standard: alle)
+    Gibt die Figure zurück.
     """
-    # Maschinen in Reihen unterteilen
-    machine_list = sorted(list(set(entry["machine"] for entry in schedule_log)))
-
-    # Figure vergrößern
-    fig, ax = plt.subplots(figsize=(12, 7))
-
-    # Liste aller Order-IDs
-    order_ids = sorted(list(set(entry["order_id"] for entry in schedule_log)))
-
-    # Statt random-Farben => vordefinierte Farbmap (tab20 hat 20 Farben)
-    # Falls es mehr als 20 Order-IDs gibt, kann man die Palette mehrfach durchlaufen
-    cmap = plt.cm.get_cmap("tab20", len(order_ids))
-
-    # Dictionary: Order-ID -> Farbe
-    color_map = {}
-    for i, oid in enumerate(order_ids):
-        # Damit wir bei sehr vielen Order-IDs nicht out-of-range gehen, modulo benutzen
-        color_map[oid] = cmap(i % 20)
-
-    # Pro Maschine => y-Position
-    machine_ypos = {m: i for i, m in enumerate(machine_list)}
-
-    # Zum Sammeln der Legendeneinträge
-    legend_patches = []
-
-    # Balkenplot
-    for entry in schedule_log:
-        m = entry["machine"]
-        y_pos = machine_ypos[m]
-        start = entry["start_time"]
-        finish = entry["finish_time"]
-        duration = finish - start
-        oid = entry["order_id"]
-
-        ax.barh(
-            y=y_pos,
-            width=duration,
-            left=start,
-            height=0.5,
-            color=color_map[oid],
-            edgecolor="black"
-        )
-
-        # Nur beschriften, wenn der Balken lang genug ist
-        if duration > 50:  # Schwellenwert anpassen
-            ax.text(
-                x=start + duration / 2,
-                y=y_pos,
-                s=f"{oid}",  # Kürzeres Label
-                va='center',
-                ha='center',
-                color='white',
-                fontsize=8
-            )
-
-    # Für die Legende: jedes Order-ID einmal aufnehmen
-    for oid in order_ids:
-        patch = mpatches.Patch(color=color_map[oid], label=f"Order {oid}")
-        legend_patches.append(patch)
-
-    # Legende anzeigen
-    ax.legend(handles=legend_patches, bbox_to_anchor=(1.05, 1), loc='upper left')
-
-    ax.set_yticks(list(machine_ypos.values()))
-    ax.set_yticklabels(list(machine_ypos.keys()))
+    df = _schedule_frame(schedule_log)
+    order_ids = df["order_id"].to_numpy()
+    start = df["start_time"].to_numpy(dtype=np.float64)
+    finish = df["finish_time"].to_numpy(dtype=np.float64)
+    unique_machines, machine_idx = np.unique(df["machine"].astype(str).to_numpy(), return_inverse=True)
+    machine_list = natural_sorted(unique_machines)
+    position = {machine: i for i, machine in enumerate(machine_list)}
+    machine_idx = np.array([position[m] for m in unique_machines], dtype=np.int64)[machine_idx]
+
+    if time_window is not None:
+        t0, t1 = time_window
+        visible = (finish > t0) & (start < t1)
+        order_ids, machine_idx = order_ids[visible], machine_idx[visible]
+        start, finish = np.maximum(start[visible], t0), np.minimum(finish[visible], t1)
+
+    counts = np.ones(len(start), dtype=np.int64)
+    if len(start) > max_bars:
+        if resolution is None:
+            resolution = (finish.max() - start.min()) / 2000
+        machine_idx, start, finish, order_ids, counts = downsample_schedule(
+            machine_idx, start, finish, order_ids, resolution)
+
+    # Headless: Figure ohne pyplot, damit kein GUI-Backend nötig ist
+    if output_file is not None:
+        fig = Figure(figsize=figsize, dpi=dpi)
+        ax = fig.subplots()
+    else:
+        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+
+    colors = order_colors(order_ids)
+    colors[counts > 1] = mcolors.to_rgb(MERGED_COLOR)
+    widths = finish - start
+    # Ränder nur, solange die Balken breit genug sind, um sie zu erkennen
+    linewidth = 0.5 if len(start) <= 1000 else 0.0
+
+    # Ein broken_barh (eine Collection) je Maschine
+    for y_pos in range(len(machine_list)):
+        rows = np.flatnonzero(machine_idx == y_pos)
+        if rows.size:
+            ax.broken_barh(np.column_stack([start[rows], widths[rows]]), (y_pos - 0.25, 0.5),
+                           facecolors=colors[rows], edgecolor="black", linewidth=linewidth)
+
+    # Nur beschriften, wenn der Balken lang genug ist und es nicht zu viele werden
+    labeled = np.flatnonzero((widths > label_min_width) & (counts == 1))
+    if labeled.size <= MAX_LABELS:
+        for i in labeled:
+            ax.text(x=start[i] + widths[i] / 2, y=machine_idx[i], s=f"{order_ids[i]}",
+                    va='center', ha='center', color='white', fontsize=8)
+
+    # Legende: jede Order-ID einmal, sortiert (gemischte, nicht sortierbare IDs in Reihenfolge des Auftretens)
+    try:
+        unique_orders = np.unique(order_ids[counts == 1])
+    except TypeError:
+        unique_orders = pd.unique(order_ids[counts == 1])
+    shown = unique_orders if max_legend_entries is None else unique_orders[:max_legend_entries]
+    legend_patches = [mpatches.Patch(color=color, label=f"Order {oid}")
+                      for oid, color in zip(shown, order_colors(shown))]
+    if len(shown) < len(unique_orders):
+        legend_patches.append(mpatches.Patch(color="white", label=f"… ({len(unique_orders) - len(shown)} weitere)"))
+    if (counts > 1).any():
+        legend_patches.append(mpatches.Patch(color=MERGED_COLOR, label="mehrere Aufträge"))
+    if legend_patches:
+        ax.legend(handles=legend_patches, bbox_to_anchor=(1.05, 1), loc='upper left')
+
+    ax.set_yticks(range(len(machine_list)))
+    ax.set_yticklabels(machine_list)
+    if time_window is not None:
+        ax.set_xlim(time_window)
+    elif len(start):
+        ax.set_xlim(start.min(), finish.max())
     ax.set_xlabel("Time")
     ax.set_ylabel("Machine")
-    ax.set_title("Gantt Chart of Orders")
+    ax.set_title(title)
 
-    # M1 oben lassen, wenn man das so haben möchte:
-    plt.gca().invert_yaxis()
+    # M1 oben
+    ax.invert_yaxis()
 
-    plt.tight_layout()
-    plt.show()
\ No newline at end of file
+    fig.tight_layout()
+    if output_file is not None:
+        fig.savefig(output_file)
+    else:
+        plt.show()
+    return fig
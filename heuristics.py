@@ -0,0 +1,173 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from ordercache import OrderSet
+
+# Klassische Prioritätsregeln (Dispatching Rules) als schneller Scheduler ohne Gym-Stepping.
+# Ergebnis ist ein schedule_log wie von MachineEnv; die Zeitlogik entspricht der
+# Umgebung: eine freie Maschine startet sofort den Auftrag mit der höchsten Priorität
+# ihrer Queue, ein fertiger Auftrag steht im selben Zeitpunkt an der Folgemaschine an.
+#
+#   FIFO     - Ankunftsreihenfolge in der Queue (entspricht Aktion 1 in MachineEnv)
+#   SPT      - kürzeste Belegungszeit (Rüsten + Bearbeiten) auf dieser Maschine
+#   EDD      - früheste Deadline
+#   LST      - geringster Schlupf: Deadline - jetzt - verbleibende Arbeit
+#   JOHNSON  - Johnson-Regel für die Flussrouten nach CDS (Campbell, Dudek, Smith):
+#              Ersatzproblem k bildet jede Route auf zwei virtuelle Maschinen ab (Summe
+#              der ersten bzw. letzten k Operationen, höchstens Routenlänge - 1);
+#              dispatch_schedule plant alle Ersatzprobleme k = 1 .. längste Route - 1 und
+#              behält den Plan mit dem kleinsten Makespan. Bei Routen mit 2 Operationen
+#              ist das die klassische Johnson-Regel. Ohne vollständigen Plan (statische
+#              Schlüssel für DispatchService oder Rollouts) gilt das letzte Ersatzproblem
+
+RULES = ("FIFO", "SPT", "EDD", "LST", "JOHNSON")
+# Schlüsselabstand der zweiten Johnson-Gruppe; größer als jede Summe von Operationszeiten
+JOHNSON_GROUP_OFFSET = 1e12
+
+
+def priority_keys(orders, rule, cds_k=None):
+    """
+    Statische Prioritätsschlüssel je (Auftrag, Maschine), kleiner = zuerst.
+    Bei LST fällt 'jetzt' weg, da es für alle Aufträge einer Queue gleich ist.
+    FIFO hat keinen statischen Schlüssel (None), dort zählt die Einreihungsnummer.
+    cds_k: CDS-Ersatzproblem für JOHNSON (Standard: Routenlänge - 1 je Auftrag).
+    """
+    if rule not in RULES:
+        raise ValueError(f"Unbekannte Regel '{rule}', erlaubt: {RULES}")
+    if rule == "FIFO":
+        return None
+
+    op_times = orders.op_times
+    if rule == "SPT":
+        return op_times.astype(np.float64)
+    if rule == "EDD":
+        return np.repeat(orders.deadlines.astype(np.float64)[:, None], op_times.shape[1], axis=1)
+
+    n_orders, n_machines = op_times.shape
+    route_times = np.where(orders.routes >= 0,
+                           np.take_along_axis(op_times, np.maximum(orders.routes, 0), axis=1), 0)
+
+    if rule == "LST":
+        # verbleibende Arbeit ab jeder Position der Route (inklusive)
+        remaining = np.cumsum(route_times[:, ::-1], axis=1)[:, ::-1]
+        keys = np.zeros((n_orders, n_machines), dtype=np.float64)
+        for pos in range(n_machines):
+            valid = orders.routes[:, pos] >= 0
+            keys[valid, orders.routes[valid, pos]] = orders.deadlines[valid] - remaining[valid, pos]
+        return keys
+
+    # JOHNSON (CDS-Ersatzproblem k, je Auftrag auf Routenlänge - 1 begrenzt)
+    prefix = np.zeros((n_orders, n_machines + 1), dtype=route_times.dtype)
+    np.cumsum(route_times, axis=1, out=prefix[:, 1:])
+    rows = np.arange(n_orders)
+    route_len = orders.route_len
+    k = np.maximum(route_len - 1, 0)
+    if cds_k is not None:
+        k = np.minimum(k, cds_k)
+    a = prefix[rows, k]                                        # erste k Operationen
+    b = prefix[rows, route_len] - prefix[rows, route_len - k]   # letzte k Operationen
+    # Gruppe 1 (a <= b) aufsteigend nach a, danach Gruppe 2 absteigend nach b. Der Abstand
+    # der Gruppen ist fest (nicht vom Datensatz abhängig), damit Schlüssel auch stückweise
+    # für nachgereichte Aufträge berechnet werden können (DispatchService)
+    johnson = np.where(a <= b, a, JOHNSON_GROUP_OFFSET - b)
+    return np.repeat(johnson.astype(np.float64)[:, None], n_machines, axis=1)
+
+
+def dispatch_schedule(orders, rule="SPT", machines=None):
+    """
+    Erstellt in einem Durchlauf einen vollständigen Plan nach der Prioritätsregel 'rule'.
+    'orders' ist ein Auftrags-DataFrame oder ein OrderSet.
+    Gibt das schedule_log als Liste von Dicts zurück:
+      { "order_id", "machine", "start_time", "finish_time" }
+    """
+    rule = rule.upper()
+    if not isinstance(orders, OrderSet):
+        orders = OrderSet.from_frame(orders, machines=machines)
+    if rule != "JOHNSON":
+        return _dispatch(orders, rule, priority_keys(orders, rule))
+
+    # CDS: alle Ersatzprobleme planen, das letzte (Standardschlüssel) gewinnt bei Gleichstand
+    best, best_makespan = None, None
+    for k in range(max(int(orders.route_len.max(initial=1)) - 1, 1), 0, -1):
+        schedule_log = _dispatch(orders, rule, priority_keys(orders, rule, cds_k=k))
+        makespan = max((entry["finish_time"] for entry in schedule_log), default=0)
+        if best is None or makespan < best_makespan:
+            best, best_makespan = schedule_log, makespan
+    return best
+
+
+def _dispatch(orders, rule, keys):
+    machine_names = orders.machine_names
+    n_machines = len(machine_names)
+    # Wie in MachineEnv belegt eine Operation die Maschine mindestens einen Zeitschritt
+    op_times = np.maximum(orders.op_times, 1).tolist()
+    next_machine = orders.next_machine.tolist()
+    order_ids = orders.order_ids.tolist()
+    keys = keys.tolist() if keys is not None else None
+
+    queues = [[] for _ in range(n_machines)]
+    seq = 0
+    for order_idx, first_machine in enumerate(orders.routes[:, 0].tolist()):
+        key = seq if rule == "FIFO" else keys[order_idx][first_machine]
+        queues[first_machine].append((key, seq, order_idx))
+        seq += 1
+    for queue in queues:
+        heapq.heapify(queue)
+
+    running = [None] * n_machines   # (order_idx, start_time)
+    events = []                     # (finish_time, machine)
+    schedule_log = []
+    now = 0
+
+    while True:
+        # Freie Maschinen belegen (in Maschinenreihenfolge, wie MachineEnv.step)
+        for m in range(n_machines):
+            if running[m] is None and queues[m]:
+                _, _, order_idx = heapq.heappop(queues[m])
+                running[m] = (order_idx, now)
+                heapq.heappush(events, (now + op_times[order_idx][m], m))
+
+        if not events:
+            break
+
+        # Alle Fertigmeldungen des nächsten Zeitpunkts in Maschinenreihenfolge verarbeiten
+        now = events[0][0]
+        while events and events[0][0] == now:
+            _, m = heapq.heappop(events)
+            order_idx, start_time = running[m]
+            running[m] = None
+            schedule_log.append({
+                "order_id": order_ids[order_idx],
+                "machine": machine_names[m],
+                "start_time": start_time,
+                "finish_time": now
+            })
+            following = next_machine[order_idx][m]
+            if following >= 0:
+                key = seq if rule == "FIFO" else keys[order_idx][following]
+                heapq.heappush(queues[following], (key, seq, order_idx))
+                seq += 1
+
+    return schedule_log
+
+
+def compare_rules(orders, rules=RULES, machines=None):
+    """
+    Plant mit allen Regeln und gibt je Regel Makespan und Anzahl verspäteter Aufträge zurück.
+    """
+    if not isinstance(orders, OrderSet):
+        orders = OrderSet.from_frame(orders, machines=machines)
+    deadlines = pd.Series(orders.deadlines, index=orders.order_ids)
+
+    rows = []
+    for rule in rules:
+        df_schedule = pd.DataFrame(dispatch_schedule(orders, rule))
+        completion = df_schedule.groupby("order_id")["finish_time"].max()
+        rows.append({
+            "rule": rule,
+            "makespan": completion.max(),
+            "late_orders": int((completion > deadlines.reindex(completion.index)).sum()),
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+from ordercache import MINUTES_PER_DAY, OrderSet
+
+# Kennzahlen (KPIs) für Pläne im schedule_log-Format
+# (order_id, machine, start_time, finish_time), vollständig vektorisiert.
+# Mehrere Pläne werden gemeinsam ausgewertet, indem sie mit einer Spalte 'run'
+# untereinander gehängt werden (siehe stack_schedules); alle Kennzahlen werden
+# dann je run berechnet.
+
+RUN = "run"
+
+
+def stack_schedules(schedules):
+    """
+    Hängt mehrere Pläne {run: schedule_log / DataFrame} zu einem Log mit Spalte 'run' zusammen.
+    """
+    frames = [pd.DataFrame(schedule).assign(**{RUN: run}) for run, schedule in schedules.items()]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _order_columns(orders, release_times=None):
+    if not isinstance(orders, OrderSet):
+        if release_times is None and "Release_days" in orders.columns:
+            release_times = orders["Release_days"].to_numpy() * MINUTES_PER_DAY
+        orders = OrderSet.from_frame(orders)
+    return {
+        "order_id": np.asarray(orders.order_ids),
+        "release": np.zeros(len(orders)) if release_times is None else np.asarray(release_times),
+        "deadline": np.asarray(orders.deadlines),
+        "route_len": np.asarray(orders.route_len),
+        "total_work": np.where(orders.routes >= 0,
+                               np.take_along_axis(orders.op_times, np.maximum(orders.routes, 0), axis=1),
+                               0).sum(axis=1),
+    }
+
+
+def order_table(orders, release_times=None):
+    """
+    Auftragsstammdaten je order_id: Freigabe und Deadline (Minuten), Anzahl Operationen,
+    Gesamtarbeit. 'orders' ist ein OrderSet, ein Auftrags-DataFrame oder ein Dict {run: orders};
+    bei einem Dict erhält jede Zeile die Spalte 'run'. Mehrfach verwendete
+    Datensätze werden nur einmal ausgewertet.
+    release_times: Freigabezeit je Auftragsindex (wie MachineEnv), bei einem Dict ein Dict
+    {run: release_times}; ohne Angabe aus der Spalte 'Release_days', sonst 0.
+    """
+    if not isinstance(orders, dict):
+        return pd.DataFrame(_order_columns(orders, release_times))
+
+    release_times = release_times or {}
+    columns_by_set = {}
+    parts = []
+    for run, order_set in orders.items():
+        releases = release_times.get(run)
+        key = (id(order_set), id(releases))
+        if key not in columns_by_set:
+            columns_by_set[key] = _order_columns(order_set, releases)
+        parts.append(columns_by_set[key])
+
+    table = pd.DataFrame({key: np.concatenate([part[key] for part in parts]) for key in parts[0]})
+    table[RUN] = np.repeat(np.array(list(orders.keys()), dtype=object),
+                           [len(part["order_id"]) for part in parts])
+    return table
+
+
+def _keys(schedule, *columns):
+    return ([RUN] if RUN in schedule.columns else []) + list(columns)
+
+
+def machine_kpis(schedule):
+    """
+    Je (run,) Maschine: Belegungszeit, Zeitfenster, Auslastung und Leerlauflücken.
+      processing_time        - Summe der Belegungsdauern
+      available_time         - letztes Ende - erster Start (wie bisher in scheduler.py)
+      utilization_percentage - processing_time / available_time * 100
+      makespan_utilization   - processing_time / Makespan des Plans * 100
+      idle_time, n_gaps, max_gap - Lücken zwischen aufeinanderfolgenden Belegungen
+    """
+    schedule = pd.DataFrame(schedule)
+    keys = _keys(schedule, "machine")
+    ordered = schedule.sort_values(keys + ["start_time"], kind="stable")
+    duration = ordered["finish_time"] - ordered["start_time"]
+    previous_finish = ordered.groupby(keys, sort=False)["finish_time"].shift()
+    gap = (ordered["start_time"] - previous_finish).clip(lower=0).fillna(0)
+
+    grouped = ordered.assign(processing_time=duration, gap=gap, has_gap=gap > 0).groupby(keys)
+    kpis = grouped.agg(
+        processing_time=("processing_time", "sum"),
+        first_start=("start_time", "min"),
+        last_finish=("finish_time", "max"),
+        operations=("processing_time", "size"),
+        idle_time=("gap", "sum"),
+        n_gaps=("has_gap", "sum"),
+        max_gap=("gap", "max"),
+    ).reset_index()
+
+    kpis["available_time"] = kpis["last_finish"] - kpis["first_start"]
+    kpis["utilization_percentage"] = kpis["processing_time"] / kpis["available_time"].replace(0, np.nan) * 100
+    if RUN in schedule.columns:
+        makespan = kpis[RUN].map(schedule.groupby(RUN)["finish_time"].max())
+    else:
+        makespan = schedule["finish_time"].max()
+    kpis["makespan_utilization"] = kpis["processing_time"] / makespan * 100
+    return kpis
+
+
+def order_kpis(schedule, orders, release_times=None):
+    """
+    Je (run,) Auftrag: Fertigstellung, Durchlaufzeit (ab Freigabe, siehe order_table), Verspätung.
+    Aufträge ohne alle Operationen im Log gelten als nicht fertig (complete=False).
+    """
+    schedule = pd.DataFrame(schedule)
+    keys = _keys(schedule, "order_id")
+    kpis = schedule.groupby(keys).agg(
+        first_start=("start_time", "min"),
+        completion=("finish_time", "max"),
+        operations=("finish_time", "size"),
+    ).reset_index()
+
+    table = order_table(orders, release_times)
+    kpis = kpis.merge(table, on=[k for k in keys if k in table.columns], how="left")
+    kpis["complete"] = kpis["operations"] >= kpis["route_len"]
+    kpis["flow_time"] = kpis["completion"] - kpis["release"]
+    kpis["waiting_time"] = kpis["flow_time"] - kpis["total_work"]
+    kpis["tardiness"] = (kpis["completion"] - kpis["deadline"]).clip(lower=0)
+    kpis["late"] = kpis["completion"] > kpis["deadline"]
+    return kpis
+
+
+def summary_kpis(schedule, orders, release_times=None):
+    """
+    Je run (bzw. eine Zeile für einen einzelnen Plan): Makespan, Durchlaufzeiten,
+    Verspätungen, mittlere Auslastung und Leerlauf.
+    """
+    schedule = pd.DataFrame(schedule)
+    keys = _keys(schedule)
+    per_order = order_kpis(schedule, orders, release_times)
+    per_machine = machine_kpis(schedule)
+
+    if not keys:
+        per_order = per_order.assign(**{RUN: 0})
+        per_machine = per_machine.assign(**{RUN: 0})
+
+    summary = per_order.groupby(RUN).agg(
+        makespan=("completion", "max"),
+        mean_flow_time=("flow_time", "mean"),
+        max_flow_time=("flow_time", "max"),
+        total_tardiness=("tardiness", "sum"),
+        max_tardiness=("tardiness", "max"),
+        late_orders=("late", "sum"),
+        orders=("order_id", "size"),
+    ).join(per_machine.groupby(RUN).agg(
+        mean_utilization=("makespan_utilization", "mean"),
+        total_idle_time=("idle_time", "sum"),
+    )).reset_index()
+
+    return summary if keys else summary.drop(columns=RUN)
+
+
+def late_orders(schedule, orders):
+    """
+    order_ids der verspäteten Aufträge (je run, falls vorhanden).
+    """
+    per_order = order_kpis(schedule, orders)
+    late = per_order[per_order["late"]]
+    if RUN in late.columns:
+        return late.groupby(RUN)["order_id"].apply(list).to_dict()
+    return late["order_id"].tolist()
@@ -4,96 +4,296 @@ import pandas as pd
 from stable_baselines3 import PPO
 from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.logger import configure
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
 from gantplot import plot_gantt
-from environment import ThreeMachineEnv
+from environment import MachineEnv, MultiOrderEnv
+from vecenv import BatchMachineEnv
+from ordercache import load_order_cache
+from checkpoint import AsyncCheckpointer, AsyncCheckpointCallback
+from profiling import NULL_PROFILER, Profiler, ProfiledVecEnv, ProfilerCallback
 import os
 
+# MaskablePPO (sb3_contrib) sampelt nur gültige Aktionen laut env.action_masks()
+try:
+    from sb3_contrib import MaskablePPO
+    from sb3_contrib.common.maskable.evaluation import evaluate_policy as evaluate_masked_policy
+except ImportError:
+    MaskablePPO = None
+
 
-starttime = time.time()
 # Pfad für Datensätze
 orderspath = "C:\\Users\\wolfg\\PycharmProjects\\Prozessoptimierung\\orders\\"
-dateien = [f for f in os.listdir(orderspath) if os.path.isfile(os.path.join(orderspath, f))]
 
 # TensorBoard-Logging einrichten
 log_dir = "./ppo_tensorboard/"
-os.makedirs(log_dir, exist_ok=True)
 
 # Modell speichern
 model_save_dir = "./ppo_models/"
-os.makedirs(model_save_dir, exist_ok=True)
-
-# Variablen für Bestes Modell
-best_reward = float('-inf')
 best_model_path = os.path.join(model_save_dir, "best_model.zip")
 
-# Trainingsschleife über alle Datensätze
-for idx, datei in enumerate(dateien):
-    print(f"\n🔄 Training mit Datensatz {idx + 1}/{len(dateien)}: {datei}")
+# Paralleles Training: Datensätze auf Worker-Prozesse verteilen statt nacheinander abarbeiten
+PARALLEL = True
+n_envs = os.cpu_count() or 1
+timesteps_per_dataset = 1000
 
-    # 1) Daten einlesen
-    df_orders = pd.read_csv(os.path.join(orderspath, datei))
+# Sequentielles Training: 0 = ein MachineEnv je Datensatz, n > 0 = BatchMachineEnv mit
+# n Episoden desselben Datensatzes in einem vektorisierten Step (nur OBSERVATION = "basic")
+BATCH_ENVS = 0
 
-    # 2) Environment erzeugen
-    env = ThreeMachineEnv(df_orders, max_queue_size=5, time_step=1)
-    #env = Monitor(env)
+# Aktionsmasken verwenden (benötigt sb3_contrib, sonst Fallback auf PPO)
+USE_ACTION_MASKS = True
 
-    # 3) RL-Modell (PPO) anlegen oder vorheriges Modell laden
-    if idx == 0:
-        model = PPO("MlpPolicy", env, verbose=1, learning_rate=1e-3, n_steps=256, tensorboard_log=log_dir)
-    else:
-        model = PPO.load(os.path.join(model_save_dir, f"ppo_latest.zip"), env=env)
+# Beobachtungsmodus der Umgebung: "basic" (Restzeiten, Queue-Längen, Zeit) oder
+# "queue" (zusätzlich die Aufträge je Queue-Platz, normiert; siehe MachineEnv)
+OBSERVATION = "queue"
+
+# Checkpoints: sequentiell alle CHECKPOINT_EVERY Datensätze, parallel alle
+# CHECKPOINT_STEPS Umgebungs-Steps; RESUME setzt einen abgebrochenen Lauf fort
+CHECKPOINT_EVERY = 5
+CHECKPOINT_STEPS = 20000
+RESUME = True
+
+# Instrumentierung (profiling.py): Zeiten je Phase von Umgebung, Policy und Update,
+# je Episode und Datensatz; nach TensorBoard (log_dir) und als JSON nach profile_file
+PROFILE = False
+profile_file = os.path.join(model_save_dir, "profile.json")
+
+
+def algorithm():
+    """
+    Lernverfahren laut USE_ACTION_MASKS: MaskablePPO, falls sb3_contrib installiert ist, sonst PPO.
+    """
+    if USE_ACTION_MASKS:
+        if MaskablePPO is not None:
+            return MaskablePPO
+        print("⚠️ sb3_contrib nicht installiert, Training ohne Aktionsmasken (PPO)")
+    return PPO
+
+
+def evaluate(model, env, n_eval_episodes):
+    """
+    evaluate_policy mit Aktionsmasken, falls das Modell ein MaskablePPO ist.
+    """
+    if MaskablePPO is not None and isinstance(model, MaskablePPO):
+        return evaluate_masked_policy(model, env, n_eval_episodes=n_eval_episodes)
+    return evaluate_policy(model, env, n_eval_episodes=n_eval_episodes)
+
+
+def train_sequential(dateien, order_cache, profiler=NULL_PROFILER):
+    """
+    Trainiert nacheinander auf jedem Datensatz (je 1000 Steps) und gibt die
+    Umgebung des letzten Datensatzes zurück. Das Modell bleibt über alle
+    Datensätze im Speicher (nur die Umgebung wird getauscht); Checkpoints werden
+    alle CHECKPOINT_EVERY Datensätze im Hintergrund geschrieben. Mit RESUME setzt
+    ein abgebrochener Lauf beim nächsten Datensatz des letzten Checkpoints fort.
+    Ein eingeschalteter profiler wertet jeden Datensatz als eigenen Abschnitt aus.
+    Mit BATCH_ENVS > 0 wird auf einer BatchMachineEnv trainiert und auf dem MachineEnv evaluiert.
+    """
+    checkpointer = AsyncCheckpointer(model_save_dir, name="ppo_latest")
+    Algorithm = algorithm()
+    model = None
+    start = 0
+
+    # Variablen für Bestes Modell
+    best_reward = float('-inf')
+
+    state = checkpointer.load_state() if RESUME else None
+    if state is not None and state.get("mode") == "sequential" and state.get("next_index", 0) < len(dateien):
+        start = state["next_index"]
+        best_reward = state["best_reward"]
+        print(f"⏩ Fortsetzung ab Datensatz {start + 1}/{len(dateien)} "
+              f"({state['num_timesteps']} Steps, bester Reward {best_reward:.2f})")
+
+    # Trainingsschleife über alle Datensätze
+    for idx in range(start, len(dateien)):
+        datei = dateien[idx]
+        with profiler.scope(datei):
+            print(f"\n🔄 Training mit Datensatz {idx + 1}/{len(dateien)}: {datei}")
+
+            # 1) Daten aus dem kompilierten Auftrags-Cache holen
+            orders = order_cache[datei]
+
+            # 2) Environment erzeugen
+            env = MachineEnv(orders, max_queue_size=5, time_step=1, event_driven=True, log_schedule=False,
+                             observation=OBSERVATION)
+            #env = Monitor(env)
+            train_env = env
+            if BATCH_ENVS:
+                # Trainiert auf der Batch-Umgebung, evaluiert wird weiter auf env
+                train_env = BatchMachineEnv(orders, num_envs=BATCH_ENVS, max_queue_size=5, time_step=1,
+                                            event_driven=True, observation=OBSERVATION)
+                if profiler.enabled:
+                    train_env = ProfiledVecEnv(train_env, profiler)
+            elif profiler.enabled:
+                env.enable_profiling(profiler)
+                train_env = ProfiledVecEnv(DummyVecEnv([lambda: env]), profiler)
+
+            # 3) RL-Modell (PPO) anlegen, aus dem Checkpoint laden oder nur die Umgebung tauschen
+            if model is None and idx > 0:
+                model = Algorithm.load(checkpointer.model_path, env=train_env, tensorboard_log=log_dir)
+            elif model is None:
+                model = Algorithm("MlpPolicy", train_env, verbose=1, learning_rate=1e-3, n_steps=256,
+                                  tensorboard_log=log_dir)
+            else:
+                model.set_env(train_env)
 
-    # 4) Modell trainieren und nach 1000 Steps speichern
-    model.learn(total_timesteps=1000, reset_num_timesteps=False)
+            # 4) Modell trainieren
+            model.learn(total_timesteps=timesteps_per_dataset, reset_num_timesteps=False,
+                        callback=ProfilerCallback(profiler) if profiler.enabled else None)
 
-    # 5) Modell speichern nach 1000 Steps
-    model.save(os.path.join(model_save_dir, f"ppo_latest.zip"))
+            # 5) Modell evaluieren (Reward berechnen)
+            mean_reward, std_reward = evaluate(model, env, n_eval_episodes=5)
+            print(f"📈 Durchschnittlicher Reward nach {model.num_timesteps} Steps: {mean_reward:.2f} ± {std_reward:.2f}")
 
-    # 6) Modell evaluieren (Reward berechnen)
-    mean_reward, std_reward = evaluate_policy(model, env, n_eval_episodes=5)
-    print(f"📈 Durchschnittlicher Reward nach {1000 * (idx + 1)} Steps: {mean_reward:.2f} ± {std_reward:.2f}")
+            # 6) Mean Reward in TensorBoard loggen
+            model.logger.record("evaluation/mean_reward", mean_reward)
+            model.logger.dump(model.num_timesteps)  # Sicherstellen, dass der Wert ins Log geschrieben wird
 
-    # 7) Mean Reward in TensorBoard loggen
+            # 7) Bestes Modell basierend auf Reward speichern (im Hintergrund)
+            if mean_reward > best_reward:
+                best_reward = mean_reward
+                checkpointer.save_model(model, best_model_path)
+                print(f"🏆 Neues bestes Modell gespeichert mit Reward {best_reward:.2f}")
+
+            # 8) Periodischer Checkpoint (im Hintergrund), immer nach dem letzten Datensatz
+            if (idx + 1) % CHECKPOINT_EVERY == 0 or idx == len(dateien) - 1:
+                checkpointer.save(model, mode="sequential", next_index=idx + 1, datei=datei,
+                                  best_reward=best_reward)
+
+    checkpointer.close()
+    return env
+
+
+def make_env(order_files, rank, seed=0, cache_dir=None, profile=False):
+    """
+    Erzeugt die Umgebung für Worker 'rank': zieht bei jedem reset() zufällig
+    einen seiner Datensätze (aus dem OrderCache, falls cache_dir angegeben).
+    Mit profile=True misst die Umgebung ihre Phasen in einem eigenen Profiler
+    (im Worker-Prozess, abholbar über get_attr("profiler")).
+    """
+    def _init():
+        env = MultiOrderEnv(order_files, shuffle=True, seed=seed + rank, cache_dir=cache_dir,
+                            max_queue_size=5, time_step=1, event_driven=True, log_schedule=False,
+                            observation=OBSERVATION)
+        if profile:
+            env.enable_profiling(Profiler())
+        return Monitor(env)
+    return _init
+
+
+def train_parallel(dateien, order_cache, profiler=NULL_PROFILER):
+    """
+    Verteilt die Datensätze reihum auf n_envs Worker-Prozesse, die alle einen
+    gemeinsamen PPO-Learner speisen. Das Modell bleibt über alle Datensätze im
+    Speicher; alle CHECKPOINT_STEPS Steps wird im Hintergrund ein Checkpoint
+    geschrieben, aus dem ein abgebrochener Lauf (RESUME) weiterläuft. Gibt die
+    Umgebung des letzten Datensatzes für die Abschluss-Evaluation zurück. Das beste
+    Modell wird nur bei besserem Reward als dem bisher besten (auch aus dem Checkpoint)
+    überschrieben.
+    Ein eingeschalteter profiler misst VecEnv, Policy und Update im Hauptprozess und
+    übernimmt am Ende die Messungen der Worker-Umgebungen (Episoden mit 'worker').
+    """
+    paths = [os.path.join(orderspath, datei) for datei in dateien]
+    workers = min(n_envs, len(paths))
+    total_timesteps = timesteps_per_dataset * len(paths)
+    print(f"\n🔄 Paralleles Training mit {len(paths)} Datensätzen auf {workers} Workern")
+
+    vec_env = SubprocVecEnv([make_env(paths[rank::workers], rank, cache_dir=order_cache.cache_dir,
+                                      profile=profiler.enabled)
+                             for rank in range(workers)])
+    if profiler.enabled:
+        vec_env = ProfiledVecEnv(vec_env, profiler)
+    checkpointer = AsyncCheckpointer(model_save_dir, name="ppo_latest")
+    Algorithm = algorithm()
+
+    best_reward = float('-inf')
+    state = checkpointer.load_state() if RESUME else None
+    if state is not None and state.get("mode") == "parallel" and state["num_timesteps"] < total_timesteps:
+        model = Algorithm.load(checkpointer.model_path, env=vec_env, tensorboard_log=log_dir)
+        best_reward = state.get("best_reward", best_reward)
+        print(f"⏩ Fortsetzung nach {model.num_timesteps}/{total_timesteps} Steps (bester Reward {best_reward:.2f})")
+    else:
+        model = Algorithm("MlpPolicy", vec_env, verbose=1, learning_rate=1e-3, n_steps=256, tensorboard_log=log_dir)
+
+    # save_freq zählt VecEnv-Steps, ein VecEnv-Step sind 'workers' Umgebungs-Steps
+    callback = [AsyncCheckpointCallback(checkpointer, save_freq=max(CHECKPOINT_STEPS // workers, 1),
+                                        mode="parallel", best_reward=best_reward)]
+    if profiler.enabled:
+        callback.append(ProfilerCallback(profiler))
+    model.learn(total_timesteps=total_timesteps - model.num_timesteps, reset_num_timesteps=False,
+                callback=callback)
+
+    # Evaluation über alle Worker (jeder mit eigenen Datensätzen)
+    mean_reward, std_reward = evaluate(model, vec_env, n_eval_episodes=max(5, workers))
+    print(f"📈 Durchschnittlicher Reward nach {model.num_timesteps} Steps: {mean_reward:.2f} ± {std_reward:.2f}")
     model.logger.record("evaluation/mean_reward", mean_reward)
-    model.logger.dump(model.num_timesteps)  # Sicherstellen, dass der Wert ins Log geschrieben wird
+    model.logger.dump(model.num_timesteps)
 
-    # 8) Bestes Modell basierend auf Reward speichern
+    # Bestes Modell nur bei Verbesserung überschreiben (im Hintergrund)
     if mean_reward > best_reward:
         best_reward = mean_reward
-        model.save(best_model_path)
+        checkpointer.save_model(model, best_model_path)
         print(f"🏆 Neues bestes Modell gespeichert mit Reward {best_reward:.2f}")
+    checkpointer.save(model, mode="parallel", best_reward=best_reward)
+    checkpointer.close()
+    if profiler.enabled:
+        for rank, worker_profiler in enumerate(vec_env.get_attr("profiler")):
+            profiler.merge(worker_profiler.summary(), worker=rank)
+    vec_env.close()
 
-# 9) Finale Evaluation mit dem besten Modell
-print("\n✅ Training abgeschlossen! Evaluierung des besten Modells...")
-best_model = PPO.load(best_model_path, env=env)
-obs = env.reset()
-done = False
-step_count = 0
+    return MachineEnv(order_cache[dateien[-1]], max_queue_size=5, time_step=1, event_driven=True,
+                      observation=OBSERVATION)
 
-while not done:
-    action, _states = best_model.predict(obs, deterministic=True)
-    print(f"Step = {step_count}, Action = {action}")
-    obs, reward, done, info = env.step(action)
-    env.render()
-    step_count += 1
 
+if __name__ == "__main__":
+    starttime = time.time()
+    # CSVs einmalig in den binären Auftrags-Cache übersetzen (bei Änderungen neu)
+    order_cache = load_order_cache(orderspath)
+    dateien = order_cache.names
+    os.makedirs(log_dir, exist_ok=True)
+    os.makedirs(model_save_dir, exist_ok=True)
 
-endtime=time.time()
+    profiler = Profiler() if PROFILE else NULL_PROFILER
+    if PARALLEL:
+        env = train_parallel(dateien, order_cache, profiler)
+    else:
+        env = train_sequential(dateien, order_cache, profiler)
 
-timeused=endtime-starttime
+    # 9) Finale Evaluation mit dem besten Modell
+    print("\n✅ Training abgeschlossen! Evaluierung des besten Modells...")
+    best_model = algorithm().load(best_model_path, env=env)
+    env.log_schedule = True
+    obs = env.reset()
+    done = False
+    step_count = 0
 
-print(str(timeused))
-# 10) Gantt-Diagramm plotten und Log-Daten speichern
-schedule_data = env.schedule_log
+    while not done:
+        if MaskablePPO is not None and isinstance(best_model, MaskablePPO):
+            action, _states = best_model.predict(obs, deterministic=True, action_masks=env.action_masks())
+        else:
+            action, _states = best_model.predict(obs, deterministic=True)
+        print(f"Step = {step_count}, Action = {action}")
+        obs, reward, done, info = env.step(action)
+        env.render()
+        step_count += 1
 
-# Konvertiere die Log-Daten in einen DataFrame und speichere sie als CSV
-import pandas as pd
-df_schedule = pd.DataFrame(schedule_data)
-df_schedule.to_csv("schedule_log.csv", index=False)
 
-# Optional: Das Gantt-Diagramm plotten (siehe unten Anpassung in gantplot.py)
-from gantplot import plot_gantt
-plot_gantt(schedule_data)
+    endtime=time.time()
+
+    timeused=endtime-starttime
+
+    print(str(timeused))
+    if PROFILE:
+        profiler.write_json(profile_file)
+        profiler.write_tensorboard(os.path.join(log_dir, "profile"))
+        print(f"⏱️ Profil gespeichert unter: {profile_file}")
+    # 10) Gantt-Diagramm plotten und Log-Daten speichern
+    # Exportiere das spaltenweise Log als DataFrame und speichere es als CSV
+    df_schedule = env.schedule_log.to_frame()
+    df_schedule.to_csv("schedule_log.csv", index=False)
+
+    # Optional: Das Gantt-Diagramm plotten (siehe unten Anpassung in gantplot.py)
+    plot_gantt(df_schedule)
 
-print(f"\n🎉 Bestes Modell gespeichert unter: {best_model_path}")
-print("📊 TensorBoard Logs unter:", log_dir)
\ No newline at end of file
+    print(f"\n🎉 Bestes Modell gespeichert unter: {best_model_path}")
+    print("📊 TensorBoard Logs unter:", log_dir)
@@ -0,0 +1,241 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+import torch as th
+
+from environment import MachineEnv
+from heuristics import priority_keys
+
+# Mit Aktionsmasken trainierte Modelle (learner.USE_ACTION_MASKS) brauchen sb3_contrib
+try:
+    from sb3_contrib import MaskablePPO
+except ImportError:
+    MaskablePPO = None
+
+# Vorausschau-Planung mit der PPO-Policy.
+# Statt an jedem Entscheidungszeitpunkt die greedy Aktion von model.predict zu nehmen,
+# bestimmt LookaheadPlanner die top_k wahrscheinlichsten gemeinsamen Aktionen der Policy
+# (nur gültige laut action_masks), führt jede in einer Kopie des Zustands aus
+# (MachineEnv.get_state/set_state) und simuliert von dort horizon Schritte mit der greedy
+# Policy (oder einer Prioritätsregel) weiter. Gewählt wird die Aktion mit dem kleinsten
+# geschätzten Makespan bzw. der kleinsten geschätzten Verspätungssumme; bei Gleichstand
+# die wahrscheinlichere.
+#
+# Die Rollouts laufen in einem Thread-Pool (workers); jeder Thread simuliert seine Kandidaten
+# im Gleichschritt mit einem gebündelten predict je Schritt (wie scheduler.schedule_batch) auf
+# einer eigenen Kopie der Policy, da SB3-Policies die Verteilung im Objekt zwischenspeichern.
+# Der Forward-Pass von torch gibt dabei den GIL frei; die Simulation selbst nicht, sodass
+# mehrere Threads erst bei großem top_k und mehreren Kernen lohnen. Entscheidungen mit nur
+# einer gültigen Aktion kosten keine Rollouts.
+#
+# Beispiel:
+#   planner = LookaheadPlanner(model, top_k=3, horizon=50, workers=3)
+#   action = planner.plan(env, obs)
+
+OBJECTIVES = ("makespan", "tardiness")
+
+
+class LookaheadPlanner:
+    """
+    Wählt je Entscheidungszeitpunkt unter den top_k Aktionen der Policy per Rollout.
+      - top_k:        Anzahl Kandidaten (gemeinsame Aktionen aller Maschinen)
+      - horizon:      Schritte (step-Aufrufe, ereignisgesteuert) je Rollout; None = bis zum Ende
+      - objective:    "makespan" oder "tardiness" (Summe der Verspätungen)
+      - workers:      Threads für die Rollouts (1 = im aufrufenden Thread)
+      - rollout_rule: Prioritätsregel (siehe heuristics.RULES) statt der Policy in den Rollouts
+    Am Ende des Rollouts werden die offenen Aufträge mit einer unteren Schranke bewertet:
+    Restarbeit je Maschine bzw. je Auftrag ab seinem frühestmöglichen Start.
+    """
+
+    def __init__(self, model, top_k=3, horizon=50, objective="makespan", workers=1, rollout_rule=None):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unbekanntes Ziel '{objective}', erlaubt: {OBJECTIVES}")
+        self.model = model
+        self.top_k = top_k
+        self.horizon = horizon
+        self.objective = objective
+        self.workers = max(1, min(workers, top_k))
+        self.rollout_rule = rollout_rule
+        self.masked = MaskablePPO is not None and isinstance(model, MaskablePPO)
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="lookahead") if self.workers > 1 else None
+        # Je Thread eine eigene Policy (die erste ist die des Modells)
+        self._policies = [model.policy] + [copy.deepcopy(model.policy) for _ in range(self.workers - 1)]
+        self._orders = None
+        self._envs = []
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------------------------------------------------------- Entscheidung
+
+    def plan(self, env, obs):
+        """
+        Aktion für den nächsten env.step(), ausgehend von der Beobachtung obs des aktuellen Zustands.
+        """
+        candidates = self._candidates(env, obs)
+        if len(candidates) == 1:
+            return candidates[0]
+
+        self._prepare(env)
+        state = env.get_state()
+        jobs = list(zip(self._envs, candidates))
+        chunks = [jobs[i::self.workers] for i in range(self.workers)]
+        scores = [None] * len(candidates)
+        if self._pool is None:
+            scores = self._rollout(state, jobs, self._policies[0])
+        else:
+            for i, chunk_scores in enumerate(self._pool.map(lambda chunk, policy: self._rollout(state, chunk, policy),
+                                                            chunks, self._policies)):
+                scores[i::self.workers] = chunk_scores
+        best = min(range(len(candidates)), key=lambda i: (scores[i], i))
+        return candidates[best]
+
+    def _candidates(self, env, obs):
+        """
+        Die top_k gültigen gemeinsamen Aktionen nach Log-Wahrscheinlichkeit der Policy.
+        Maschinen ohne Entscheidung haben nur Aktion 0; die Strahlsuche über die Maschinen
+        ist exakt, da sich die Log-Wahrscheinlichkeiten addieren.
+        """
+        n_machines = len(env.machine_names)
+        mask = env.action_masks().reshape(n_machines, env.max_queue_size + 1)
+        if mask.sum() == n_machines:
+            return [mask.argmax(axis=1)]
+
+        with th.no_grad():
+            obs_tensor, _ = self.model.policy.obs_to_tensor(obs)
+            distribution = self.model.policy.get_distribution(obs_tensor)
+        parts = getattr(distribution, "distributions", None) or distribution.distribution
+        log_probs = [part.logits[0].cpu().numpy() for part in parts]
+
+        beams = [((), 0.0)]
+        for m in range(n_machines):
+            valid = np.flatnonzero(mask[m])
+            options = valid[np.argsort(-log_probs[m][valid], kind="stable")][:self.top_k]
+            beams = sorted(((actions + (int(a),), score + log_probs[m][a]) for actions, score in beams for a in options),
+                           key=lambda beam: -beam[1])[:self.top_k]
+        return [np.array(actions) for actions, _ in beams]
+
+    # ---------------------------------------------------------------- Rollouts
+
+    def _prepare(self, env):
+        """
+        Rollout-Umgebungen und Bewertungstabellen einmalig je Datensatz.
+        """
+        if self._orders is env.orders and len(self._envs) == self.top_k:
+            return
+        self._orders = env.orders
+        self._envs = [MachineEnv(env.orders, max_queue_size=env.max_queue_size, time_step=env.time_step,
+                                 event_driven=True, machines=env.machine_names,
+                                 log_schedule=self.objective == "tardiness", observation=env.observation,
+                                 release_times=env.release_times, streaming=env.streaming)
+                      for _ in range(self.top_k)]
+        self._keys = priority_keys(env.orders, self.rollout_rule) if self.rollout_rule is not None else None
+
+        # _after[o, m, :]: Arbeit je Maschine, die Auftrag o ab seiner Operation auf m (inklusive) noch braucht
+        routes, op_times = env.routes, env.op_times
+        n_orders, n_machines = op_times.shape
+        self._after = np.zeros((n_orders, n_machines, n_machines))
+        for pos in range(n_machines):
+            rows = np.flatnonzero(routes[:, pos] >= 0)
+            for later in range(pos, n_machines):
+                sub = rows[routes[rows, later] >= 0]
+                self._after[sub, routes[sub, pos], routes[sub, later]] = op_times[sub, routes[sub, later]]
+
+    def _rollout(self, state, jobs, policy):
+        """
+        Simuliert je (Umgebung, Kandidat) ab 'state' und gibt die Bewertungen zurück.
+        """
+        envs = [env for env, _ in jobs]
+        obs = [None] * len(envs)
+        active = []
+        for i, (env, action) in enumerate(jobs):
+            env.set_state(state)
+            env.schedule_log.clear()
+            obs[i], _, done, _ = env.step(action)
+            if not done:
+                active.append(i)
+
+        steps = 0
+        while active and (self.horizon is None or steps < self.horizon):
+            actions = self._rollout_actions([envs[i] for i in active], [obs[i] for i in active], policy)
+            still_running = []
+            for i, action in zip(active, actions):
+                obs[i], _, done, _ = envs[i].step(action)
+                if not done:
+                    still_running.append(i)
+            active = still_running
+            steps += 1
+        return [self._estimate(env) for env in envs]
+
+    def _rollout_actions(self, envs, obs, policy):
+        if self.rollout_rule is not None:
+            return [self._rule_action(env) for env in envs]
+        batch = np.stack(obs)
+        if self.masked:
+            actions, _states = policy.predict(batch, deterministic=True,
+                                              action_masks=np.stack([env.action_masks() for env in envs]))
+        else:
+            actions, _states = policy.predict(batch, deterministic=True)
+        return actions
+
+    def _rule_action(self, env):
+        # Queue-Platz mit dem kleinsten Prioritätsschlüssel; FIFO (keine Schlüssel) nimmt den ersten
+        action = [0] * len(env.machine_names)
+        if self._keys is None:
+            return action
+        for m, queue in enumerate(env.queues):
+            if queue:
+                top = list(islice(queue, env.max_queue_size))
+                action[m] = int(np.argmin(self._keys[top, m])) + 1
+        return action
+
+    def _estimate(self, env):
+        """
+        Geschätzter Makespan bzw. geschätzte Verspätungssumme am Ende eines Rollouts.
+        Offene Aufträge gehen mit ihrer Restarbeit ein: wartende ab jetzt, laufende mit der
+        Restzeit ihrer Operation, noch nicht freigegebene ab ihrer Freigabezeit.
+        """
+        now = env.current_time
+        rows, machines, starts = [], [], []
+        for m, queue in enumerate(env.queues):
+            rows.extend(queue)
+            machines.extend([m] * len(queue))
+        n_waiting = len(rows)
+        running = [(m, order) for m, order in enumerate(env.running) if order >= 0]
+        for m, order in running:
+            rows.append(order)
+            machines.append(m)
+        for release_time, order in env._pending:
+            rows.append(order)
+            machines.append(int(env.routes[order, 0]))
+            starts.append(release_time)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        work = self._after[rows, machines]
+        for i, (m, _) in enumerate(running, start=n_waiting):
+            work[i, m] = env.time_to_finish[m]
+        start = np.full(len(rows), now, dtype=np.float64)
+        start[len(rows) - len(starts):] = np.maximum(starts, now)
+        finish = start + work.sum(axis=1)
+
+        if self.objective == "makespan":
+            if not len(rows):
+                return now
+            return max(now + work.sum(axis=0).max(), finish.max())
+
+        # Verspätung der im Rollout fertig gewordenen Aufträge (letzte Operation im Log)
+        log = env.schedule_log.to_arrays()
+        last = env.next_machine[log["order_idx"], log["machine_idx"]] < 0
+        done_orders = log["order_idx"][last]
+        tardiness = np.maximum(log["finish_time"][last] - env.deadlines[done_orders], 0).sum()
+        return tardiness + np.maximum(finish - env.deadlines[rows], 0).sum()
@@ -0,0 +1,271 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Kompilierte Auftragsdaten.
+# OrderSet hält einen Auftragsdatensatz als fertige NumPy-Arrays (so wie MachineEnv
+# sie im Step-Loop braucht). OrderCache übersetzt ein Verzeichnis von Auftrags-CSVs
+# einmalig in ein binäres, memory-mappbares Format (.npy je Array, alle Dateien
+# hintereinander) und liefert die Datensätze danach ohne Parsen und ohne Kopie.
+
+# Minuten je Arbeitstag für die Umrechnung von Deadline_days
+MINUTES_PER_DAY = 480
+
+CACHE_VERSION = 2
+CACHE_ARRAYS = ["order_ids", "setup_times", "proc_times", "op_times", "deadlines",
+                "routes", "route_len", "next_machine"]
+
+
+def discover_machines(columns):
+    """
+    Ermittelt die Maschinen aus den Spaltenpaaren '<Name>_Ruest' / '<Name>_Proc'
+    in der Reihenfolge der Spalten, z.B. ['M1', 'M2', 'M3'].
+    """
+    columns = list(columns)
+    return [c[:-len('_Ruest')] for c in columns
+            if c.endswith('_Ruest') and c[:-len('_Ruest')] + '_Proc' in columns]
+
+
+class OrderSet:
+    """
+    Ein Auftragsdatensatz als Arrays, Zeile = dichter Auftragsindex:
+      - order_ids:     OrderID je Auftragsindex
+      - setup_times:   Rüstzeit je (Auftrag, Maschine)
+      - proc_times:    Prozesszeit je (Auftrag, Maschine)
+      - op_times:      int(Rüstzeit + Prozesszeit), wie sie eine Maschine belegt
+      - deadlines:     Deadline in Minuten
+      - routes:        Maschinenindizes laut OperationSequence, mit -1 aufgefüllt
+      - route_len:     Anzahl Operationen je Auftrag
+      - next_machine:  Folgemaschine je (Auftrag, aktuelle Maschine), -1 = fertig
+    Die Arrays können Views in einen OrderCache sein und sind dann schreibgeschützt.
+    """
+
+    def __init__(self, machine_names, name=None, **arrays):
+        self.machine_names = list(machine_names)
+        self.name = name
+        for key in CACHE_ARRAYS:
+            setattr(self, key, arrays[key])
+
+    def __len__(self):
+        return len(self.order_ids)
+
+    @classmethod
+    def from_frame(cls, orders_df, machines=None, name=None):
+        """
+        Übersetzt einen Auftrags-DataFrame (Spalten wie GitOrders/*.csv).
+        """
+        machine_names = list(machines) if machines is not None else discover_machines(orders_df.columns)
+        if not machine_names:
+            raise ValueError("Keine Maschinen gefunden: erwartet Spalten '<Name>_Ruest' und '<Name>_Proc'")
+        machine_index = {m: i for i, m in enumerate(machine_names)}
+        n_orders = len(orders_df)
+        n_machines = len(machine_names)
+
+        setup_times = orders_df[[f"{m}_Ruest" for m in machine_names]].to_numpy()
+        proc_times = orders_df[[f"{m}_Proc" for m in machine_names]].to_numpy()
+
+        routes = np.full((n_orders, n_machines), -1, dtype=np.int64)
+        route_len = np.zeros(n_orders, dtype=np.int64)
+        next_machine = np.full((n_orders, n_machines), -1, dtype=np.int64)
+        for i, sequence in enumerate(orders_df['OperationSequence']):
+            unknown = [m for m in sequence.split('->') if m not in machine_index]
+            if unknown:
+                raise ValueError(f"OperationSequence '{sequence}' enthält unbekannte Maschinen {unknown}")
+            route = [machine_index[m] for m in sequence.split('->')]
+            routes[i, :len(route)] = route
+            route_len[i] = len(route)
+            for current, following in zip(route[:-1], route[1:]):
+                next_machine[i, current] = following
+
+        return cls(
+            machine_names,
+            name=name,
+            order_ids=orders_df['OrderID'].to_numpy(),
+            setup_times=setup_times,
+            proc_times=proc_times,
+            op_times=(setup_times + proc_times).astype(np.int64),
+            deadlines=orders_df['Deadline_days'].to_numpy() * MINUTES_PER_DAY,
+            routes=routes,
+            route_len=route_len,
+            next_machine=next_machine,
+        )
+
+    @classmethod
+    def empty(cls, machine_names, name=None):
+        """
+        Datensatz ohne Aufträge, z.B. als Startzustand für den Online-Betrieb.
+        """
+        n_machines = len(machine_names)
+        return cls(
+            machine_names,
+            name=name,
+            order_ids=np.zeros(0, dtype=np.int64),
+            setup_times=np.zeros((0, n_machines)),
+            proc_times=np.zeros((0, n_machines)),
+            op_times=np.zeros((0, n_machines), dtype=np.int64),
+            deadlines=np.zeros(0),
+            routes=np.zeros((0, n_machines), dtype=np.int64),
+            route_len=np.zeros(0, dtype=np.int64),
+            next_machine=np.zeros((0, n_machines), dtype=np.int64),
+        )
+
+    def subset(self, rows, name=None):
+        """
+        Datensatz aus den Zeilen 'rows' (Auftragsindizes); sie erhalten in dieser Reihenfolge
+        neue, dichte Indizes.
+        """
+        return OrderSet(self.machine_names, name=name if name is not None else self.name,
+                        **{key: getattr(self, key)[rows] for key in CACHE_ARRAYS})
+
+    @classmethod
+    def concat(cls, order_sets, name=None):
+        """
+        Hängt Datensätze mit denselben Maschinen aneinander; die Auftragsindizes des
+        ersten Datensatzes bleiben erhalten, die weiteren folgen dahinter.
+        """
+        machine_names = order_sets[0].machine_names
+        for orders in order_sets[1:]:
+            if orders.machine_names != machine_names:
+                raise ValueError(f"OrderSet-Maschinen {orders.machine_names} passen nicht zu {machine_names}")
+        return cls(machine_names, name=name,
+                   **{key: np.concatenate([getattr(orders, key) for orders in order_sets]) for key in CACHE_ARRAYS})
+
+
+def _file_signature(path, validate):
+    stat = os.stat(path)
+    signature = {"name": os.path.basename(path), "size": stat.st_size}
+    if validate == "hash":
+        with open(path, "rb") as f:
+            signature["sha1"] = hashlib.sha1(f.read()).hexdigest()
+    else:
+        signature["mtime_ns"] = stat.st_mtime_ns
+    return signature
+
+
+class OrderCache:
+    """
+    Memory-gemappter Cache für ein Verzeichnis von Auftrags-CSVs.
+    Alle Datensätze liegen hintereinander in je einer .npy-Datei pro Array;
+    offsets[i]:offsets[i+1] sind die Zeilen von Datei i. Zugriff per Index oder
+    Dateiname liefert ein OrderSet aus Views (keine Kopie, kein Parsen).
+    Text-OrderIDs werden als Unicode fester Breite gespeichert und bleiben memory-mappbar.
+    """
+
+    def __init__(self, cache_dir, manifest, arrays):
+        self.cache_dir = cache_dir
+        self.manifest = manifest
+        self.names = [entry["name"] for entry in manifest["files"]]
+        self.machine_names = manifest["machines"]
+        self._arrays = arrays
+        self._offsets = arrays["offsets"]
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self._id_dtypes = manifest.get("id_dtypes", [None] * len(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, key):
+        i = self._positions[key] if isinstance(key, str) else key
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        arrays = {k: self._arrays[k][start:end] for k in CACHE_ARRAYS}
+        # Zahl-IDs neben Text-IDs im selben Cache liegen als Text vor: Typ des Datensatzes zurück
+        if arrays["order_ids"].dtype.kind == "U" and self._id_dtypes[i] is not None:
+            arrays["order_ids"] = arrays["order_ids"].astype(self._id_dtypes[i])
+        return OrderSet(self.machine_names, name=self.names[i], **arrays)
+
+    @classmethod
+    def open(cls, cache_dir):
+        """
+        Öffnet einen vorhandenen Cache ohne Gültigkeitsprüfung.
+        """
+        with open(os.path.join(cache_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        arrays = {k: np.load(os.path.join(cache_dir, f"{k}.npy"), mmap_mode="r")
+                  for k in CACHE_ARRAYS + ["offsets"]}
+        return cls(cache_dir, manifest, arrays)
+
+
+def compile_order_dir(orders_dir, cache_dir, pattern="*.csv", machines=None, validate="mtime"):
+    """
+    Liest alle CSVs in orders_dir, übersetzt sie in OrderSets und schreibt den
+    Cache nach cache_dir. Alle Dateien müssen dieselben Maschinen haben.
+    """
+    paths = sorted(glob.glob(os.path.join(orders_dir, pattern)))
+    if not paths:
+        raise FileNotFoundError(f"Keine Auftragsdateien '{pattern}' in {orders_dir}")
+
+    order_sets = []
+    for path in paths:
+        order_set = OrderSet.from_frame(pd.read_csv(path), machines=machines)
+        if machines is None:
+            machines = order_set.machine_names
+        elif order_set.machine_names != list(machines):
+            raise ValueError(f"{path}: Maschinen {order_set.machine_names} weichen von {list(machines)} ab")
+        order_sets.append(order_set)
+
+    return write_order_cache(order_sets, cache_dir, [_file_signature(path, validate) for path in paths],
+                             pattern=pattern, validate=validate)
+
+
+def write_order_cache(order_sets, cache_dir, files, **manifest_fields):
+    """
+    Schreibt OrderSets (alle mit denselben Maschinen) als Cache nach cache_dir.
+    'files' enthält je Datensatz einen Manifest-Eintrag mit mindestens "name".
+    Gibt den geöffneten OrderCache zurück.
+    """
+    machines = order_sets[0].machine_names
+    os.makedirs(cache_dir, exist_ok=True)
+    offsets = np.cumsum([0] + [len(order_set) for order_set in order_sets]).astype(np.int64)
+    np.save(os.path.join(cache_dir, "offsets.npy"), offsets)
+    for key in CACHE_ARRAYS:
+        values = np.concatenate([getattr(order_set, key) for order_set in order_sets])
+        if values.dtype == object:
+            # Text-IDs als Unicode fester Breite: Objekt-Arrays lassen sich nicht memory-mappen.
+            # Datensätze mit Zahl-IDs erhalten ihren Typ beim Lesen zurück (id_dtypes)
+            values = values.astype(str)
+        np.save(os.path.join(cache_dir, f"{key}.npy"), values, allow_pickle=False)
+
+    manifest = dict({"version": CACHE_VERSION}, **manifest_fields)
+    manifest["machines"] = list(machines)
+    manifest["id_dtypes"] = [None if order_set.order_ids.dtype == object else order_set.order_ids.dtype.str
+                             for order_set in order_sets]
+    manifest["files"] = list(files)
+    # Manifest zuletzt schreiben: ein abgebrochener Lauf hinterlässt einen ungültigen Cache
+    with open(os.path.join(cache_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return OrderCache.open(cache_dir)
+
+
+def load_order_cache(orders_dir, cache_dir=None, pattern="*.csv", machines=None, validate="mtime"):
+    """
+    Öffnet den Cache für orders_dir und baut ihn neu, falls Dateien hinzugekommen,
+    entfernt oder geändert sind (validate="mtime": Größe + Änderungszeit,
+    validate="hash": Größe + SHA1 des Inhalts).
+    Standard-Cacheverzeichnis ist '<orders_dir>/.ordercache' (in .gitignore).
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(orders_dir, ".ordercache")
+
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        paths = sorted(glob.glob(os.path.join(orders_dir, pattern)))
+        up_to_date = (
+            manifest.get("version") == CACHE_VERSION
+            and manifest.get("pattern") == pattern
+            and manifest.get("validate") == validate
+            and (machines is None or manifest.get("machines") == list(machines))
+            and manifest.get("files") == [_file_signature(path, validate) for path in paths]
+        )
+        if up_to_date:
+            return OrderCache.open(cache_dir)
+
+    return compile_order_dir(orders_dir, cache_dir, pattern=pattern, machines=machines, validate=validate)
@@ -0,0 +1,284 @@
+import json
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.logger import configure
+from stable_baselines3.common.vec_env import VecEnvWrapper
+
+# Opt-in-Instrumentierung für Training (learner.py) und Planung (scheduler.py).
+# Profiler sammelt je Phase (z.B. "env/step", "env/observation", "train/policy") die
+# Gesamtzeit und die Anzahl Aufrufe, dazu Auswertungen je Episode und je Abschnitt
+# (scope, z.B. ein Datensatz). Zeiten verschachtelter Phasen sind inklusive, "env/step"
+# enthält also "env/observation" usw.
+# Messpunkte werden nur bei eingeschaltetem Profiler eingehängt (MachineEnv.enable_profiling,
+# ProfiledVecEnv, ProfilerCallback). Ausgeschaltet steht NULL_PROFILER an ihrer Stelle,
+# die Hot Paths bleiben unverändert.
+#
+# Export: summary() / write_json() als JSON, record() bzw. write_tensorboard() in einen
+# SB3-Logger (TensorBoard unter ./ppo_tensorboard/).
+
+
+class TimedMethod:
+    """
+    Aufruf der Klassenmethode 'method' für obj mit Zeitmessung unter 'name'.
+    Ein Objekt statt einer Closure, damit instrumentierte Umgebungen picklebar bleiben
+    (SubprocVecEnv.get_attr("action_masks") überträgt die Methode in den Hauptprozess).
+    """
+
+    __slots__ = ("profiler", "obj", "function", "name")
+
+    def __init__(self, profiler, obj, method, name):
+        self.profiler = profiler
+        self.obj = obj
+        self.function = getattr(type(obj), method)
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.function(self.obj, *args, **kwargs)
+        finally:
+            profiler = self.profiler
+            profiler.times[self.name] += time.perf_counter() - start
+            profiler.counts[self.name] += 1
+
+
+class Profiler:
+    """
+    Zeiten (Sekunden) und Aufrufzahlen je Phase, Episoden- und Abschnittsauswertungen.
+    Es werden höchstens max_episodes Episoden aufbewahrt (die jüngsten).
+    """
+
+    enabled = True
+
+    def __init__(self, max_episodes=10000):
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.episodes = deque(maxlen=max_episodes)
+        self.scopes = []
+        self._scope = None
+        self._n_episodes = 0
+        self._episode_mark = self._snapshot()
+        self._record_mark = self._snapshot()
+        self._created = time.perf_counter()
+
+    def _snapshot(self):
+        return dict(self.times), dict(self.counts)
+
+    def _delta(self, mark):
+        times, counts = mark
+        return {name: {"time": self.times[name] - times.get(name, 0.0), "calls": calls - counts.get(name, 0)}
+                for name, calls in self.counts.items() if calls != counts.get(name, 0)}
+
+    # ---------------------------------------------------------------- Messen
+
+    def add(self, name, seconds, calls=1):
+        self.times[name] += seconds
+        self.counts[name] += calls
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed(self, obj, method, name):
+        """
+        Methode 'method' von obj mit Zeitmessung unter 'name' (für das Einhängen als
+        Instanzattribut, siehe TimedMethod).
+        """
+        return TimedMethod(self, obj, method, name)
+
+    def end_episode(self, **info):
+        """
+        Schließt eine Episode ab: Zeiten und Aufrufe aller Phasen seit der letzten
+        Episode plus 'info' (z.B. Datensatz, Reward) als Eintrag in episodes.
+        """
+        phases = self._delta(self._episode_mark)
+        self._episode_mark = self._snapshot()
+        self.episodes.append({"episode": self._n_episodes, "scope": self._scope, **info, "phases": phases})
+        self._n_episodes += 1
+
+    @contextmanager
+    def scope(self, name):
+        """
+        Wertet alles innerhalb des with-Blocks als eigenen Abschnitt aus (z.B. je Datensatz).
+        """
+        mark = self._snapshot()
+        previous, self._scope = self._scope, name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.scopes.append({"scope": name, "wall_time": time.perf_counter() - start,
+                                "phases": self._delta(mark)})
+            self._scope = previous
+
+    def merge(self, summary, **labels):
+        """
+        Übernimmt die summary() eines anderen Profilers (z.B. eines Worker-Prozesses oder
+        einer einzelnen Umgebung); dessen Episoden und Abschnitte erhalten 'labels'.
+        """
+        for name, phase in summary.get("phases", {}).items():
+            self.add(name, phase["time"], phase["calls"])
+        self.episodes.extend(dict(episode, **labels) for episode in summary.get("episodes", []))
+        self.scopes.extend(dict(scope, **labels) for scope in summary.get("scopes", []))
+
+    # ---------------------------------------------------------------- Export
+
+    def summary(self):
+        phases = {name: {"time": self.times[name], "calls": calls,
+                         "mean_us": self.times[name] / calls * 1e6 if calls else 0.0}
+                  for name, calls in sorted(self.counts.items())}
+        return {"wall_time": time.perf_counter() - self._created, "phases": phases,
+                "scopes": list(self.scopes), "episodes": list(self.episodes)}
+
+    def write_json(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def record(self, logger, prefix="profile"):
+        """
+        Schreibt je Phase Zeit (ms) und Aufrufe seit dem letzten record() in einen
+        SB3-Logger; nicht auf die Konsole, damit die Trainingsausgabe lesbar bleibt.
+        """
+        for name, phase in sorted(self._delta(self._record_mark).items()):
+            logger.record(f"{prefix}/{name}_ms", phase["time"] * 1000, exclude=("stdout", "log"))
+            logger.record(f"{prefix}/{name}_calls", phase["calls"], exclude=("stdout", "log"))
+        self._record_mark = self._snapshot()
+
+    def write_tensorboard(self, log_dir, step=0):
+        """
+        Schreibt die noch nicht aufgezeichneten Phasen als eigenen TensorBoard-Lauf nach log_dir.
+        """
+        logger = configure(log_dir, ["tensorboard"])
+        self.record(logger)
+        logger.dump(step)
+        logger.close()
+
+
+class NullProfiler:
+    """
+    Ausgeschalteter Profiler mit derselben Schnittstelle; alle Aufrufe sind wirkungslos.
+    """
+
+    enabled = False
+
+    def add(self, name, seconds, calls=1):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def timer(self, name):
+        return nullcontext()
+
+    def timed(self, fn, name):
+        return fn
+
+    def end_episode(self, **info):
+        pass
+
+    def scope(self, name):
+        return nullcontext()
+
+    def merge(self, summary, **labels):
+        pass
+
+    def summary(self):
+        return {}
+
+    def write_json(self, path):
+        pass
+
+    def record(self, logger, prefix="profile"):
+        pass
+
+    def write_tensorboard(self, log_dir, step=0):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class ProfiledVecEnv(VecEnvWrapper):
+    """
+    Misst step (async + wait), reset und env_method-Aufrufe (z.B. die Aktionsmasken für
+    MaskablePPO) eines VecEnv als "vec/..."-Phasen und zählt die beendeten Episoden.
+    """
+
+    def __init__(self, venv, profiler):
+        super(ProfiledVecEnv, self).__init__(venv)
+        self.profiler = profiler
+        self._step_start = None
+
+    def reset(self):
+        with self.profiler.timer("vec/reset"):
+            return self.venv.reset()
+
+    def step_async(self, actions):
+        self._step_start = time.perf_counter()
+        self.venv.step_async(actions)
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        self.profiler.add("vec/step", time.perf_counter() - self._step_start)
+        self.profiler.count("vec/episodes", int(dones.sum()))
+        return obs, rewards, dones, infos
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        with self.profiler.timer(f"vec/{method_name}"):
+            return self.venv.env_method(method_name, *method_args, indices=indices, **method_kwargs)
+
+
+class ProfilerCallback(BaseCallback):
+    """
+    SB3-Callback: teilt model.learn in "train/rollout" (Daten sammeln), davon
+    "train/policy" (Rollout ohne vec/step und Aktionsmasken, also Forward-Pass und
+    Rollout-Buffer) und "train/update" (Gradientenschritte und Logging). Nach jedem
+    Rollout werden alle Phasen in den Logger des Modells (TensorBoard) geschrieben.
+    """
+
+    ENV_PHASES = ("vec/step", "vec/action_masks")
+
+    def __init__(self, profiler, verbose=0):
+        super(ProfilerCallback, self).__init__(verbose)
+        self.profiler = profiler
+        self._rollout_start = None
+        self._update_start = None
+        self._env_time = 0.0
+
+    def _env_time_total(self):
+        return sum(self.profiler.times.get(name, 0.0) for name in self.ENV_PHASES)
+
+    def _on_rollout_start(self):
+        now = time.perf_counter()
+        if self._update_start is not None:
+            self.profiler.add("train/update", now - self._update_start)
+        self._rollout_start = now
+        self._env_time = self._env_time_total()
+
+    def _on_rollout_end(self):
+        now = time.perf_counter()
+        rollout = now - self._rollout_start
+        self.profiler.add("train/rollout", rollout)
+        self.profiler.add("train/policy", rollout - (self._env_time_total() - self._env_time))
+        self._update_start = now
+        self.profiler.record(self.logger)
+
+    def _on_training_end(self):
+        if self._update_start is not None:
+            self.profiler.add("train/update", time.perf_counter() - self._update_start)
+            self._update_start = None
+
+    def _on_step(self):
+        return True
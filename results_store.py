@@ -0,0 +1,279 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ordercache import MINUTES_PER_DAY
+
+# Ergebnisablage für scheduler.py in einer SQLite-Datei.
+# Jeder geplante Datensatz wird sofort nach der Planung mit seinen Kennzahlen und dem
+# vollständigen Zeitplan angehängt und festgeschrieben; ein Abbruch verliert höchstens
+# den gerade laufenden Datensatz. Der Excel-Bericht ist ein optionaler Export aus der
+# Ablage (export_excel) und wird nicht mehr während der Planung aufgebaut.
+# Das Dashboard (visualisierung.py) liest die Ablage nur (readonly) und lädt Zeitpläne
+# tageweise über ScheduleCache, nie vollständig.
+#
+# Tabellen (run_id verknüpft alles mit einem Eintrag in 'runs'):
+#   runs         - je Datensatz und Lauf: session, datei, source, makespan, late_orders, ...
+#   machine_kpis - je run_id und Maschine (siehe kpis.machine_kpis)
+#   baselines    - je run_id und Prioritätsregel: makespan, late_orders
+#   schedules    - je run_id alle Operationen des Zeitplans
+# Order-IDs werden in ihrem eigenen Typ gespeichert (Zahl oder Text), order_id hat daher
+# keine Typaffinität (BLOB), damit z.B. "007" nicht zu 7 wird.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    session         TEXT NOT NULL,
+    datei           TEXT NOT NULL,
+    source          TEXT,
+    makespan        REAL,
+    late_orders     INTEGER,
+    late_order_ids  TEXT,
+    reward          REAL,
+    created         TEXT
+);
+CREATE TABLE IF NOT EXISTS machine_kpis (
+    run_id                  INTEGER NOT NULL REFERENCES runs(run_id),
+    machine                 TEXT,
+    processing_time         REAL,
+    available_time          REAL,
+    utilization_percentage  REAL,
+    makespan_utilization    REAL,
+    idle_time               REAL,
+    n_gaps                  INTEGER,
+    max_gap                 REAL
+);
+CREATE TABLE IF NOT EXISTS baselines (
+    run_id       INTEGER NOT NULL REFERENCES runs(run_id),
+    rule         TEXT,
+    makespan     REAL,
+    late_orders  INTEGER
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    run_id       INTEGER NOT NULL REFERENCES runs(run_id),
+    order_id     BLOB,
+    machine      TEXT,
+    start_time   INTEGER,
+    finish_time  INTEGER,
+    setup_time   REAL,
+    proc_time    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_session ON runs(session);
+CREATE INDEX IF NOT EXISTS idx_machine_kpis_run ON machine_kpis(run_id);
+CREATE INDEX IF NOT EXISTS idx_baselines_run ON baselines(run_id);
+CREATE INDEX IF NOT EXISTS idx_schedules_run ON schedules(run_id);
+CREATE INDEX IF NOT EXISTS idx_schedules_run_start ON schedules(run_id, start_time);
+"""
+
+MACHINE_COLUMNS = ["machine", "processing_time", "available_time", "utilization_percentage",
+                   "makespan_utilization", "idle_time", "n_gaps", "max_gap"]
+SCHEDULE_COLUMNS = ["order_id", "machine", "start_time", "finish_time", "setup_time", "proc_time"]
+
+
+class ResultsStore:
+    """
+    Nur anhängende Ergebnisablage (SQLite, WAL-Modus).
+    Alle Einträge eines Programmlaufs tragen dieselbe 'session' (Standard: Startzeitpunkt plus
+    Zufallskennung, damit gleichzeitig gestartete Läufe getrennt bleiben).
+    readonly=True öffnet eine bestehende Ablage nur zum Lesen (z.B. im Dashboard,
+    während scheduler.py weiter schreibt).
+    """
+
+    def __init__(self, path, session=None, readonly=False):
+        self.path = path
+        self.session = session or f"{time.strftime('%Y-%m-%dT%H:%M:%S')}-{uuid.uuid4().hex[:8]}"
+        if readonly:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Keine Ergebnisablage unter {path}")
+            self.conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_result(self, datei, schedule, machine_kpis, late_order_ids=(), baselines=None,
+                   source=None, reward=None):
+        """
+        Hängt das Ergebnis eines Datensatzes an und schreibt es sofort fest.
+        schedule und machine_kpis sind DataFrames (env.schedule_log.to_frame(),
+        kpis.machine_kpis); fehlende Spalten werden als NULL gespeichert.
+        Gibt die run_id zurück.
+        """
+        late_order_ids = [order_id.item() if isinstance(order_id, np.generic) else order_id
+                          for order_id in late_order_ids]
+        makespan = float(schedule["finish_time"].max()) if len(schedule) else 0.0
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (session, datei, source, makespan, late_orders, late_order_ids, reward, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.session, datei, source, makespan, len(late_order_ids), json.dumps(late_order_ids),
+                 None if reward is None else float(reward), time.strftime("%Y-%m-%dT%H:%M:%S")))
+            run_id = cursor.lastrowid
+
+            self._insert("machine_kpis", run_id, machine_kpis.reindex(columns=MACHINE_COLUMNS))
+            self._insert("schedules", run_id, schedule.reindex(columns=SCHEDULE_COLUMNS))
+            if baselines is not None:
+                self._insert("baselines", run_id, baselines.reindex(columns=["rule", "makespan", "late_orders"]))
+        return run_id
+
+    def _insert(self, table, run_id, df):
+        columns = ["run_id"] + list(df.columns)
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            ((run_id,) + row for row in rows))
+
+    # ---------------------------------------------------------------- Lesen
+
+    def sessions(self):
+        return pd.read_sql_query(
+            "SELECT session, COUNT(*) AS files, MIN(created) AS started, MAX(created) AS finished "
+            "FROM runs GROUP BY session ORDER BY session", self.conn)
+
+    def latest_session(self):
+        row = self.conn.execute("SELECT session FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def runs(self, session=None):
+        """
+        Übersicht der Datensätze einer Session (Standard: die zuletzt geschriebene).
+        """
+        session = session or self.latest_session()
+        return pd.read_sql_query("SELECT * FROM runs WHERE session = ? ORDER BY run_id",
+                                 self.conn, params=(session,))
+
+    def _table(self, table, session=None):
+        session = session or self.latest_session()
+        return pd.read_sql_query(
+            f"SELECT runs.datei, t.* FROM {table} AS t JOIN runs USING (run_id) "
+            f"WHERE runs.session = ? ORDER BY t.run_id, t.rowid",
+            self.conn, params=(session,))
+
+    def machine_kpis(self, session=None):
+        return self._table("machine_kpis", session)
+
+    def baselines(self, session=None):
+        return self._table("baselines", session)
+
+    def run_machines(self, run_id):
+        """
+        Maschinen eines Datensatzes in der Reihenfolge der Maschinen-KPIs.
+        """
+        return [row[0] for row in self.conn.execute(
+            "SELECT machine FROM machine_kpis WHERE run_id = ? ORDER BY rowid", (int(run_id),))]
+
+    def max_duration(self, run_id):
+        """
+        Dauer der längsten Operation eines Datensatzes (0 ohne Operationen).
+        """
+        row = self.conn.execute("SELECT MAX(finish_time - start_time) FROM schedules WHERE run_id = ?",
+                                (int(run_id),)).fetchone()
+        return row[0] or 0
+
+    def schedule(self, run_id, start=None, end=None, max_duration=None):
+        """
+        Zeitplan eines einzelnen Datensatzes (Spalten wie env.schedule_log.to_frame(),
+        Index 'op' = Zeilennummer in der Ablage). Mit start/end nur die Operationen,
+        die [start, end) überlappen; gelesen wird dann über den Index (run_id, start_time)
+        nur der Bereich ab start - max_duration (ohne Angabe per max_duration() ermittelt).
+        """
+        query = f"SELECT rowid AS op, {', '.join(SCHEDULE_COLUMNS)} FROM schedules WHERE run_id = ?"
+        params = [int(run_id)]
+        if start is not None or end is not None:
+            if max_duration is None:
+                max_duration = self.max_duration(run_id)
+            start = -float("inf") if start is None else start
+            end = float("inf") if end is None else end
+            query += " AND start_time >= ? AND start_time < ? AND finish_time > ?"
+            params += [start - max_duration, end, start]
+        return pd.read_sql_query(query + " ORDER BY rowid", self.conn, params=params, index_col="op")
+
+
+class ScheduleCache:
+    """
+    Lesecache für Zeitplan-Ausschnitte einer Ablage: je (run_id, Tag) die Operationen,
+    die den Tag überlappen. Zuletzt benutzte Ausschnitte bleiben erhalten, bis alle
+    zusammen mehr als max_bytes belegen (LRU). Fehlende Ausschnitte werden über eine
+    kurzlebige Leseverbindung geholt, der Cache kann so von mehreren Threads (z.B.
+    Streamlit-Sitzungen) gemeinsam genutzt werden.
+    """
+
+    def __init__(self, path, day_length=MINUTES_PER_DAY, max_bytes=256 * 2 ** 20):
+        self.path = path
+        self.day_length = day_length
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._slices = OrderedDict()
+        self._max_duration = {}
+        self._lock = threading.Lock()
+
+    def day(self, run_id, day):
+        key = (int(run_id), int(day))
+        with self._lock:
+            if key in self._slices:
+                self._slices.move_to_end(key)
+                return self._slices[key][0]
+
+        with ResultsStore(self.path, readonly=True) as store:
+            if key[0] not in self._max_duration:
+                self._max_duration[key[0]] = store.max_duration(run_id)
+            df = store.schedule(run_id, day * self.day_length, (day + 1) * self.day_length,
+                                max_duration=self._max_duration[key[0]])
+        nbytes = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            if key not in self._slices:
+                self._slices[key] = (df, nbytes)
+                self.nbytes += nbytes
+            while self.nbytes > self.max_bytes and len(self._slices) > 1:
+                _, (_, evicted) = self._slices.popitem(last=False)
+                self.nbytes -= evicted
+        return df
+
+    def days(self, run_id, first, last):
+        """
+        Operationen, die die Tage first..last (0-basiert, inklusive) überlappen, jede einmal.
+        """
+        df = pd.concat([self.day(run_id, day) for day in range(first, last + 1)])
+        return df[~df.index.duplicated()].sort_index()
+
+    def clear(self):
+        with self._lock:
+            self._slices.clear()
+            self._max_duration.clear()
+            self.nbytes = 0
+
+
+def export_excel(store, output_file, session=None):
+    """
+    Baut den Excel-Bericht einer Session aus der Ablage: je ein Blatt
+    'Übersicht' (Makespan, verspätete Aufträge je Datei), 'Auslastung' (Maschinen-KPIs)
+    und 'Regeln' (Vergleich mit den Prioritätsregeln), jeweils mit Spalte 'datei'.
+    """
+    runs = store.runs(session)
+    overview = runs[["datei", "source", "makespan", "reward", "late_orders", "late_order_ids"]]
+    utilization = store.machine_kpis(session).drop(columns="run_id")
+    baselines = store.baselines(session).drop(columns="run_id")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        overview.to_excel(writer, sheet_name='Übersicht', index=False)
+        utilization.to_excel(writer, sheet_name='Auslastung', index=False)
+        baselines.to_excel(writer, sheet_name='Regeln', index=False)
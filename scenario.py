@@ -0,0 +1,184 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from ordercache import MINUTES_PER_DAY, OrderSet, discover_machines, write_order_cache
+
+# Stochastischer Szenario-Generator für synthetische Auftragsdatensätze.
+# ScenarioModel.fit schätzt aus vorhandenen Auftrags-CSVs (z.B. GitOrders) die
+# empirischen Verteilungen je Spalte:
+#   - PartType (Häufigkeiten) und die feste OperationSequence je PartType
+#   - Quantity
+#   - Prozesszeit je Stück (M*_Proc / Quantity) je PartType und Maschine
+#   - Rüstzeit je Maschine (nur Maschinen, die der Auftrag durchläuft)
+#   - Deadline_days
+# und zieht daraus unabhängig beliebig große Datensätze, wahlweise als DataFrame
+# (Spalten wie GitOrders) oder direkt als OrderSet ohne DataFrame-Umweg.
+#
+# Beispiel:
+#   scenario = ScenarioModel.fit_dir("GitOrders")
+#   orders = scenario.sample_order_set(100000, seed=1)
+#   env = MachineEnv(orders, event_driven=True)
+
+ORDERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "GitOrders")
+
+
+def _empirical(values):
+    """
+    Empirische Verteilung als (Werte, Wahrscheinlichkeiten).
+    """
+    values, counts = np.unique(np.asarray(values), return_counts=True)
+    return values, counts / counts.sum()
+
+
+def _draw(rng, distribution, size):
+    values, probabilities = distribution
+    return values[rng.choice(len(values), size=size, p=probabilities)]
+
+
+class ScenarioModel:
+    """
+    Geschätzte Verteilungen eines Auftragsbestands (siehe ScenarioModel.fit).
+      - part_types / part_probs:  PartTypes und ihre Häufigkeiten
+      - routes[p]:                Maschinenindizes der OperationSequence von PartType p
+      - quantity:                 Verteilung der Stückzahl
+      - rates[(p, m)]:            Verteilung der Prozesszeit je Stück für PartType p auf Maschine m
+      - setups[m]:                Verteilung der Rüstzeit auf Maschine m (wenn genutzt)
+      - deadline_days:            Verteilung der Deadline in Arbeitstagen
+    """
+
+    def __init__(self, machine_names, part_types, part_probs, routes, quantity, rates, setups, deadline_days):
+        self.machine_names = list(machine_names)
+        self.part_types = list(part_types)
+        self.part_probs = np.asarray(part_probs, dtype=np.float64)
+        self.routes = routes
+        self.quantity = quantity
+        self.rates = rates
+        self.setups = setups
+        self.deadline_days = deadline_days
+
+    @classmethod
+    def fit(cls, orders_dfs, machines=None):
+        """
+        Schätzt die Verteilungen aus einem oder mehreren Auftrags-DataFrames.
+        Jeder PartType muss eine eindeutige OperationSequence haben.
+        """
+        if isinstance(orders_dfs, pd.DataFrame):
+            orders_dfs = [orders_dfs]
+        df = pd.concat(orders_dfs, ignore_index=True)
+        machine_names = list(machines) if machines is not None else discover_machines(df.columns)
+        machine_index = {m: i for i, m in enumerate(machine_names)}
+
+        part_types, part_probs = _empirical(df["PartType"].astype(str))
+        routes, rates = {}, {}
+        for p, group in df.groupby(df["PartType"].astype(str)):
+            sequences = group["OperationSequence"].unique()
+            if len(sequences) != 1:
+                raise ValueError(f"PartType '{p}' hat mehrere OperationSequences: {list(sequences)}")
+            routes[p] = [machine_index[m] for m in sequences[0].split("->")]
+            for m in routes[p]:
+                name = machine_names[m]
+                rates[(p, m)] = _empirical(group[f"{name}_Proc"] / group["Quantity"])
+
+        setups = {}
+        for m, name in enumerate(machine_names):
+            used = df[f"{name}_Proc"] > 0
+            setups[m] = _empirical(df.loc[used, f"{name}_Ruest"]) if used.any() else (np.zeros(1), np.ones(1))
+
+        return cls(machine_names, part_types, part_probs, routes,
+                   _empirical(df["Quantity"]), rates, setups, _empirical(df["Deadline_days"]))
+
+    @classmethod
+    def fit_dir(cls, orders_dir=ORDERS_DIR, pattern="*.csv", machines=None):
+        """
+        Schätzt die Verteilungen aus allen CSVs eines Verzeichnisses (Standard: GitOrders).
+        """
+        paths = sorted(glob.glob(os.path.join(orders_dir, pattern)))
+        if not paths:
+            raise FileNotFoundError(f"Keine Auftragsdateien '{pattern}' in {orders_dir}")
+        return cls.fit([pd.read_csv(path) for path in paths], machines=machines)
+
+    def _sample_columns(self, n_orders, seed):
+        """
+        Zieht n_orders Aufträge als Arrays: PartType-Index, Stückzahl, Rüst- und
+        Prozesszeiten je (Auftrag, Maschine), Deadline in Tagen.
+        """
+        rng = np.random.default_rng(seed)
+        n_machines = len(self.machine_names)
+        part_idx = rng.choice(len(self.part_types), size=n_orders, p=self.part_probs)
+        quantity = _draw(rng, self.quantity, n_orders)
+
+        setup_times = np.zeros((n_orders, n_machines), dtype=np.int64)
+        proc_times = np.zeros((n_orders, n_machines), dtype=np.int64)
+        for i, p in enumerate(self.part_types):
+            rows = np.flatnonzero(part_idx == i)
+            for m in self.routes[p]:
+                setup_times[rows, m] = _draw(rng, self.setups[m], rows.size)
+                proc_times[rows, m] = np.rint(quantity[rows] * _draw(rng, self.rates[(p, m)], rows.size))
+        deadline_days = _draw(rng, self.deadline_days, n_orders)
+        return part_idx, quantity, setup_times, proc_times, deadline_days
+
+    def sample_frame(self, n_orders, seed=None):
+        """
+        Synthetischer Auftragsdatensatz als DataFrame mit den Spalten der GitOrders-Dateien.
+        seed ist ein int, ein np.random.Generator oder None.
+        """
+        part_idx, quantity, setup_times, proc_times, deadline_days = self._sample_columns(n_orders, seed)
+        part_types = np.asarray(self.part_types, dtype=object)
+        sequences = np.asarray(["->".join(self.machine_names[m] for m in self.routes[p])
+                                for p in self.part_types], dtype=object)
+        columns = {
+            "OrderID": np.arange(1, n_orders + 1),
+            "PartType": part_types[part_idx],
+            "OperationSequence": sequences[part_idx],
+            "Quantity": quantity,
+        }
+        for m, name in enumerate(self.machine_names):
+            columns[f"{name}_Ruest"] = setup_times[:, m]
+            columns[f"{name}_Proc"] = proc_times[:, m]
+        columns["Deadline_days"] = deadline_days
+        return pd.DataFrame(columns)
+
+    def sample_order_set(self, n_orders, seed=None, name=None):
+        """
+        Synthetischer Auftragsdatensatz direkt als OrderSet (ohne DataFrame und ohne Parsen
+        der OperationSequence); gleiche Ziehung wie sample_frame bei gleichem Seed.
+        """
+        part_idx, quantity, setup_times, proc_times, deadline_days = self._sample_columns(n_orders, seed)
+        n_machines = len(self.machine_names)
+
+        # Routen je PartType einmal aufbauen, dann per PartType-Index verteilen
+        route_table = np.full((len(self.part_types), n_machines), -1, dtype=np.int64)
+        next_table = np.full((len(self.part_types), n_machines), -1, dtype=np.int64)
+        for i, p in enumerate(self.part_types):
+            route = self.routes[p]
+            route_table[i, :len(route)] = route
+            for current, following in zip(route[:-1], route[1:]):
+                next_table[i, current] = following
+        route_len = np.array([len(self.routes[p]) for p in self.part_types], dtype=np.int64)
+
+        return OrderSet(
+            self.machine_names,
+            name=name,
+            order_ids=np.arange(1, n_orders + 1),
+            setup_times=setup_times,
+            proc_times=proc_times,
+            op_times=setup_times + proc_times,
+            deadlines=deadline_days * MINUTES_PER_DAY,
+            routes=route_table[part_idx],
+            route_len=route_len[part_idx],
+            next_machine=next_table[part_idx],
+        )
+
+    def write_cache(self, cache_dir, n_sets, n_orders, seed=0, prefix="scenario"):
+        """
+        Zieht n_sets Datensätze mit je n_orders Aufträgen und schreibt sie im
+        OrderCache-Format nach cache_dir (Namen '<prefix>_<i>'), ohne CSVs.
+        Datensatz i hat den Seed (seed, i) und ist damit einzeln reproduzierbar.
+        """
+        names = [f"{prefix}_{i}" for i in range(n_sets)]
+        order_sets = [self.sample_order_set(n_orders, seed=(seed, i), name=name) for i, name in enumerate(names)]
+        files = [{"name": name, "seed": [seed, i], "orders": n_orders} for i, name in enumerate(names)]
+        return write_order_cache(order_sets, cache_dir, files, source="scenario")
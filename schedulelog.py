@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+# Spaltenweises Gantt-Log für MachineEnv.
+# Statt je beendeter Operation ein Dict an eine Liste zu hängen, schreibt das Env
+# dichte Indizes in vorallokierte, typisierte Arrays. OrderIDs, Maschinennamen und
+# die Aufteilung in Rüst- und Prozesszeit werden erst beim Export aus dem OrderSet
+# ergänzt, der Step-Loop selbst legt keine Objekte an.
+
+LOG_COLUMNS = ["order_idx", "machine_idx", "start_time", "finish_time"]
+
+
+class ScheduleLog:
+    """
+    Gantt-Log als Arrays (Zeile = beendete Operation, in Reihenfolge der Fertigmeldung):
+      - order_idx:    dichter Auftragsindex im OrderSet
+      - machine_idx:  Maschinenindex (Position in machine_names)
+      - start_time:   Startzeit der Belegung (Rüsten + Bearbeiten)
+      - finish_time:  Zeitpunkt der Fertigmeldung
+    Die Kapazität wird je Datensatz auf die Gesamtzahl der Operationen gesetzt
+    (reserve) und wächst nur bei Bedarf.
+    """
+
+    def __init__(self, orders=None, capacity=0):
+        self.orders = None
+        self._size = 0
+        self._allocate(capacity)
+        if orders is not None:
+            self.set_orders(orders)
+
+    def _allocate(self, capacity):
+        self.order_idx = np.zeros(capacity, dtype=np.int64)
+        self.machine_idx = np.zeros(capacity, dtype=np.int64)
+        self.start_time = np.zeros(capacity, dtype=np.int64)
+        self.finish_time = np.zeros(capacity, dtype=np.int64)
+
+    def set_orders(self, orders):
+        """
+        Verknüpft das Log mit einem OrderSet (für den Export) und reserviert
+        Platz für alle Operationen des Datensatzes. Leert das Log.
+        """
+        self.orders = orders
+        self.reserve(int(np.sum(orders.route_len)))
+        self.clear()
+
+    def extend_orders(self, orders):
+        """
+        Ersetzt das OrderSet durch eine Erweiterung (bisherige Auftragsindizes unverändert,
+        neue Aufträge dahinter), ohne das Log zu leeren; reserviert Platz für die neuen
+        Operationen.
+        """
+        added = int(np.sum(orders.route_len[len(self.orders.order_ids):])) if self.orders is not None else 0
+        self.orders = orders
+        self.reserve(self._size + added)
+
+    def remap_orders(self, orders, new_index):
+        """
+        Stellt auf ein verkleinertes OrderSet um (MachineEnv.compact_orders): new_index[alt]
+        ist der neue Auftragsindex oder -1 für entfernte Aufträge, deren Einträge entfallen.
+        """
+        n = self._size
+        new_order_idx = new_index[self.order_idx[:n]]
+        rows = np.flatnonzero(new_order_idx >= 0)
+        for key in LOG_COLUMNS:
+            column = getattr(self, key)
+            column[:len(rows)] = column[rows]
+        self.order_idx[:len(rows)] = new_order_idx[rows]
+        self._size = len(rows)
+        self.orders = orders
+
+    def reserve(self, capacity):
+        if capacity > len(self.order_idx):
+            columns = self.to_arrays()
+            self._allocate(capacity)
+            for key, values in columns.items():
+                getattr(self, key)[:len(values)] = values
+
+    def clear(self):
+        self._size = 0
+
+    def truncate(self, size):
+        """
+        Verwirft alle Einträge ab Zeile 'size' (Rücksprung auf einen früheren Zustand).
+        """
+        self._size = min(size, self._size)
+
+    def append(self, order_idx, machine_idx, start_time, finish_time):
+        n = self._size
+        if n == len(self.order_idx):
+            self.reserve(max(2 * n, 16))
+        self.order_idx[n] = order_idx
+        self.machine_idx[n] = machine_idx
+        self.start_time[n] = start_time
+        self.finish_time[n] = finish_time
+        self._size = n + 1
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        """
+        Einträge im bisherigen Format (Dict je Operation), z.B. für pd.DataFrame(log).
+        """
+        return iter(self.to_frame().to_dict("records"))
+
+    def to_arrays(self):
+        """
+        Views auf die belegten Zeilen (keine Kopie, nur bis zum nächsten reset() gültig).
+        """
+        n = self._size
+        return {key: getattr(self, key)[:n] for key in LOG_COLUMNS}
+
+    def to_frame(self, raw=False):
+        """
+        Das Log als DataFrame.
+        raw=True:  nur die Indexspalten (order_idx, machine_idx, start_time, finish_time)
+        raw=False: Spalten order_id, machine, start_time, finish_time, setup_time,
+                   proc_time wie im bisherigen schedule_log plus Rüst-/Prozessanteil
+        """
+        arrays = self.to_arrays()
+        if raw or self.orders is None:
+            return pd.DataFrame(arrays, copy=False)
+
+        order_idx, machine_idx = arrays["order_idx"], arrays["machine_idx"]
+        machine_names = np.asarray(self.orders.machine_names, dtype=object)
+        return pd.DataFrame({
+            "order_id": self.orders.order_ids[order_idx],
+            "machine": machine_names[machine_idx],
+            "start_time": arrays["start_time"],
+            "finish_time": arrays["finish_time"],
+            "setup_time": self.orders.setup_times[order_idx, machine_idx],
+            "proc_time": self.orders.proc_times[order_idx, machine_idx],
+        }, copy=False)
+
+    def to_arrow(self):
+        """
+        Die Indexspalten als pyarrow.Table (ohne Kopie der Arrays). Benötigt pyarrow.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as exc:
+            raise ImportError("ScheduleLog.to_arrow benötigt pyarrow (pip install pyarrow)") from exc
+        return pa.table(self.to_arrays())
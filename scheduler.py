@@ -1,93 +1,424 @@
 import time
 from stable_baselines3.common.monitor import Monitor
+import numpy as np
 import pandas as pd
 from stable_baselines3 import PPO
 from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.logger import configure
 from gantplot import plot_gantt
-from environment import ThreeMachineEnv
+from environment import MachineEnv
+from ordercache import MINUTES_PER_DAY, OrderSet, discover_machines, load_order_cache
+from heuristics import dispatch_schedule, compare_rules, priority_keys
+from results_store import ResultsStore, export_excel
+from profiling import NULL_PROFILER, Profiler
+from lookahead import LookaheadPlanner
+import kpis
 import os
+import sys
+import json
+import zipfile
+from itertools import islice
+
+# Mit Aktionsmasken trainierte Modelle (learner.USE_ACTION_MASKS) brauchen sb3_contrib
+try:
+    from sb3_contrib import MaskablePPO
+except ImportError:
+    MaskablePPO = None
 
 output_file = '.\\PycharmProjects\\Prozessoptimierung\\utilization_output.xlsx'
+results_db = '.\\PycharmProjects\\Prozessoptimierung\\scheduler_results.sqlite'
 model_save_dir = "./ppo_models/"
 
 orderspath = ".\\PycharmProjects\\Prozessoptimierung\\Otherorders\\"
-dateien = [f for f in os.listdir(orderspath) if os.path.isfile(os.path.join(orderspath, f))]
 
 best_model_path = os.path.join(model_save_dir, "best_model.zip")
 
-# Öffne den ExcelWriter, um alle Ergebnisse in einer Datei zu speichern
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    current_row = 0
-
-    for idx, datei in enumerate(dateien):
-        # Lese die Auftragsdaten ein
-        df_orders = pd.read_csv(os.path.join(orderspath, datei))
-        # Erstelle die Umgebung mit den Auftragsdaten
-        env = ThreeMachineEnv(df_orders, max_queue_size=5, time_step=1)
-
-        # Lade das beste Modell
-        best_model = PPO.load(best_model_path, env=env)
-        obs = env.reset()
-        done = False
-        step_count = 0
-
-        while not done:
-            action, _states = best_model.predict(obs, deterministic=True)
-            print(f"Step = {step_count}, Action = {action}")
-            obs, reward, done, info = env.step(action)
-            env.render()
-            step_count += 1
-
-        # Erstelle den Zeitplan-DataFrame aus dem Environment-Log
-        schedule_data = env.schedule_log
-        df_schedule = pd.DataFrame(schedule_data)
-
-        # Berechne die Bearbeitungszeit für jeden Auftrag
-        df_schedule["processing_time"] = df_schedule["finish_time"] - df_schedule["start_time"]
-
-        # Berechne die Maschinenauslastung
-        utilization = df_schedule.groupby("machine")["processing_time"].sum().reset_index()
-        available_time = df_schedule.groupby("machine").apply(
-            lambda x: x["finish_time"].max() - x["start_time"].min()
-        ).reset_index(name="available_time")
-        utilization = utilization.merge(available_time, on="machine")
-        utilization["utilization_percentage"] = (utilization["processing_time"] / utilization["available_time"]) * 100
-
-        # Bestimme die maximale Bearbeitungszeit als Information
-        bearbeitzeit = "Max Bearbeitungszeit: " + str(max(df_schedule["finish_time"]))
-
-        # Ermittlung der verspäteten Aufträge: Vergleich finish_time mit deadline
-        if "deadline" in df_schedule.columns:
-            verspätete_auftraege = df_schedule[df_schedule["finish_time"] > df_schedule["deadline"]]
-            count_verspaetet = len(verspätete_auftraege)
-            if "order_id" in verspätete_auftraege.columns:
-                order_ids = verspätete_auftraege["order_id"].tolist()
+# Headless: alle Datensätze gleichzeitig planen, ohne Konsolenausgabe je Step
+HEADLESS = True
+
+# Prioritätsregeln als Vergleichsbasis je Datensatz und als Fallback ohne Modell
+BASELINE_RULES = ("FIFO", "SPT", "EDD", "LST", "JOHNSON")
+FALLBACK_RULE = "EDD"
+
+# Excel-Bericht nach dem Lauf aus der Ergebnisablage erzeugen
+EXPORT_EXCEL = True
+
+# Vorausschau-Planung (lookahead.py): je Entscheidung die LOOKAHEAD_TOP_K wahrscheinlichsten
+# Aktionen der Policy per Rollout über LOOKAHEAD_HORIZON Schritte vergleichen und die mit dem
+# besten geschätzten LOOKAHEAD_OBJECTIVE ("makespan" oder "tardiness") wählen.
+# Kostet etwa top_k * horizon Policy-Schritte je Entscheidung; Threads lohnen nur mit mehreren Kernen.
+LOOKAHEAD = False
+LOOKAHEAD_TOP_K = 3
+LOOKAHEAD_HORIZON = 50
+LOOKAHEAD_OBJECTIVE = "makespan"
+LOOKAHEAD_WORKERS = 1
+
+# Dienstbetrieb: statt die Dateien in orderspath zu planen, Ereignisse als JSON-Zeilen
+# von stdin lesen und Startentscheidungen auf stdout schreiben (siehe serve)
+SERVICE = False
+SERVICE_MACHINES = ("M1", "M2", "M3")
+
+# Instrumentierung (profiling.py): Zeiten je Phase von Umgebung, Policy, KPIs und Ablage
+# als JSON nach profile_file und als TensorBoard-Lauf nach profile_log_dir
+PROFILE = False
+profile_file = os.path.join(model_save_dir, "scheduler_profile.json")
+profile_log_dir = "./ppo_tensorboard/scheduler_profile/"
+
+
+def load_model(path):
+    """
+    Lädt ein gespeichertes PPO- oder MaskablePPO-Modell; das Verfahren wird an der
+    gespeicherten Policy-Klasse erkannt.
+    """
+    with zipfile.ZipFile(path) as archive:
+        policy_module = json.loads(archive.read("data"))["policy_class"].get("__module__", "")
+    if policy_module.startswith("sb3_contrib"):
+        if MaskablePPO is None:
+            raise ImportError(f"{path} wurde mit MaskablePPO trainiert, sb3_contrib ist nicht installiert")
+        return MaskablePPO.load(path)
+    return PPO.load(path)
+
+
+def uses_masks(model):
+    return MaskablePPO is not None and isinstance(model, MaskablePPO)
+
+
+def observation_mode(model, orders):
+    """
+    Beobachtungsmodus, mit dem das Modell trainiert wurde ("basic" hat 2 * Maschinen + 1 Werte).
+    """
+    machines = orders.machine_names if isinstance(orders, OrderSet) else discover_machines(orders.columns)
+    return "basic" if model.observation_space.shape[0] == 2 * len(machines) + 1 else "queue"
+
+
+def schedule_batch(model, order_sets, names=None, max_queue_size=5, profiler=NULL_PROFILER, on_result=None):
+    """
+    Plant mehrere Auftragsdatensätze (DataFrames oder OrderSets) gleichzeitig mit einer geladenen Policy.
+    Je Entscheidungszeitpunkt werden die Beobachtungen aller noch laufenden
+    Episoden zu einem einzigen model.predict-Aufruf gebündelt.
+    Ein eingeschalteter profiler misst "policy/predict" und übernimmt die Phasen
+    jeder Umgebung (Episoden mit 'datei').
+    on_result(i, result) wird aufgerufen, sobald Datensatz i fertig geplant ist (z.B. um
+    das Ergebnis sofort zu speichern, während die übrigen Episoden weiterlaufen).
+
+    Gibt je Datensatz ein Dict zurück:
+      { "datei": str, "schedule": DataFrame (schedule_log), "reward": float,
+        "steps": int, "makespan": float }
+    """
+    if names is None:
+        names = [str(i) for i in range(len(order_sets))]
+
+    envs = [MachineEnv(orders, max_queue_size=max_queue_size, time_step=1, event_driven=True,
+                       observation=observation_mode(model, orders))
+            for orders in order_sets]
+    if profiler.enabled:
+        for env in envs:
+            env.enable_profiling(Profiler())
+    obs = [env.reset() for env in envs]
+    rewards = [0.0] * len(envs)
+    steps = [0] * len(envs)
+
+    results = [None] * len(envs)
+
+    def finish(i):
+        env = envs[i]
+        if profiler.enabled:
+            profiler.merge(env.profiler.summary(), datei=names[i])
+        df_schedule = env.schedule_log.to_frame()
+        results[i] = {
+            "datei": names[i],
+            "schedule": df_schedule,
+            "reward": rewards[i],
+            "steps": steps[i],
+            "makespan": df_schedule["finish_time"].max() if not df_schedule.empty else 0,
+        }
+        envs[i] = None
+        if on_result is not None:
+            on_result(i, results[i])
+
+    masked = uses_masks(model)
+    active = list(range(len(envs)))
+    while active:
+        batch = np.stack([obs[i] for i in active])
+        if masked:
+            masks = np.stack([envs[i].action_masks() for i in active])
+            with profiler.timer("policy/predict"):
+                actions, _states = model.predict(batch, deterministic=True, action_masks=masks)
+        else:
+            with profiler.timer("policy/predict"):
+                actions, _states = model.predict(batch, deterministic=True)
+        still_running = []
+        for i, action in zip(active, actions):
+            obs[i], reward, done, info = envs[i].step(action)
+            rewards[i] += reward
+            steps[i] += 1
+            if done:
+                finish(i)
             else:
-                order_ids = []
+                still_running.append(i)
+        active = still_running
+    return results
+
+
+def schedule_lookahead(planner, orders, name=None, max_queue_size=5):
+    """
+    Plant einen Datensatz mit einem LookaheadPlanner (Policy plus Rollouts je Entscheidung).
+    Gibt ein Dict wie schedule_batch zurück.
+    """
+    env = MachineEnv(orders, max_queue_size=max_queue_size, time_step=1, event_driven=True,
+                     observation=observation_mode(planner.model, orders))
+    obs = env.reset()
+    reward, steps, done = 0.0, 0, False
+    while not done:
+        obs, step_reward, done, info = env.step(planner.plan(env, obs))
+        reward += step_reward
+        steps += 1
+
+    df_schedule = env.schedule_log.to_frame()
+    return {
+        "datei": name,
+        "schedule": df_schedule,
+        "reward": reward,
+        "steps": steps,
+        "makespan": df_schedule["finish_time"].max() if not df_schedule.empty else 0,
+    }
+
+
+def schedule_verbose(model, orders):
+    """
+    Plant einen Datensatz Schritt für Schritt mit Konsolenausgabe je Step.
+    """
+    env = MachineEnv(orders, max_queue_size=5, time_step=1, event_driven=True,
+                     observation=observation_mode(model, orders))
+    obs = env.reset()
+    done = False
+    step_count = 0
+
+    while not done:
+        if uses_masks(model):
+            action, _states = model.predict(obs, deterministic=True, action_masks=env.action_masks())
         else:
-            print("Keine Deadline-Information in df_schedule gefunden.")
-            count_verspaetet = 0
-            order_ids = []
+            action, _states = model.predict(obs, deterministic=True)
+        print(f"Step = {step_count}, Action = {action}")
+        obs, reward, done, info = env.step(action)
+        env.render()
+        step_count += 1
 
-        # Schreibe die Auslastungsdaten in das Excel-Dokument
-        utilization.to_excel(writer, sheet_name='Sheet1', startrow=current_row, index=False)
-        worksheet = writer.sheets['Sheet1']
-        target_row = current_row + len(utilization) + 1
+    return env.schedule_log.to_frame()
 
-        # Schreibe die maximale Bearbeitungszeit
-        worksheet.cell(row=target_row + 1, column=1, value=bearbeitzeit)
 
-        # Schreibe die Anzahl der verspäteten Aufträge
-        worksheet.cell(row=target_row + 3, column=1, value="Verspätete Aufträge Anzahl:")
-        worksheet.cell(row=target_row + 3, column=2, value=count_verspaetet)
+class DispatchService:
+    """
+    Online-Disposition als langlebiger Dienst: hält den Werkstattzustand in einem
+    MachineEnv (streaming=True) und entscheidet bei jedem Ereignis, welche wartenden
+    Aufträge auf freien Maschinen starten. Uhr (Minuten, monoton steigend) und
+    Fertigmeldungen kommen von außen, die Policy sieht dieselbe Beobachtung wie im Training.
+      submit(orders, time)      neue Aufträge (DataFrame oder OrderSet), freigegeben ab
+                                'Release_days' bzw. sofort
+      finished(machine, time)   Maschine (Name) meldet ihre laufende Operation fertig
+      decide(time)              Entscheidung ohne neues Ereignis (z.B. nach Freigaben)
+    Jedes Ereignis gibt die daraus folgenden Starts zurück als Liste von Dicts
+      { "machine", "order_id", "start_time", "planned_finish" }
+    Ohne Modell wählt die Prioritätsregel 'rule' unter den ersten max_queue_size
+    Aufträgen jeder Queue (den Plätzen, die auch eine Aktion erreicht).
+    JOHNSON nutzt dabei das letzte CDS-Ersatzproblem (siehe heuristics.py), da ohne
+    vollständigen Plan nicht unter den Ersatzproblemen gewählt werden kann.
+    Ereignisse werden vollständig geprüft, bevor sie den Zustand ändern. Sobald mindestens
+    so viele Aufträge abgeschlossen wie offen sind (und mindestens compact_min), werden die
+    abgeschlossenen aus dem Zustand entfernt (MachineEnv.compact_orders); Aufwand und
+    Speicher je Ereignis hängen so nur von den offenen Aufträgen ab, nicht von der Historie.
+    """
+
+    def __init__(self, model=None, machines=SERVICE_MACHINES, max_queue_size=5, rule=FALLBACK_RULE,
+                 compact_min=1000):
+        self.model = model
+        self.rule = rule.upper()
+        self.compact_min = compact_min
+        orders = OrderSet.empty(machines)
+        observation = observation_mode(model, orders) if model is not None else "basic"
+        self.env = MachineEnv(orders, max_queue_size=max_queue_size, time_step=1, observation=observation,
+                              log_schedule=False, streaming=True)
+        self.env.reset()
+        self._masked = model is not None and uses_masks(model)
+        # Prioritätsschlüssel je Auftragsindex, nur für die jeweils neuen Aufträge berechnet
+        self._keys = None
+        if model is None and self.rule != "FIFO":
+            self._keys = priority_keys(orders, self.rule)
+
+    def submit(self, orders, time):
+        env = self.env
+        if time < env.current_time:
+            raise ValueError(f"Zeit {time} liegt vor current_time {env.current_time}")
+        release_times = None
+        if not isinstance(orders, OrderSet):
+            if "Release_days" in orders.columns:
+                release_times = orders["Release_days"].to_numpy() * MINUTES_PER_DAY
+            orders = OrderSet.from_frame(orders, machines=env.machine_names)
+        elif orders.machine_names != env.machine_names:
+            raise ValueError(f"OrderSet-Maschinen {orders.machine_names} passen nicht zu {env.machine_names}")
+
+        env.advance_clock(time)
+        env.add_orders(orders, release_times=release_times)
+        if self._keys is not None:
+            self._keys = np.concatenate([self._keys, priority_keys(orders, self.rule)])
+        return self._dispatch()
+
+    def finished(self, machine, time):
+        env = self.env
+        if machine not in env.machine_names:
+            raise ValueError(f"Unbekannte Maschine '{machine}', erlaubt: {env.machine_names}")
+        m = env.machine_names.index(machine)
+        if env.running[m] < 0:
+            raise ValueError(f"Maschine {machine} hat keine laufende Operation")
+        if time < env.current_time:
+            raise ValueError(f"Zeit {time} liegt vor current_time {env.current_time}")
+
+        env.advance_clock(time)
+        env.complete_operation(m)
+        self._compact()
+        return self._dispatch()
+
+    def _compact(self):
+        env = self.env
+        n_open = env.n_open_orders + len(env._pending)
+        if len(env.order_ids) - n_open >= max(n_open, self.compact_min):
+            kept = env.compact_orders()
+            if self._keys is not None:
+                self._keys = self._keys[kept]
+
+    def decide(self, time):
+        self.env.advance_clock(time)
+        return self._dispatch()
+
+    def _dispatch(self):
+        env = self.env
+        if all(order >= 0 or not queue for order, queue in zip(env.running, env.queues)):
+            return []
+        if self.model is None:
+            action = self._rule_action()
+        elif self._masked:
+            action, _states = self.model.predict(env.observe(), deterministic=True,
+                                                 action_masks=env.action_masks(lookahead=False))
+        else:
+            action, _states = self.model.predict(env.observe(), deterministic=True)
+
+        # Order-ID unverändert (Zahl oder Text), numpy-Skalare als Python-Typ für JSON
+        return [{
+            "machine": env.machine_names[m],
+            "order_id": env.order_ids[order_idx:order_idx + 1].tolist()[0],
+            "start_time": int(env.current_time),
+            "planned_finish": int(env.current_time + env.op_times[order_idx, m]),
+        } for m, order_idx in env.dispatch(action)]
+
+    def _rule_action(self):
+        env = self.env
+        action = [0] * len(env.machine_names)
+        if self._keys is None:
+            return action
+        for m, queue in enumerate(env.queues):
+            if env.running[m] < 0 and queue:
+                top = list(islice(queue, env.max_queue_size))
+                action[m] = int(np.argmin(self._keys[top, m])) + 1
+        return action
+
+
+def serve(service, lines=sys.stdin, out=sys.stdout):
+    """
+    Ereignisschleife für den Dienstbetrieb: je Eingabezeile ein JSON-Objekt
+      {"event": "submit",   "time": t, "orders": [ {Spalten wie GitOrders}, ... ]}
+      {"event": "finished", "time": t, "machine": "M1"}
+      {"event": "decide",   "time": t}
+    und je Ereignis eine Antwortzeile {"time": t, "dispatch": [...], "latency_ms": ...}
+    bzw. {"error": ...}. Fehlerhafte Ereignisse beenden den Dienst nicht.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        starttime = time.perf_counter()
+        try:
+            event = json.loads(line)
+            if event["event"] == "submit":
+                dispatch = service.submit(pd.DataFrame(event["orders"]), event["time"])
+            elif event["event"] == "finished":
+                dispatch = service.finished(event["machine"], event["time"])
+            elif event["event"] == "decide":
+                dispatch = service.decide(event["time"])
+            else:
+                raise ValueError(f"Unbekanntes Ereignis '{event['event']}'")
+            response = {"time": event["time"], "dispatch": dispatch,
+                        "latency_ms": round((time.perf_counter() - starttime) * 1000, 3)}
+        except Exception as exc:
+            response = {"error": repr(exc)}
+        out.write(json.dumps(response) + "\n")
+        out.flush()
+
+
+if __name__ == "__main__":
+    if SERVICE:
+        model = load_model(best_model_path) if os.path.exists(best_model_path) else None
+        serve(DispatchService(model))
+        sys.exit()
+
+    # Auftragsdaten aus dem binären Cache (CSVs werden nur bei Änderungen neu gelesen)
+    order_cache = load_order_cache(orderspath)
+    dateien = order_cache.names
+    order_sets = list(order_cache)
+
+    profiler = Profiler() if PROFILE else NULL_PROFILER
+    starttime = time.time()
+
+    # Ergebnisse je Datensatz sofort nach seiner Planung in die Ablage schreiben (festgeschrieben
+    # je Datei): ein Abbruch verliert höchstens die noch nicht fertig geplanten Datensätze
+    with ResultsStore(results_db) as store:
+
+        def store_result(idx, df_schedule, source, reward=None):
+            # Maschinenauslastung und verspätete Aufträge (Fertigstellung nach der Deadline)
+            with profiler.timer("results/kpis"):
+                utilization = kpis.machine_kpis(df_schedule)
+                order_ids = kpis.late_orders(df_schedule, order_sets[idx])
+
+            # Vergleich mit den Prioritätsregeln
+            with profiler.timer("results/baselines"):
+                baselines = compare_rules(order_sets[idx], BASELINE_RULES)
+            best_baseline = baselines.loc[baselines["makespan"].idxmin()]
+            print(f"{dateien[idx]}: Makespan Policy {max(df_schedule['finish_time'])}, "
+                  f"verspätet {len(order_ids)}, "
+                  f"beste Regel {best_baseline['rule']} {best_baseline['makespan']}")
+
+            with profiler.timer("results/store"):
+                store.add_result(dateien[idx], df_schedule, utilization, late_order_ids=order_ids,
+                                 baselines=baselines, source=source, reward=reward)
+
+        if not os.path.exists(best_model_path):
+            print(f"Kein Modell unter {best_model_path} gefunden, Fallback auf Prioritätsregel {FALLBACK_RULE}")
+            for idx, orders in enumerate(order_sets):
+                store_result(idx, pd.DataFrame(dispatch_schedule(orders, FALLBACK_RULE)), FALLBACK_RULE)
+        else:
+            # Lade das beste Modell (einmalig für alle Datensätze)
+            best_model = load_model(best_model_path)
+            if LOOKAHEAD:
+                with LookaheadPlanner(best_model, top_k=LOOKAHEAD_TOP_K, horizon=LOOKAHEAD_HORIZON,
+                                      objective=LOOKAHEAD_OBJECTIVE, workers=LOOKAHEAD_WORKERS) as planner:
+                    for idx, orders in enumerate(order_sets):
+                        result = schedule_lookahead(planner, orders, name=dateien[idx])
+                        store_result(idx, result["schedule"], "PPO+Lookahead", result["reward"])
+            elif HEADLESS:
+                schedule_batch(best_model, order_sets, names=dateien, profiler=profiler,
+                               on_result=lambda idx, result: store_result(idx, result["schedule"], "PPO",
+                                                                          result["reward"]))
+            else:
+                for idx, orders in enumerate(order_sets):
+                    store_result(idx, schedule_verbose(best_model, orders), "PPO")
 
-        # Schreibe die Order IDs der verspäteten Aufträge
-        worksheet.cell(row=target_row + 4, column=1, value="Order IDs verspätet:")
-        worksheet.cell(row=target_row + 4, column=2, value=str(order_ids))
+        print(f"{len(dateien)} Datensätze geplant und gespeichert in {time.time() - starttime:.2f} s")
+        print(f"Ergebnisse gespeichert unter: {results_db} (Session {store.session})")
 
-        # Aktualisiere current_row für den nächsten Durchlauf
-        current_row += len(utilization) + 6
+        # Optionaler Excel-Bericht aus der Ablage
+        if EXPORT_EXCEL:
+            export_excel(store, output_file, session=store.session)
+            print(f"Excel-Bericht gespeichert unter: {output_file}")
 
-        # Speichere den Zeitplan auch als CSV-Datei
-        df_schedule.to_csv("scheduler_log" + str(idx) + ".csv", index=False)
+    if PROFILE:
+        profiler.write_json(profile_file)
+        profiler.write_tensorboard(profile_log_dir)
+        print(f"Profil gespeichert unter: {profile_file}")
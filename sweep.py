@@ -0,0 +1,268 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sqlite3
+import statistics
+import time
+import uuid
+import warnings
+
+import numpy as np
+
+from ordercache import OrderCache, load_order_cache
+
+# Paralleler Hyperparameter-Sweep für das PPO-Training aus learner.py.
+# Jede Konfiguration (Trial) läuft in einem eigenen Worker-Prozess mit fester
+# Threadanzahl (und, wo das Betriebssystem es erlaubt, festen CPU-Kernen). Trainiert
+# wird auf den Trainingsdateien, bewertet nach jeder Stufe (Rung) auf zurückgehaltenen
+# Dateien; Trials, die auf einer Stufe schlechter als der Median der bisherigen Trials
+# abschneiden, werden abgebrochen (Median-Pruning). Alle Ergebnisse landen in SQLite.
+#
+# Beispiel:
+#   python sweep.py --n-trials 24 --threads 1 --db sweep.sqlite
+#   python sweep.py --report --db sweep.sqlite
+
+ORDERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "GitOrders")
+
+# Suchraum; die Standardwerte von learner.py sind jeweils enthalten
+SEARCH_SPACE = {
+    "learning_rate": [3e-4, 1e-3, 3e-3],
+    "n_steps": [128, 256, 512],
+    "max_queue_size": [3, 5, 8],
+    "timesteps_per_dataset": [500, 1000, 2000],
+    "observation": ["basic", "queue"],
+    "action_masks": [True, False],
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    trial_id    INTEGER NOT NULL,
+    study       TEXT NOT NULL,
+    config      TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    score       REAL,
+    makespan    REAL,
+    timesteps   INTEGER,
+    started     TEXT,
+    finished    TEXT,
+    error       TEXT,
+    PRIMARY KEY (study, trial_id)
+);
+CREATE TABLE IF NOT EXISTS reports (
+    study       TEXT NOT NULL,
+    trial_id    INTEGER NOT NULL,
+    rung        INTEGER NOT NULL,
+    timesteps   INTEGER,
+    score       REAL,
+    makespan    REAL,
+    PRIMARY KEY (study, trial_id, rung)
+);
+"""
+
+
+def connect(db_path):
+    # Mehrere Worker schreiben gleichzeitig: WAL-Modus und großzügiges Timeout
+    conn = sqlite3.connect(db_path, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def sample_configs(n_trials, seed=0):
+    """
+    Zieht n_trials verschiedene Konfigurationen aus SEARCH_SPACE (alle, falls n_trials
+    größer als das Gitter ist). Die Reihenfolge ist durch seed festgelegt.
+    """
+    keys = list(SEARCH_SPACE)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(grid))[:n_trials]
+    return [grid[i] for i in order]
+
+
+def split_files(names, holdout, seed=0):
+    """
+    Teilt die Dateinamen zufällig (fester Seed) in Trainings- und zurückgehaltene Dateien.
+    """
+    rng = np.random.default_rng(seed)
+    shuffled = [names[i] for i in rng.permutation(len(names))]
+    n_eval = max(1, int(round(len(names) * holdout)))
+    return sorted(shuffled[n_eval:]), sorted(shuffled[:n_eval])
+
+
+def _init_worker(threads, core_sets):
+    """
+    Initialisierung je Worker-Prozess, bevor torch geladen wird: Threadanzahl der
+    Rechenbibliotheken festlegen und (Linux) den Prozess an eigene Kerne binden.
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if core_sets is not None and hasattr(os, "sched_setaffinity"):
+        # Ohne Kernbindung läuft der Worker trotzdem, nur ohne feste Kerne;
+        # Initialisierung einmal je Worker, daher auch nur eine Warnung je Worker
+        try:
+            os.sched_setaffinity(0, core_sets.get_nowait())
+        except (AttributeError, OSError, queue.Empty) as exc:
+            warnings.warn(f"Worker {os.getpid()}: keine Kernbindung ({exc!r})", RuntimeWarning)
+    import torch
+    torch.set_num_threads(threads)
+
+
+def evaluate_holdout(model, order_sets, names, max_queue_size):
+    """
+    Plant alle zurückgehaltenen Dateien deterministisch mit dem Modell.
+    Gibt (mittlerer Reward, mittlerer Makespan) zurück.
+    """
+    from scheduler import schedule_batch
+    results = schedule_batch(model, order_sets, names=names, max_queue_size=max_queue_size)
+    return (float(np.mean([r["reward"] for r in results])),
+            float(np.mean([r["makespan"] for r in results])))
+
+
+def should_prune(conn, study, trial_id, rung, score, min_trials):
+    """
+    Median-Regel: abbrechen, wenn der Score unter dem Median aller anderen Trials
+    auf derselben Stufe liegt (erst ab min_trials Vergleichswerten). Eine Stufe ist ein
+    fester Anteil des eigenen Trainingsbudgets, Trials mit kleinerem
+    timesteps_per_dataset werden also nach weniger Steps verglichen.
+    """
+    others = [row[0] for row in conn.execute(
+        "SELECT score FROM reports WHERE study = ? AND rung = ? AND trial_id != ?",
+        (study, rung, trial_id))]
+    return len(others) >= min_trials and score < statistics.median(others)
+
+
+def run_trial(args):
+    """
+    Trainiert und bewertet eine Konfiguration (läuft im Worker-Prozess).
+    """
+    trial_id, config, study, db_path, cache_dir, train_files, eval_files, rungs, min_trials, seed = args
+
+    from stable_baselines3 import PPO
+    from environment import MultiOrderEnv
+    import learner
+
+    conn = connect(db_path)
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO trials (trial_id, study, config, status, started) VALUES (?, ?, ?, ?, ?)",
+                     (trial_id, study, json.dumps(config), "running", time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+    status, score, makespan, timesteps, error = "complete", None, None, 0, None
+    try:
+        order_cache = OrderCache.open(cache_dir)
+        eval_sets = [order_cache[name] for name in eval_files]
+        env = MultiOrderEnv([os.path.join(cache_dir, name) for name in train_files], shuffle=True,
+                            seed=seed + trial_id, cache_dir=cache_dir, max_queue_size=config["max_queue_size"],
+                            time_step=1, event_driven=True, log_schedule=False,
+                            observation=config["observation"])
+        masked = config["action_masks"] and learner.MaskablePPO is not None
+        Algorithm = learner.MaskablePPO if masked else PPO
+        model = Algorithm("MlpPolicy", env, verbose=0, learning_rate=config["learning_rate"],
+                          n_steps=config["n_steps"], seed=seed + trial_id)
+
+        total = config["timesteps_per_dataset"] * len(train_files)
+        for rung in range(rungs):
+            budget = total * (rung + 1) // rungs - timesteps
+            model.learn(total_timesteps=budget, reset_num_timesteps=False)
+            timesteps += budget
+            score, makespan = evaluate_holdout(model, eval_sets, eval_files, config["max_queue_size"])
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?)",
+                             (study, trial_id, rung, timesteps, score, makespan))
+            if rung < rungs - 1 and should_prune(conn, study, trial_id, rung, score, min_trials):
+                status = "pruned"
+                break
+    except Exception as exc:
+        status, error = "failed", repr(exc)
+
+    with conn:
+        conn.execute("UPDATE trials SET status = ?, score = ?, makespan = ?, timesteps = ?, finished = ?, error = ? "
+                     "WHERE study = ? AND trial_id = ?",
+                     (status, score, makespan, timesteps, time.strftime("%Y-%m-%dT%H:%M:%S"), error,
+                      study, trial_id))
+    conn.close()
+    return trial_id, status, score, makespan
+
+
+def report(db_path, study=None, top=10):
+    """
+    Gibt die besten Trials einer Studie (Standard: die zuletzt gestartete) aus.
+    """
+    conn = connect(db_path)
+    if study is None:
+        row = conn.execute("SELECT study FROM trials ORDER BY started DESC LIMIT 1").fetchone()
+        if row is None:
+            print("Keine Trials gefunden.")
+            return
+        study = row[0]
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM trials WHERE study = ? GROUP BY status", (study,)))
+    print(f"Studie {study}: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    rows = conn.execute("SELECT trial_id, status, score, makespan, timesteps, config FROM trials "
+                        "WHERE study = ? AND score IS NOT NULL ORDER BY score DESC LIMIT ?", (study, top))
+    for trial_id, status, score, makespan, timesteps, config in rows:
+        print(f"  #{trial_id:<4d} {status:8s} Reward {score:>14,.1f}  Makespan {makespan:>9.1f}  "
+              f"{timesteps:>8d} Steps  {config}")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paralleler Hyperparameter-Sweep für learner.py")
+    parser.add_argument("--orders-dir", default=ORDERS_DIR)
+    parser.add_argument("--db", default="sweep_results.sqlite")
+    parser.add_argument("--study", help="Name der Studie (Standard: Startzeitpunkt plus Zufallskennung)")
+    parser.add_argument("--n-trials", type=int, default=24)
+    parser.add_argument("--threads", type=int, default=1, help="Threads je Worker")
+    parser.add_argument("--workers", type=int, help="Worker-Prozesse (Standard: Kerne / threads)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Anteil zurückgehaltener Dateien")
+    parser.add_argument("--n-files", type=int, default=0, help="nur die ersten n Dateien verwenden (0 = alle)")
+    parser.add_argument("--rungs", type=int, default=4, help="Bewertungsstufen je Trial")
+    parser.add_argument("--min-trials", type=int, default=4, help="Vergleichswerte, ab denen gepruned wird")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", action="store_true", help="nur die Ergebnisse ausgeben")
+    args = parser.parse_args()
+
+    if args.report:
+        report(args.db, args.study)
+        return
+
+    order_cache = load_order_cache(args.orders_dir)
+    names = order_cache.names if args.n_files == 0 else order_cache.names[:args.n_files]
+    train_files, eval_files = split_files(names, args.holdout, seed=args.seed)
+    # Zufallskennung: zwei in derselben Sekunde gestartete Sweeps überschreiben sich nicht
+    study = args.study or f"{time.strftime('%Y-%m-%dT%H:%M:%S')}-{uuid.uuid4().hex[:8]}"
+    configs = sample_configs(args.n_trials, seed=args.seed)
+
+    # Nur die Kerne, auf denen der Prozess laufen darf (Container, taskset)
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+    workers = args.workers or max(1, len(cpus) // args.threads)
+    print(f"Studie {study}: {len(configs)} Trials auf {workers} Workern mit je {args.threads} Threads, "
+          f"{len(train_files)} Trainings- / {len(eval_files)} Testdateien")
+
+    connect(args.db).close()
+    # Spawn statt Fork: die Worker setzen ihre Threadanzahl, bevor torch geladen wird
+    ctx = multiprocessing.get_context("spawn")
+    core_sets = None
+    if hasattr(os, "sched_setaffinity") and workers * args.threads <= len(cpus):
+        core_sets = ctx.Manager().Queue()
+        for w in range(workers):
+            core_sets.put(set(cpus[w * args.threads:(w + 1) * args.threads]))
+
+    tasks = [(trial_id, config, study, args.db, order_cache.cache_dir, train_files, eval_files,
+              args.rungs, args.min_trials, args.seed) for trial_id, config in enumerate(configs)]
+    starttime = time.time()
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(args.threads, core_sets)) as pool:
+        for trial_id, status, score, makespan in pool.imap_unordered(run_trial, tasks):
+            score_text = f"Reward {score:,.1f}, Makespan {makespan:.1f}" if score is not None else ""
+            print(f"Trial {trial_id}: {status} {score_text}")
+    print(f"Sweep abgeschlossen in {time.time() - starttime:.1f} s")
+    report(args.db, study)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from environment import MachineEnv
+
+
+class BatchMachineEnv(VecEnv):
+    """
+    Vektorisierte Variante von MachineEnv: simuliert num_envs unabhängige
+    Episoden desselben Auftragsdatensatzes in gestapelten NumPy-Arrays und rückt
+    alle in einem einzigen step() vor. Implementiert das VecEnv-Interface von
+    Stable-Baselines3 und kann direkt an PPO übergeben werden.
+
+    Zustand je Episode b:
+      - time_to_finish[b, m], running[b, m] (-1 = frei), start_time[b, m]
+      - queue_machine[b, i]: Maschine, in deren Queue Auftrag i wartet (-1 = keine)
+      - queue_seq[b, i]:     Einreihungsnummer, ergibt die FIFO-Reihenfolge der Queue
+    Maschinen, Beobachtung, Aktionen, Reward und event_driven verhalten sich wie in
+    MachineEnv; abgeschlossene Episoden werden automatisch zurückgesetzt
+    (Endbeobachtung in info["terminal_observation"]). Ein schedule_log wird nicht geführt.
+    Unterstützt nur observation="basic" und keine Freigabezeiten (alle Aufträge liegen ab
+    Zeit 0 vor); für den Beobachtungsmodus "queue" bleibt MachineEnv zu verwenden.
+    In learner.py als Trainingsumgebung wählbar (BATCH_ENVS).
+    """
+
+    def __init__(self, orders_df, num_envs=64, max_queue_size=10, time_step=1, event_driven=False, machines=None,
+                 observation="basic"):
+        if observation != "basic":
+            raise ValueError(f"BatchMachineEnv unterstützt nur observation='basic', nicht '{observation}'")
+        # Auftragstabelle und Spaces aus einer Einzelumgebung übernehmen
+        template = MachineEnv(orders_df, max_queue_size=max_queue_size, time_step=time_step, machines=machines)
+        super(BatchMachineEnv, self).__init__(num_envs, template.observation_space, template.action_space)
+
+        self.machine_names = list(template.machine_names)
+        self.max_queue_size = max_queue_size
+        self.time_step = time_step
+        self.event_driven = event_driven
+
+        self.order_ids = template.order_ids
+        self.op_times = template.op_times
+        self.first_machine = template.routes[:, 0]
+        self.next_machine = template.next_machine
+        self.n_orders = len(self.order_ids)
+
+        n_machines = len(self.machine_names)
+        self.time_to_finish = np.zeros((num_envs, n_machines), dtype=np.int64)
+        self.running = np.full((num_envs, n_machines), -1, dtype=np.int64)
+        self.start_time = np.zeros((num_envs, n_machines), dtype=np.int64)
+        self.queue_machine = np.full((num_envs, self.n_orders), -1, dtype=np.int64)
+        self.queue_seq = np.zeros((num_envs, self.n_orders), dtype=np.int64)
+        self.seq_counter = np.zeros(num_envs, dtype=np.int64)
+        self.current_time = np.zeros(num_envs, dtype=np.int64)
+        self.completed = np.zeros(num_envs, dtype=np.int64)
+
+        self._actions = None
+
+    def _reset_envs(self, envs):
+        """
+        Setzt die Episoden mit den Indizes 'envs' auf den Startzustand zurück:
+        alle Aufträge warten in der Reihenfolge des DataFrames an ihrer ersten Maschine.
+        """
+        self.time_to_finish[envs] = 0
+        self.running[envs] = -1
+        self.start_time[envs] = 0
+        self.queue_machine[envs] = self.first_machine
+        self.queue_seq[envs] = np.arange(self.n_orders)
+        self.seq_counter[envs] = self.n_orders
+        self.current_time[envs] = 0
+        self.completed[envs] = 0
+
+    def reset(self):
+        self._reset_envs(np.arange(self.num_envs))
+        return self._get_obs()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs, -1)
+
+    def step_wait(self):
+        envs = np.arange(self.num_envs)
+        actions = self._actions
+
+        # 1) Update laufende Aufträge; Fertigmeldungen je Maschine in fester Reihenfolge,
+        #    damit die Einreihung in Folge-Queues der Einzelumgebung entspricht
+        busy = self.running >= 0
+        self.time_to_finish[busy] -= self.time_step
+        finished = busy & (self.time_to_finish <= 0)
+        n_finished = np.zeros(self.num_envs, dtype=np.int64)
+
+        for m in range(len(self.machine_names)):
+            rows = np.flatnonzero(finished[:, m])
+            if rows.size == 0:
+                continue
+            orders = self.running[rows, m]
+            following = self.next_machine[orders, m]
+
+            moving = following >= 0
+            self.queue_machine[rows[moving], orders[moving]] = following[moving]
+            self.queue_seq[rows[moving], orders[moving]] = self.seq_counter[rows[moving]]
+            self.seq_counter[rows[moving]] += 1
+            self.completed[rows[~moving]] += 1
+            n_finished[rows] += 1
+
+            self.running[rows, m] = -1
+            self.time_to_finish[rows, m] = 0
+
+        # 2) Aktionen (wenn Maschinen idle), gleiche Regeln wie _handle_action_for_machine:
+        #    0 -> erster Auftrag, zu große Indizes -> letzter Auftrag
+        for m in range(len(self.machine_names)):
+            in_queue = self.queue_machine == m
+            queue_len = in_queue.sum(axis=1)
+            rows = np.flatnonzero((self.running[:, m] < 0) & (queue_len > 0))
+            if rows.size == 0:
+                continue
+            slot = np.minimum(np.maximum(actions[rows, m], 1) - 1, queue_len[rows] - 1)
+
+            # Queue-Reihenfolge: nach Einreihungsnummer sortiert, fremde Aufträge ans Ende
+            keys = np.where(in_queue[rows], self.queue_seq[rows], np.iinfo(np.int64).max)
+            ordered = np.argsort(keys, axis=1, kind='stable')
+            chosen = ordered[np.arange(rows.size), slot]
+
+            self.queue_machine[rows, chosen] = -1
+            self.running[rows, m] = chosen
+            self.time_to_finish[rows, m] = self.op_times[chosen, m]
+            self.start_time[rows, m] = self.current_time[rows]
+
+        # 3) Zeit +1 und Reward wie MachineEnv.step
+        self.current_time += self.time_step
+        n_busy = (self.running >= 0).sum(axis=1)
+        tick_reward = -(self.n_orders - self.completed) + 100 * (2 * n_busy - len(self.machine_names))
+        rewards = tick_reward + 10 * n_finished
+        dones = self.completed == self.n_orders
+
+        # 4) Ereignisgesteuert: Leerlauf-Ticks bis zum nächsten Ereignis überspringen
+        skipped = np.zeros(self.num_envs, dtype=np.int64)
+        if self.event_driven:
+            busy = self.running >= 0
+            queue_len = self._queue_lengths()
+            decision = ((~busy) & (queue_len > 0)).any(axis=1)
+            remaining = np.where(busy, self.time_to_finish, np.iinfo(np.int64).max).min(axis=1)
+            can_skip = ~dones & ~decision & busy.any(axis=1)
+            skipped[can_skip] = -(-remaining[can_skip] // self.time_step) - 1
+            np.maximum(skipped, 0, out=skipped)
+            self.time_to_finish -= np.where(busy, skipped[:, None] * self.time_step, 0)
+            self.current_time += skipped * self.time_step
+            rewards += skipped * tick_reward
+
+        obs = self._get_obs()
+        infos = [{"skipped_steps": int(skipped[b])} for b in envs]
+
+        # 5) Abgeschlossene Episoden zurücksetzen
+        done_envs = np.flatnonzero(dones)
+        if done_envs.size:
+            for b in done_envs:
+                infos[b]["terminal_observation"] = obs[b].copy()
+            self._reset_envs(done_envs)
+            obs[done_envs] = self._get_obs()[done_envs]
+
+        return obs, rewards.astype(np.float32), dones, infos
+
+    def action_masks(self):
+        """
+        Aktionsmasken aller Episoden (num_envs x Maschinen * (max_queue_size + 1)),
+        gleiche Regeln wie MachineEnv.action_masks: bewertet wird der Zustand nach den
+        Fertigmeldungen des nächsten Ticks.
+        """
+        busy = self.running >= 0
+        finishing = busy & (self.time_to_finish - self.time_step <= 0)
+        queue_len = self._queue_lengths()
+        for m in range(len(self.machine_names)):
+            rows = np.flatnonzero(finishing[:, m])
+            following = self.next_machine[self.running[rows, m], m]
+            moving = following >= 0
+            np.add.at(queue_len, (rows[moving], following[moving]), 1)
+
+        # Anzahl wählbarer Queue-Plätze je (Episode, Maschine); 0 = nur "Nichts tun"
+        limit = np.where(~busy | finishing, np.minimum(queue_len, self.max_queue_size), 0)
+        slots = np.arange(self.max_queue_size + 1)
+        masks = (slots >= 1) & (slots <= limit[..., None])
+        masks[..., 0] = limit == 0
+        return masks.reshape(self.num_envs, -1)
+
+    def _queue_lengths(self):
+        """
+        Queue-Länge je (Episode, Maschine).
+        """
+        return np.stack([(self.queue_machine == m).sum(axis=1)
+                         for m in range(len(self.machine_names))], axis=1)
+
+    def _get_obs(self):
+        """
+        Beobachtungen aller Episoden als Matrix (num_envs x (2 * Maschinen + 1)), Aufbau wie MachineEnv._get_obs.
+        """
+        return np.concatenate([
+            self.time_to_finish,
+            self._queue_lengths(),
+            self.current_time[:, None],
+        ], axis=1).astype(np.float32)
+
+    def close(self):
+        pass
+
+    def seed(self, seed=None):
+        # Die Simulation ist deterministisch, es gibt keinen Zufallszustand
+        return [seed] * self.num_envs
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        """
+        Ruft eine Methode der Batch-Umgebung auf. Die Methode liefert ein Ergebnis mit
+        einer Zeile je Episode; zurückgegeben werden die Zeilen der gewünschten Indizes.
+        """
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result[i] for i in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -1,18 +1,82 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import os
 
+from gantplot import natural_sorted, order_colors
+from results_store import ResultsStore, ScheduleCache
+
+# Ergebnisablage von scheduler.py; ohne Ablage zeigt das Dashboard schedule_log.csv
+results_db = '.\\PycharmProjects\\Prozessoptimierung\\scheduler_results.sqlite'
+# Obergrenze für zwischengespeicherte Zeitplan-Ausschnitte (alle Sitzungen zusammen)
+SLICE_CACHE_BYTES = 256 * 2 ** 20
+
 # -------------------------------
 # Hilfsfunktion: Berechnung der Überlappung zweier Zeitintervalle
 def interval_overlap(start1, end1, start2, end2):
     """Berechnet die überlappende Dauer der Intervalle [start1, end1] und [start2, end2]."""
     return max(0, min(end1, end2) - max(start1, start2))
 
+# -------------------------------
+# Intervall-Index nach Tagen: einmal je geladenem Log, danach kostet ein Tageswechsel
+# nur noch einen Slice statt eines Filters über das ganze Log
+class DayIndex:
+    """
+    Zerlegt jede Operation des schedule_logs in ihre Tagesstücke (an den Tagesgrenzen
+    gekappt) und sortiert sie nach Tag (innerhalb eines Tages in Log-Reihenfolge).
+      - rows[offsets[d]:offsets[d+1]]:  Zeilen des Logs, die Tag d (0-basiert) überlappen
+      - clip_start / clip_end:          die gekappten Zeiten dieser Stücke
+      - busy[d, m]:                     belegte Zeit von Maschine machines[m] an Tag d
+    Eine Operation überlappt Tag d, wenn start_time < Tagesende und finish_time > Tagesbeginn.
+    """
+
+    def __init__(self, df, machines, day_length, num_days=None):
+        self.df = df
+        self.machines = list(machines)
+        self.day_length = day_length
+        start = df['start_time'].to_numpy(dtype=np.float64)
+        finish = df['finish_time'].to_numpy(dtype=np.float64)
+        if num_days is None:
+            max_time = finish.max() if len(df) else day_length
+            num_days = int(max_time // day_length) + 1
+        self.num_days = num_days
+
+        # Tage je Operation: von floor(start / L) bis ceil(finish / L) - 1
+        first = np.floor(start / day_length).astype(np.int64)
+        last = np.ceil(finish / day_length).astype(np.int64) - 1
+        spans = np.maximum(last - first + 1, 0)
+        rows = np.repeat(np.arange(len(df)), spans)
+        within = np.arange(len(rows)) - np.repeat(np.cumsum(spans) - spans, spans)
+        days = np.repeat(first, spans) + within
+
+        order = np.argsort(days, kind="stable")
+        self.rows, days = rows[order], days[order]
+        self.clip_start = np.maximum(start[self.rows], days * day_length)
+        self.clip_end = np.minimum(finish[self.rows], (days + 1) * day_length)
+        self.offsets = np.searchsorted(days, np.arange(self.num_days + 1))
+
+        machine_index = {m: i for i, m in enumerate(self.machines)}
+        machine_idx = df['machine'].map(machine_index).to_numpy()[self.rows]
+        self.busy = np.bincount(days * len(self.machines) + machine_idx, weights=self.clip_end - self.clip_start,
+                                minlength=self.num_days * len(self.machines)).reshape(self.num_days, -1)
+
+    def day(self, day):
+        """
+        Operationen von Tag 'day' (0-basiert) mit start_rel / finish_rel (relativ zum
+        Tagesbeginn, gekappt) und Duration (Dauer innerhalb des Tages).
+        """
+        lo, hi = self.offsets[day], self.offsets[day + 1]
+        day_start = day * self.day_length
+        df_day = self.df.iloc[self.rows[lo:hi]].copy()
+        df_day['start_rel'] = self.clip_start[lo:hi] - day_start
+        df_day['finish_rel'] = self.clip_end[lo:hi] - day_start
+        df_day['Duration'] = df_day['finish_rel'] - df_day['start_rel']
+        return df_day
+
 # -------------------------------
 # Daten laden: schedule_log.csv oder Dummy-Daten, falls nicht vorhanden
-@st.cache_data
 def load_schedule_data():
     file_path = "schedule_log.csv"
     if os.path.exists(file_path):
@@ -31,6 +95,21 @@ def load_schedule_data():
         df = pd.DataFrame(data)
     return df
 
+@st.cache_resource
+def load_schedule(day_length):
+    """
+    Log und DayIndex einmal je Sitzung des Servers; beides wird nur gelesen.
+    """
+    df = load_schedule_data()
+    return df, DayIndex(df, natural_sorted(df['machine'].unique()), day_length)
+
+@st.cache_resource
+def schedule_cache(path, day_length):
+    """
+    Gemeinsamer Cache der tageweise geladenen Zeitpläne aus der Ergebnisablage.
+    """
+    return ScheduleCache(path, day_length=day_length, max_bytes=SLICE_CACHE_BYTES)
+
 # -------------------------------
 # Überschrift und Beschreibung
 st.title("Dashboard: Produktionsplanung und Maschinen-KPIs")
@@ -39,36 +118,53 @@ Dieses Dashboard zeigt wichtige Kennzahlen (KPIs) der Produktionsplanung:
 - **Maschinenauslastung:** Donut-Charts je Maschine (nebeneinander).
 - **Auftragsliste pro Maschine:** Übersicht, welche Aufträge an welcher Maschine bearbeitet wurden.
 - **Gantt-Diagramm:** Visualisiert den zeitlichen Ablauf der Aufträge am ausgewählten Tag.
-- **Gesamtübersicht:** Alle vorhandenen Aufträge.
+- **Gesamtübersicht:** Alle vorhandenen Aufträge bzw. die eines wählbaren Zeitraums.
+- **Vergleich der Runs:** Makespan, Verspätungen und Auslastung aller Dateien einer
+  Session, Policy gegen Prioritätsregeln und Sessions untereinander.
 """)
 
 # -------------------------------
-# Tag-Auswahl über Sidebar
+# Run- und Tag-Auswahl über Sidebar
 total_time_units = 480  # Zeiteinheiten pro Tag
-df_schedule = load_schedule_data()
-max_time = df_schedule['finish_time'].max() if not df_schedule.empty else total_time_units
-num_days = int(max_time // total_time_units) + 1
+# Aus der Ablage nur Übersichten lesen; Zeitpläne werden tageweise geladen
+store = ResultsStore(results_db, readonly=True) if os.path.exists(results_db) else None
+sessions = store.sessions()['session'].tolist()[::-1] if store is not None else []
+use_store = bool(sessions)
+if use_store:
+    session = st.sidebar.selectbox("Session", sessions)
+    runs = store.runs(session)
+    datei = st.sidebar.selectbox("Datei", runs['datei'].tolist())
+    run = runs[runs['datei'] == datei].iloc[-1]
+    run_id = int(run['run_id'])
+    machines = natural_sorted(store.run_machines(run_id))
+    num_days = int(run['makespan'] // total_time_units) + 1
+else:
+    df_schedule, day_index = load_schedule(total_time_units)
+    machines = day_index.machines
+    num_days = day_index.num_days
 selected_day = st.sidebar.selectbox("Wähle Tag", list(range(1, num_days + 1)))
 day_start = (selected_day - 1) * total_time_units
 day_end = selected_day * total_time_units
 st.sidebar.markdown(f"**Zeitraum:** {day_start} bis {day_end} Zeiteinheiten")
 
-# Filter: Aufträge, die zumindest teilweise in den ausgewählten Tag fallen
-df_day = df_schedule[(df_schedule['start_time'] < day_end) & (df_schedule['finish_time'] > day_start)].copy()
+if use_store:
+    # Nur die Operationen des gewählten Tages (aus dem gemeinsamen LRU-Cache)
+    cache = schedule_cache(results_db, total_time_units)
+    df_schedule = cache.day(run_id, selected_day - 1)
+    if not machines:
+        machines = natural_sorted(df_schedule['machine'].unique())
+    day_index = DayIndex(df_schedule, machines, total_time_units, num_days=num_days)
+
+# Aufträge, die zumindest teilweise in den ausgewählten Tag fallen (Slice aus dem Index)
+df_day = day_index.day(selected_day - 1)
 
 # -------------------------------
 # Section 1: Donut-Charts (Maschinenauslastung)
 st.header(f"Maschinenauslastung am Tag {selected_day}")
-machines = ["M1", "M2", "M3"]
-cols = st.columns(3)
+cols = st.columns(max(len(machines), 1))
 
 for i, machine in enumerate(machines):
-    df_machine = df_day[df_day['machine'] == machine]
-    total_util = 0
-    for _, row in df_machine.iterrows():
-        overlap = interval_overlap(row['start_time'], row['finish_time'], day_start, day_end)
-        total_util += overlap
-    total_util = min(total_util, total_time_units)
+    total_util = min(day_index.busy[selected_day - 1, i], total_time_units)
     free_time = total_time_units - total_util
     utilization_percentage = (total_util / total_time_units) * 100 if total_time_units > 0 else 0
 
@@ -87,13 +183,10 @@ for i, machine in enumerate(machines):
 st.header(f"Auftragsliste pro Maschine am Tag {selected_day}")
 for machine in machines:
     st.subheader(f"Maschine {machine}")
-    df_machine = df_day[df_day['machine'] == machine].copy()
+    df_machine = df_day[df_day['machine'] == machine]
     if not df_machine.empty:
-        df_machine['Dauer'] = df_machine.apply(
-            lambda row: interval_overlap(row['start_time'], row['finish_time'], day_start, day_end),
-            axis=1
-        )
-        df_machine = df_machine[['order_id', 'start_time', 'finish_time', 'Dauer']]
+        df_machine = df_machine[['order_id', 'start_time', 'finish_time', 'Duration']].rename(
+            columns={'Duration': 'Dauer'})
         st.dataframe(df_machine.reset_index(drop=True))
     else:
         st.write("Keine Aufträge für diese Maschine.")
@@ -102,11 +195,7 @@ for machine in machines:
 # Section 3: Gantt-Diagramm für den ausgewählten Tag
 st.header(f"Gantt-Diagramm am Tag {selected_day}")
 if not df_day.empty:
-    # Berechne relative Start-/Endzeiten (bezogen auf den Tagesbeginn)
-    df_day['start_rel'] = df_day['start_time'].apply(lambda x: max(x, day_start) - day_start)
-    df_day['finish_rel'] = df_day['finish_time'].apply(lambda x: min(x, day_end) - day_start)
-    df_day['Duration'] = df_day['finish_rel'] - df_day['start_rel']
-
+    # Relative Start-/Endzeiten (bezogen auf den Tagesbeginn) liefert der DayIndex
     # Konvertiere order_id in String, damit sie als Kategorie genutzt wird
     df_day["order_id"] = df_day["order_id"].astype(str)
 
@@ -119,24 +208,31 @@ if not df_day.empty:
     if df_day_gantt.empty:
         st.write("Keine Aufträge mit positiver Dauer an diesem Tag.")
     else:
-        # Fallback: Manueller Gantt-Ansatz mit go.Bar
+        # Manueller Gantt-Ansatz mit go.Bar: ein Trace je Maschine, Farbe je Auftrag
         fig_manual = go.Figure()
-        for _, row in df_day_gantt.iterrows():
+        for machine in machines:
+            df_bars = df_day_gantt[df_day_gantt['machine'] == machine]
+            if df_bars.empty:
+                continue
+            colors = [f"rgb({r * 255:.0f},{g * 255:.0f},{b * 255:.0f})"
+                      for r, g, b in order_colors(df_bars['order_id'].to_numpy())]
+            labels = "Order " + df_bars['order_id']
             fig_manual.add_trace(
                 go.Bar(
-                    x=[row['Duration']],           # Breite des Balkens
-                    y=[row['machine']],            # Maschine als Kategorie
-                    base=row['start_rel'],         # Startpunkt (links)
-                    orientation='h',               # Horizontaler Balken
-                    name=f"Order {row['order_id']}",
-                    text=f"Order {row['order_id']}",
+                    x=df_bars['Duration'],                 # Breite der Balken
+                    y=np.full(len(df_bars), machine),      # Maschine als Kategorie
+                    base=df_bars['start_rel'],             # Startpunkte (links)
+                    orientation='h',                       # Horizontale Balken
+                    name=f"Maschine {machine}",
+                    text=labels,
+                    hovertext=labels + ": " + df_bars['start_time'].astype(str) + " - "
+                              + df_bars['finish_time'].astype(str),
                     hoverinfo="text",
-                    marker_line_width=1,
-                    marker_line_color="black",
+                    marker=dict(color=colors, line=dict(width=1, color="black")),
                 )
             )
         fig_manual.update_layout(
-            barmode='stack',
+            barmode='overlay',
             xaxis=dict(title="Zeit (relativ zum Tagesbeginn)", type='linear'),
             yaxis=dict(autorange='reversed', title="Maschine"),
             height=400,
@@ -148,9 +244,54 @@ else:
     st.write("Keine Daten für das Gantt-Diagramm.")
 
 # -------------------------------
-# Section 4: Gesamtübersicht aller Aufträge
-st.header("Gesamtübersicht aller Aufträge")
-st.dataframe(df_schedule.reset_index(drop=True))
+# Section 4: Gesamtübersicht aller Aufträge (aus der Ablage: nur der gewählte Zeitraum)
+if use_store:
+    st.header("Aufträge im Zeitraum")
+    first_day, last_day = (st.slider("Tage", 1, num_days, (selected_day, selected_day))
+                           if num_days > 1 else (1, 1))
+    st.dataframe(cache.days(run_id, first_day - 1, last_day - 1).reset_index(drop=True))
+    st.caption(f"Cache: {cache.nbytes / 2 ** 20:.1f} von {SLICE_CACHE_BYTES / 2 ** 20:.0f} MB belegt")
+else:
+    st.header("Gesamtübersicht aller Aufträge")
+    st.dataframe(df_schedule.reset_index(drop=True))
+
+# -------------------------------
+# Section 5: Vergleich der Runs (nur Kennzahlen aus der Ablage, keine Zeitpläne)
+if use_store:
+    st.header(f"Vergleich der Runs in Session {session}")
+    df_runs = runs[['datei', 'source', 'makespan', 'late_orders', 'reward']]
+    st.dataframe(df_runs.reset_index(drop=True))
+
+    # Policy gegen Prioritätsregeln je Datei
+    df_baselines = store.baselines(session)
+    df_policies = pd.concat([
+        runs[['datei', 'source', 'makespan']].rename(columns={'source': 'policy'}),
+        df_baselines[['datei', 'rule', 'makespan']].rename(columns={'rule': 'policy'}),
+    ], ignore_index=True)
+    fig_policies = px.bar(df_policies, x='datei', y='makespan', color='policy', barmode='group',
+                          title="Makespan je Datei: Policy und Prioritätsregeln")
+    st.plotly_chart(fig_policies, use_container_width=True)
+
+    # Auslastung je Datei und Maschine
+    df_util = store.machine_kpis(session).pivot_table(
+        index='datei', columns='machine', values='utilization_percentage')
+    if not df_util.empty:
+        df_util = df_util[natural_sorted(df_util.columns)]
+        fig_util = px.imshow(df_util, text_auto='.0f', aspect='auto', color_continuous_scale='Reds',
+                             labels=dict(color="Auslastung %"), title="Auslastung je Datei und Maschine (%)")
+        st.plotly_chart(fig_util, use_container_width=True)
+
+    # Sessions untereinander
+    compare_sessions = st.sidebar.multiselect("Sessions vergleichen", sessions, default=[session])
+    if compare_sessions:
+        df_compare = pd.concat([store.runs(s) for s in compare_sessions], ignore_index=True)
+        st.subheader("Sessions im Vergleich")
+        st.dataframe(df_compare.groupby('session').agg(
+            dateien=('datei', 'count'), makespan_mittel=('makespan', 'mean'),
+            verspaetet=('late_orders', 'sum'), reward_mittel=('reward', 'mean')))
+        fig_sessions = px.bar(df_compare, x='datei', y='makespan', color='session', barmode='group',
+                              title="Makespan je Datei und Session")
+        st.plotly_chart(fig_sessions, use_container_width=True)
 
 
 # =============================================================================
@@ -198,11 +339,26 @@ def test_gantt_duration(df):
         checks.append(row['start_rel'] < row['finish_rel'])
     return [("Gantt-Duration: Start < End", all(checks))]
 
+def test_day_index(df, index, day):
+    """
+    Testet, ob Tages-Slice und Auslastung des DayIndex mit dem direkten Filter
+    und interval_overlap übereinstimmen.
+    """
+    day_start, day_end = day * index.day_length, (day + 1) * index.day_length
+    expected = df[(df['start_time'] < day_end) & (df['finish_time'] > day_start)]
+    same_rows = list(index.day(day).index) == list(expected.index)
+    same_busy = all(
+        abs(index.busy[day, i] - sum(interval_overlap(s, f, day_start, day_end)
+                                     for s, f in zip(group['start_time'], group['finish_time']))) < 1e-9
+        for i, group in ((i, expected[expected['machine'] == m]) for i, m in enumerate(index.machines)))
+    return [("DayIndex: Tages-Slice korrekt", same_rows), ("DayIndex: Auslastung korrekt", same_busy)]
+
 def run_all_tests():
     """Führt alle Tests durch und gibt deren Ergebnisse als Liste von (Testname, Ergebnis) zurück."""
     results = []
     results.extend(test_interval_overlap())
     results.extend(test_day_filter(df_day, day_start, day_end))
+    results.extend(test_day_index(df_schedule, day_index, selected_day - 1))
     df_gantt_test = df_day[df_day['Duration'] > 0] if not df_day.empty else pd.DataFrame()
     results.extend(test_gantt_duration(df_gantt_test))
     return results